@@ -0,0 +1,239 @@
+"""Compare the INT8 detector with FP32 on our own captures before switching a kiosk.
+
+The FP32 ONNX export that ``python -m foodcapture.quantize build`` leaves next
+to ``yolo_model`` is the reference, so only quantization differs, not the
+runtime: its food boxes on each image count as ground truth, and the INT8
+model (``int8_model``) is scored against them per food class (same label,
+IoU >= --iou). ``--pt`` adds the PyTorch ``yolo_model`` as a third row, scored
+the same way, to show what moving to ONNX Runtime alone changes. Reported:
+
+* food-class precision / recall, plus how often both agree on "food detected"
+  and on the dish (what the kiosk overlay and the pre-screen use)
+* per-frame latency p50/p95/p99 and FPS on this host
+* model load time, resident memory after loading and peak RSS
+
+Each model runs in its own fresh process, one after the other, so memory
+numbers do not mix and the timings do not compete for the CPU. Images used
+to calibrate the INT8 model are left out.
+
+    python benchmarks/compare_detectors.py --images ./image --limit 300
+    python benchmarks/compare_detectors.py --pt --json report.json
+    python benchmarks/compare_detectors.py --int8 other.int8.onnx --fp32 other.onnx
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from run_benchmark import current_rss_mb, percentile
+
+WARMUP_FRAMES = 3
+
+
+def run_model(model_path, images, imgsz, food_labels, conf):
+    """Runs in a fresh process: load the model, detect on every image, report boxes and costs."""
+    import cv2
+    from ultralytics import YOLO
+
+    rss_start = current_rss_mb()
+    t0 = time.perf_counter()
+    model = YOLO(model_path, task="detect")
+    frames = [cv2.imread(path) for path in images[:WARMUP_FRAMES]]
+    for frame in frames:
+        if frame is not None:
+            model(frame, imgsz=imgsz, conf=conf, verbose=False)
+    load_seconds = time.perf_counter() - t0
+    rss_loaded = current_rss_mb()
+
+    latencies, detections = [], {}
+    for path in images:
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        t = time.perf_counter()
+        results = model(frame, imgsz=imgsz, conf=conf, verbose=False)
+        latencies.append(time.perf_counter() - t)
+        boxes = results[0].boxes
+        detections[path] = [
+            (model.names[int(cls_id)], *xyxy, score)
+            for xyxy, score, cls_id in zip(boxes.xyxy.tolist(), boxes.conf.tolist(), boxes.cls.tolist())
+            if model.names[int(cls_id)] in food_labels
+        ]
+    return {
+        "model": model_path,
+        "size_mb": os.path.getsize(model_path) / 1e6 if os.path.exists(model_path) else None,
+        "load_seconds": load_seconds,
+        "rss_model_mb": rss_loaded - rss_start,
+        "rss_mb": rss_loaded,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        "latencies": latencies,
+        "detections": detections,
+    }
+
+
+def iou_matrix(a, b):
+    """IoU of every box in a (N x 4) with every box in b (M x 4)."""
+    a, b = np.asarray(a, float).reshape(-1, 4), np.asarray(b, float).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def match_counts(reference, candidate, iou_threshold):
+    """{label: [tp, fp, fn]} for one image; candidates matched greedily by confidence."""
+    counts = {}
+    for label in {box[0] for box in reference} | {box[0] for box in candidate}:
+        ref = [box[1:5] for box in reference if box[0] == label]
+        cand = sorted((box for box in candidate if box[0] == label), key=lambda box: -box[5])
+        ious = iou_matrix([box[1:5] for box in cand], ref)
+        used, tp = set(), 0
+        for row in ious:
+            free = [(iou, j) for j, iou in enumerate(row) if j not in used and iou >= iou_threshold]
+            if free:
+                used.add(max(free)[1])
+                tp += 1
+        counts[label] = [tp, len(cand) - tp, len(ref) - tp]
+    return counts
+
+
+def compare(reference, candidate, iou_threshold):
+    """Per-class and overall precision/recall of candidate against reference detections."""
+    totals, agree_detected, agree_dish = {}, 0, 0
+    images = [path for path in reference["detections"] if path in candidate["detections"]]
+    for path in images:
+        ref, cand = reference["detections"][path], candidate["detections"][path]
+        for label, (tp, fp, fn) in match_counts(ref, cand, iou_threshold).items():
+            total = totals.setdefault(label, [0, 0, 0])
+            total[0] += tp
+            total[1] += fp
+            total[2] += fn
+        agree_detected += bool(ref) == bool(cand)
+        best = lambda boxes: max(boxes, key=lambda box: box[5])[0] if boxes else None
+        agree_dish += best(ref) == best(cand)
+    totals["all food"] = [sum(t[i] for t in totals.values()) for i in range(3)]
+    classes = {
+        label: {"tp": tp, "fp": fp, "fn": fn,
+                "precision": tp / (tp + fp) if tp + fp else None,
+                "recall": tp / (tp + fn) if tp + fn else None}
+        for label, (tp, fp, fn) in totals.items()
+    }
+    return {
+        "images": len(images),
+        "classes": classes,
+        "detected_agreement": agree_detected / len(images) if images else None,
+        "dish_agreement": agree_dish / len(images) if images else None,
+    }
+
+
+def cost_summary(run):
+    ms = [t * 1000 for t in run["latencies"]]
+    return {
+        "model": run["model"], "size_mb": run["size_mb"], "load_seconds": run["load_seconds"],
+        "rss_model_mb": run["rss_model_mb"], "rss_mb": run["rss_mb"], "peak_rss_mb": run["peak_rss_mb"],
+        "frames": len(ms),
+        "p50_ms": percentile(ms, 50), "p95_ms": percentile(ms, 95), "p99_ms": percentile(ms, 99),
+        "fps": len(ms) / (sum(ms) / 1000) if ms else None,
+    }
+
+
+def select_images(image_dir, limit, exclude):
+    from foodcapture.batch import iter_images
+    paths = [path for path in iter_images(image_dir) if os.path.basename(path) not in exclude]
+    if limit and len(paths) > limit:
+        paths = [paths[int(i)] for i in np.linspace(0, len(paths) - 1, limit)]
+    return paths
+
+
+def _fmt(value, spec):
+    return format("-", ">" + spec.split(".")[0]) if value is None else format(value, spec)
+
+
+def print_report(report):
+    print(f"\nDetector comparison on {report['images']} images "
+          f"(imgsz {report['imgsz']}, conf {report['conf']}, IoU {report['iou']})\n")
+    print(f"{'':<8}{'size MB':>9}{'load s':>8}{'model MB':>10}{'peak MB':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'FPS':>7}")
+    for name in ("fp32", "int8", "pt"):
+        if name not in report:
+            continue
+        c = report[name]
+        print(f"{name:<8}{_fmt(c['size_mb'], '9.1f')}{c['load_seconds']:8.1f}{c['rss_model_mb']:10.0f}"
+              f"{c['peak_rss_mb']:9.0f}{c['p50_ms']:9.1f}{c['p95_ms']:9.1f}{c['p99_ms']:9.1f}{_fmt(c['fps'], '7.1f')}")
+    speedup = report["fp32"]["p50_ms"] / report["int8"]["p50_ms"] if report["int8"]["p50_ms"] else float("nan")
+    print(f"INT8 p50 speed-up: {speedup:.2f}x\n")
+    for name, accuracy in report["accuracy"].items():
+        print(f"{name} vs fp32")
+        print(f"{'class':<14}{'precision':>10}{'recall':>8}{'tp':>6}{'fp':>6}{'fn':>6}")
+        for label, c in sorted(accuracy["classes"].items(), key=lambda item: (item[0] == "all food", item[0])):
+            print(f"{label:<14}{_fmt(c['precision'], '10.3f')}{_fmt(c['recall'], '8.3f')}"
+                  f"{c['tp']:6d}{c['fp']:6d}{c['fn']:6d}")
+        print(f"'food detected' agreement {_fmt(accuracy['detected_agreement'], '.1%')}, "
+              f"dish agreement {_fmt(accuracy['dish_agreement'], '.1%')}\n")
+
+
+def main():
+    from foodcapture.config import load_config
+    from foodcapture.quantize import calibration_list_path, fp32_onnx_path, int8_model_path
+
+    config = load_config()
+    parser = argparse.ArgumentParser(description="INT8 vs FP32 detector: food precision/recall, latency, memory.")
+    parser.add_argument("--images", default=config.photo_dir, help="Captures to evaluate on (default: photo_dir)")
+    parser.add_argument("--limit", type=int, default=300, help="Images, spread over the folder (0 = all)")
+    parser.add_argument("--fp32", default=fp32_onnx_path(config), help="FP32 reference (default: the ONNX export)")
+    parser.add_argument("--int8", default=int8_model_path(config))
+    parser.add_argument("--pt", nargs="?", const=config.yolo_model,
+                        help="Also run the PyTorch model (default: yolo_model) as a third row")
+    parser.add_argument("--imgsz", type=int, default=config.inference_size)
+    parser.add_argument("--conf", type=float, default=0.25, help="Detection confidence threshold for every model")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU for an INT8 box to match an FP32 box")
+    parser.add_argument("--json", help="Also write the report (without per-image boxes) here")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s')
+
+    for path in (args.fp32, args.int8):
+        if not os.path.exists(path):
+            raise SystemExit(f"{path} not found; build it with python -m foodcapture.quantize build")
+    exclude = set()
+    if os.path.exists(calibration_list_path(args.int8)):
+        with open(calibration_list_path(args.int8)) as f:
+            exclude = {line.strip() for line in f if line.strip()}
+    images = select_images(args.images, args.limit, exclude)
+    if not images:
+        raise SystemExit(f"No evaluation images in {args.images} (calibration images are excluded)")
+    logging.info(f"📊 {len(images)} images, {len(exclude)} calibration images left out")
+
+    models = [("fp32", args.fp32), ("int8", args.int8)] + ([("pt", args.pt)] if args.pt else [])
+    runs = {}
+    for name, path in models:
+        logging.info(f"⏱️ Running {name}: {path}")
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            runs[name] = pool.submit(run_model, path, images, args.imgsz, config.food_labels, args.conf).result()
+
+    report = {
+        "images": len(images), "imgsz": args.imgsz, "conf": args.conf, "iou": args.iou,
+        **{name: cost_summary(run) for name, run in runs.items()},
+        "accuracy": {name: compare(runs["fp32"], run, args.iou) for name, run in runs.items() if name != "fp32"},
+    }
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=1)
+        logging.info(f"📝 Report written: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
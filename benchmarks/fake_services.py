@@ -0,0 +1,149 @@
+"""Local stand-ins for the Telegram Bot API and the OpenAI chat endpoint.
+
+Both servers run in a background thread on 127.0.0.1 and answer with the
+same JSON shapes the real services return. Latency and error rate are
+configurable so the benchmark can model a slow or flaky uplink.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAKE_ANALYSIS = """Summary: Plated fried rice with vegetables
+Color: Golden brown
+Shape/Size: Regular portion
+Presentation: Neat
+Unusual: None
+Rating: good 🟢"""
+FAKE_QUALITY = {
+    "summary": "Plated fried rice with vegetables", "color": "Golden brown",
+    "shape_size": "Regular portion", "presentation": "Neat", "unusual": "None", "rating": "good",
+}
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass  # keep benchmark output clean
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        service = self.server.service
+        service.record_request(self.path, body)
+        time.sleep(service.next_latency())
+        if service.should_fail():
+            self._reply(*service.error_response())
+        else:
+            self._reply(200, service.ok_response(self.path, body))
+
+
+class FakeService:
+    """Base class: owns the HTTP server thread, latency and error injection."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeHandler)
+        self._server.daemon_threads = True
+        self._server.service = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def record_request(self, path, body):
+        with self._lock:
+            self.requests.append((time.perf_counter(), path, len(body)))
+
+    def next_latency(self):
+        with self._lock:
+            return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def should_fail(self):
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def error_response(self):
+        return 500, {"error": "injected failure"}
+
+    def ok_response(self, path, body):
+        raise NotImplementedError
+
+
+class FakeTelegram(FakeService):
+    """Answers /bot<token>/sendPhoto like the Telegram Bot API."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._message_id = 0
+
+    def error_response(self):
+        return 500, {"ok": False, "error_code": 500, "description": "Internal Server Error"}
+
+    def ok_response(self, path, body):
+        with self._lock:
+            self._message_id += 1
+            message_id = self._message_id
+        return {"ok": True, "result": {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "photo": [{"file_id": f"fake-file-{message_id}", "file_unique_id": f"u{message_id}",
+                       "width": 1280, "height": 720}],
+        }}
+
+
+class FakeOpenAI(FakeService):
+    """Answers /chat/completions like the OpenAI API with a canned analysis.
+
+    Requests with a json_schema response_format get FAKE_QUALITY as JSON,
+    free-text requests get FAKE_ANALYSIS.
+    """
+
+    def __init__(self, content=FAKE_ANALYSIS, structured=FAKE_QUALITY, **kwargs):
+        super().__init__(**kwargs)
+        self.content = content
+        self.structured = structured
+
+    def error_response(self):
+        return 500, {"error": {"message": "injected failure", "type": "server_error"}}
+
+    def ok_response(self, path, body):
+        request = json.loads(body or b"{}")
+        model = request.get("model", "gpt-4o")
+        structured = request.get("response_format", {}).get("type") == "json_schema"
+        content = json.dumps(self.structured) if structured else self.content
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
@@ -0,0 +1,190 @@
+"""Replay recorded footage through the capture pipeline and report performance.
+
+Frames from a video file or an image directory go through the kiosk's
+detect / overlay loop, and every simulated Enter goes through the kiosk
+capture pipeline (``PRESETS["kiosk"]``: encode, dedupe, portion, record,
+analyze, deliver), with Telegram and OpenAI replaced by local fake servers. Runs on a GPU-less
+Linux box; YOLO is only loaded when --detect is given.
+
+    python benchmarks/run_benchmark.py --source clip.mp4 --capture-every 30
+    python benchmarks/run_benchmark.py --source ./image --openai-latency 2.5 --error-rate 0.1
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+
+from fake_services import FakeOpenAI, FakeTelegram
+from foodcapture.sources import open_frame_source
+
+
+def replay_frames(source, max_frames):
+    """Yield up to max_frames frames from any frame source, looping recorded footage."""
+    with open_frame_source(source, loop=True) as frames:
+        if not frames.isOpened():
+            raise SystemExit(f"No frames could be read from {source}")
+        for _ in range(max_frames):
+            ret, frame = frames.read()
+            if not ret or frame is None:
+                return
+            yield frame
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def current_rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    return float("nan")
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run(args):
+    telegram = FakeTelegram(latency=args.telegram_latency, jitter=args.jitter,
+                            error_rate=args.error_rate, seed=args.seed).start()
+    openai_fake = FakeOpenAI(latency=args.openai_latency, jitter=args.jitter,
+                             error_rate=args.error_rate, seed=args.seed + 1).start()
+
+    # The pipeline reads its endpoints from the environment at import time.
+    os.environ.update({
+        "BOT_TOKEN": "bench", "CHAT_ID": "1", "OPENAI_API_KEY": "sk-bench",
+        "TELEGRAM_API_URL": telegram.url, "OPENAI_BASE_URL": f"{openai_fake.url}/v1",
+    })
+    from foodcapture import core, delivery
+    from foodcapture.pipeline import Pipeline
+    from foodcapture.prescreen import ReferenceLibrary, food_confidence
+    from foodcapture.presets import PRESETS
+
+    core.config.photo_dir = tempfile.mkdtemp(prefix="foodcapture-bench-")
+    yolo_model = None
+    if args.detect:
+        from ultralytics import YOLO
+        yolo_model = YOLO(args.model or core.config.yolo_model)
+
+    latencies = []
+    failures = []
+    duplicates = []
+    lock = threading.Lock()
+    pipeline = Pipeline(PRESETS["kiosk"].stages, core.config, duplicates=core.DuplicateFilter(),
+                        references=ReferenceLibrary(core.config.prescreen_reference_dir))
+
+    def finished(enter_time, future):
+        elapsed = time.perf_counter() - enter_time
+        if future.exception() is not None:
+            outcome = failures
+        elif future.result() is None:
+            outcome = duplicates
+        else:
+            record = delivery.load_record(future.result()["path"])
+            outcome = latencies if record is not None and record.state == delivery.SENT else failures
+        with lock:
+            outcome.append(elapsed)
+
+    frame_times = []
+    captures = 0
+    results = None
+    cpu_start, wall_start = cpu_seconds(), time.perf_counter()
+
+    for i, frame in enumerate(replay_frames(args.source, args.frames)):
+        t0 = time.perf_counter()
+        if yolo_model is not None:
+            results, _ = core.detect_food(yolo_model, frame)
+            annotated_frame = core.annotate_detections(results, frame)
+        else:
+            annotated_frame = frame
+        display_frame = cv2.resize(annotated_frame, (args.width, args.height))
+        core.draw_code_box(display_frame, f"BENCH{i}")
+
+        if args.capture_every and i % args.capture_every == 0:
+            enter_time = time.perf_counter()
+            food_conf, dish = (food_confidence(yolo_model, results, core.config.food_labels)
+                               if yolo_model is not None and core.config.prescreen_enabled else (0.0, None))
+            captures += 1
+            future = pipeline.submit({"frame": frame, "jpeg": None, "item_code": f"BENCH{i}",
+                                      "food_conf": food_conf, "dish": dish})
+            future.add_done_callback(lambda f, t=enter_time: finished(t, f))
+        frame_times.append(time.perf_counter() - t0)
+
+    loop_wall = time.perf_counter() - wall_start
+    pipeline.close()
+    total_wall = time.perf_counter() - wall_start
+    cpu_used = cpu_seconds() - cpu_start
+
+    telegram.stop()
+    openai_fake.stop()
+
+    return {
+        "frames": len(frame_times),
+        "fps": len(frame_times) / loop_wall if loop_wall else float("nan"),
+        "frame_ms_p50": percentile(frame_times, 50) * 1000,
+        "frame_ms_p95": percentile(frame_times, 95) * 1000,
+        "frame_ms_p99": percentile(frame_times, 99) * 1000,
+        "captures": captures - len(duplicates),
+        "duplicates": len(duplicates),
+        "sent": len(latencies),
+        "failed": len(failures),
+        "enter_to_sent_ms_p50": percentile(latencies, 50) * 1000,
+        "enter_to_sent_ms_p95": percentile(latencies, 95) * 1000,
+        "enter_to_sent_ms_p99": percentile(latencies, 99) * 1000,
+        "cpu_percent": 100.0 * cpu_used / total_wall if total_wall else float("nan"),
+        "rss_mb": current_rss_mb(),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        "telegram_requests": len(telegram.requests),
+        "openai_requests": len(openai_fake.requests),
+        **{f"stage_{name}_ms": 1000 * seconds / items if items else float("nan")
+           for name, (items, seconds) in pipeline.stats.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the food capture pipeline on recorded footage.")
+    parser.add_argument("--source", required=True, help="Video file, image directory, stream URL or camera to replay")
+    parser.add_argument("--frames", type=int, default=300, help="Number of frames to process (source loops)")
+    parser.add_argument("--capture-every", type=int, default=30, help="Simulate Enter every N frames (0=never)")
+    parser.add_argument("--detect", action="store_true", help="Run YOLO detection on every frame")
+    parser.add_argument("--model", help="YOLO weights (default: config yolo_model)")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--telegram-latency", type=float, default=0.3, help="Seconds per sendPhoto")
+    parser.add_argument("--openai-latency", type=float, default=1.5, help="Seconds per chat completion")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- seconds added to latencies")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake API calls that fail")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='[%(asctime)s] %(message)s')
+    report = run(args)
+
+    for key, value in report.items():
+        print(f"{key:>22}: {value:.2f}" if isinstance(value, float) else f"{key:>22}: {value}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,172 +1,256 @@
 import cv2
+import numpy as np
+import sys
 import time
 import os
-import requests
-from datetime import datetime
-import openai
-from openai import OpenAI
-import base64
-import hashlib
 import logging
-import threading
-from dotenv import load_dotenv
+import signal
 from playsound import playsound
-from ultralytics import YOLO
 
-load_dotenv()
+from foodcapture.blackbox import BlackBox
+from foodcapture.burst import FrameRing, capture_burst
+from foodcapture.bus import FramePublisher
+from foodcapture.collector import CollectorClient
+from foodcapture.config import ConfigWatcher, config_path
+from foodcapture.core import (
+    config, draw_code_box, detect_food, annotate_detections,
+    reanalyzer, DuplicateFilter,
+)
+from foodcapture.motion import MotionGate
+from foodcapture.pipeline import Pipeline
+from foodcapture.presets import PRESETS
+from foodcapture.prescreen import ReferenceLibrary, food_confidence
+from foodcapture.roi import clamp_roi, roi_view, draw_roi, scale_roi, select_roi, save_roi
+from foodcapture.sources import SupervisedSource, open_frame_source
+from foodcapture.tracking import BoxTracker
+from foodcapture.profiling import FpsMeter, LoopProfiler
+from foodcapture.quantize import load_detector
+from foodcapture.workers import Detections, DetectorProcess, EncoderProcess
 
 # ========== CONFIG ==========
-bot_token = os.getenv("BOT_TOKEN")
-ch_chat_id = os.getenv("CHAT_ID")
-openai_api_key = os.getenv("OPENAI_API_KEY")
-
-AI_LABEL = "food"
-PHOTO_DIR = "./image"
-COOLDOWN_SECONDS = 2
+# Tunables live in foodcapture.toml / environment, see foodcapture/config.py
 WINDOW_NAME = "📷 Live Feed - Press Enter to Capture"
-IMAGE_WIDTH, IMAGE_HEIGHT = 1280, 720
+PROFILE_KEY = 9  # Tab
+BLACKBOX_KEY = 2  # Ctrl+B
+LOG_FILE = 'capture_log.txt'
+OFFLINE_WAIT_MS = 100  # UI refresh while the camera is reconnecting
 
 # ========== LOGGING ==========
 logging.basicConfig(
-    level=logging.INFO, 
+    level=logging.INFO,
     format='[%(asctime)s] %(message)s',
     handlers=[
         logging.StreamHandler(),
-        logging.FileHandler('capture_log.txt', mode='a')
+        logging.FileHandler(LOG_FILE, mode='a')
     ]
 )
 
-# ========== UTILITY FUNCTIONS ==========
-def compute_image_hash(image_path):
-    """Return a SHA256 hash of the image contents."""
-    with open(image_path, 'rb') as f:
-        return hashlib.sha256(f.read()).hexdigest()
-
-def send_telegram_photo(photo_path, caption="Food Image Capture"):
-    url = f"https://api.telegram.org/bot{bot_token}/sendPhoto"
-    with open(photo_path, 'rb') as photo:
-        response = requests.post(
-            url,
-            data={'chat_id': ch_chat_id, 'caption': caption},
-            files={'photo': photo}
-        )
-    return response
-
-def analyze_image_with_openai(photo_path):
-    openai.api_key = openai_api_key
-    with open(photo_path, "rb") as f:
-        img_data = base64.b64encode(f.read()).decode()
-
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text":
-    """You are a food inspector AI. Briefly analyze this food photo and reply in this format:
-
-    Summary: [one short line]
-    Color: [one word or phrase]
-    Shape/Size: [one word or phrase]
-    Presentation: [short phrase]
-    Unusual: [short phrase or 'None']
-    Rating: [bad|normal|good|excellent] [emoji: 🔴🟠🟢🔵]
-
-    Keep it concise and use the emoji for the rating at the end.
-    """ 
-                        },
-                        {"type": "image_url", "image_url": {
-                            "url": f"data:image/jpeg;base64,{img_data}"
-                        }}
-                    ]
-                }
-            ]
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        logging.warning(f"OpenAI analysis failed: {e}")
-        return "Food image"
-
-def draw_code_box(frame, code_text):
-    """Overlay the current Order Number on the frame."""
-    overlay = frame.copy()
-    cv2.rectangle(overlay, (10, 10), (500, 60), (0, 0, 0), -1)  # background box
-    cv2.putText(overlay, f"Order Number: {code_text}", (20, 45),
-                cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
-    alpha = 0.6
-    cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-    return frame
-
-def analyze_and_send(photo_path, caption_parts):
-    # Run in background: Analyze food quality, then send to Telegram
-    logging.info("🔍 Analyzing food quality with OpenAI...")
-    quality_result = analyze_image_with_openai(photo_path)
-    logging.info(f"🧠 Food quality result: {quality_result}")
-    caption_parts.append(f"\nAI Food Quality:\n{quality_result}")
-    caption = "\n".join(caption_parts)
-    resp = send_telegram_photo(photo_path, caption=caption)
-    if resp.status_code == 200:
-        logging.info("✅ Image sent to Telegram.")
-    else:
-        logging.error(f"❌ Telegram error: {resp.text}")
-
 def play_success_sound():
     playsound('success.wav', block=False)
 
+def offline_screen(cap, code_text):
+    """Placeholder frame shown while the camera is reconnecting."""
+    screen = np.zeros((config.image_height, config.image_width, 3), np.uint8)
+    down = time.monotonic() - cap.down_since
+    retry = max(0.0, cap.next_retry - time.monotonic())
+    cv2.putText(screen, "CAMERA OFFLINE", (20, 100),
+                cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 3, cv2.LINE_AA)
+    cv2.putText(screen, f"down {down:.0f}s - reconnect attempt {cap.attempts + 1} in {retry:.0f}s", (20, 150),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (200, 200, 200), 2, cv2.LINE_AA)
+    return draw_code_box(screen, code_text)
+
 
 # ========== MAIN FUNCTION ==========
 def main():
-    os.makedirs(PHOTO_DIR, exist_ok=True)
-    cap = cv2.VideoCapture(0)
-
-    # Load YOLOv8n (tiny, fast) for food detection.
-    yolo_model = YOLO("yolov8n.pt")  # Use your custom model if you have one
-
+    os.makedirs(config.photo_dir, exist_ok=True)
+    # Dual resolution: stream small for preview/detection, grab full-size stills on Enter only
+    still_size = None
+    stream_size = (config.image_width, config.image_height)
+    if config.preview_width and config.preview_height:
+        still_size, stream_size = stream_size, (config.preview_width, config.preview_height)
+        logging.info(f"🔀 Preview at {stream_size[0]}x{stream_size[1]}, captures at {still_size[0]}x{still_size[1]}")
+    cap = SupervisedSource(
+        lambda: open_frame_source(config.camera_source, *stream_size, passthrough=config.mjpeg_passthrough),
+        offline_after=config.camera_offline_after, retry_max=config.camera_retry_max,
+        downtime_log=config.camera_downtime_log,
+    )
+
+    # Shared-memory frame slots (worker processes, frame bus) fit the first camera frame
+    # and a full-size capture.
+    detector = encoder = yolo_model = publisher = None
+    if config.multiprocess or config.bus_name:
+        ret, probe = cap.read()
+        probe_h, probe_w = probe.shape[:2] if ret and probe is not None else (0, 0)
+        max_shape = (max(probe_h, config.image_height), max(probe_w, config.image_width), 3)
+    if config.bus_name:
+        publisher = FramePublisher(config.bus_name, max_shape, config.bus_slots)
+    if config.multiprocess:
+        # Detector and encoder run in their own processes
+        detector = DetectorProcess(max_shape, LOG_FILE)
+        encoder = EncoderProcess(max_shape, LOG_FILE)
+        logging.info(f"🧩 Multiprocess mode: detector pid {detector.process.pid}, encoder pid {encoder.process.pid}")
+    else:
+        # Load YOLOv8n (tiny, fast) for food detection; INT8 with detector_precision = "int8".
+        yolo_model = load_detector(config)  # Use your custom model if you have one
 
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, IMAGE_WIDTH)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, IMAGE_HEIGHT)
     cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL)
-    cv2.resizeWindow(WINDOW_NAME, IMAGE_WIDTH, IMAGE_HEIGHT)
+    cv2.resizeWindow(WINDOW_NAME, config.image_width, config.image_height)
 
-    logging.info("📸 Type Order Number, [Enter]=Capture, [ESC]=Exit.")
+    logging.info("📸 Type Order Number, [Enter]=Capture, [Tab]=Profile, [Ctrl+B]=Black box, [ESC]=Exit.")
 
-    last_image_hash = None
+    recent_frames = FrameRing(config.burst_before)
+    motion_gate = MotionGate(config)
+    tracker = BoxTracker(config)
+    key_thumbs, tracked_seq, recorded_seq = {}, 0, 0  # submitted seq -> plate thumbnail
     code_text = ""
+    frame_index = last_detect = 0
+    results, detected = None, False
+    detections = Detections()
+
+    watcher = ConfigWatcher(config)
+    watcher.start()
+    captures = collector = None
+    if encoder is None:
+        # The encoder process runs its own. Encode and dedupe run inline; portion and
+        # sidecar, analysis and upload on thread pools (see foodcapture/presets.py).
+        captures = Pipeline(PRESETS["kiosk"].stages, config, duplicates=DuplicateFilter(),
+                            references=ReferenceLibrary(config.prescreen_reference_dir))
+        reanalyzer.start()
+        if config.collector_url:
+            collector = CollectorClient(config)
+            collector.start()
+
+    fps_meter = FpsMeter()
+    profiler = LoopProfiler(config.profile_dir, stats_fn=lambda: {
+        "fps": fps_meter.fps,
+        "uploads_in_flight": encoder.pending if encoder else len(captures),
+        "code_text": code_text,
+        **cap.metrics(),
+    })
+
+    def request_profile(*_):
+        profiler.duration = config.profile_seconds
+        profiler.request()
+
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, request_profile)  # kill -USR1 <pid>
+    if config.profile_on_start:
+        request_profile()
+
+    # Rolling recording of the last seconds, written on errors, slow frames, Ctrl+B or SIGUSR2
+    blackbox = BlackBox(config)
+    logging.getLogger().addHandler(blackbox.log_handler())
+    if captures is not None:
+        captures.listeners.append(blackbox.timing)
+    if hasattr(signal, "SIGUSR2"):
+        signal.signal(signal.SIGUSR2, lambda *_: blackbox.request("signal", force=True))
 
     try:
         while True:
+            fps_meter.tick()
+            profiler.tick()
+            blackbox.tick()
             ret, frame = cap.read()
             if not ret or frame is None:
-                logging.error("❌ Camera frame not available.")
+                # The source reconnects by itself; keep the window alive and ESC working meanwhile.
+                if not cap.online:
+                    recent_frames.clear()  # pre-outage frames must not be captured afterwards
+                    cv2.imshow(WINDOW_NAME, offline_screen(cap, code_text))
+                if cv2.waitKey(OFFLINE_WAIT_MS) & 0xFF == 27:
+                    logging.info("👋 Exiting...")
+                    break
                 continue
-
-            # Run YOLO detection on frame
-            results = yolo_model(frame)
-            detected = False
-            annotated_frame = results[0].plot()
-            
-
-            # If you want to only allow capture when food is detected:
-            # (COCO model: 'food' could be labeled as 'pizza', 'sandwich', 'hot dog', etc.)
-            for box in results[0].boxes:
-                cls_id = int(box.cls[0])
-                label = yolo_model.names[cls_id]
-                if label in ["pizza", "sandwich", "hot dog", "apple", "banana", "cake"]:  # extend as needed
-                    detected = True
-
-            # Show annotated frame instead of plain frame
-            display_frame = cv2.resize(annotated_frame, (IMAGE_WIDTH, IMAGE_HEIGHT))
-            display_frame = draw_code_box(display_frame, code_text)
-            if not detected:
-                cv2.putText(display_frame, "NO FOOD DETECTED", (20, 100),
-                            cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 3, cv2.LINE_AA)
-
-
-            cv2.imshow(WINDOW_NAME, display_frame)
+            blackbox.frame(frame, frame_index)  # before anything is drawn on it
+            if still_size is None:
+                recent_frames.resize(config.burst_before)
+                recent_frames.push(frame, cap.jpeg)
+                roi = config.roi
+            else:
+                # The ROI is set at capture resolution; map it onto the preview.
+                roi = scale_roi(config.roi, frame.shape[1] / still_size[0], frame.shape[0] / still_size[1])
+
+            # Share the raw frame and the latest boxes with local subscribers
+            if publisher is not None:
+                plate_box = clamp_roi(roi, frame.shape)
+                dx, dy = plate_box[:2] if plate_box else (0, 0)
+                publisher.publish(frame, {
+                    **detections.to_dict(),
+                    # Detection ran on the plate zone; subscribers get the full frame.
+                    "boxes": [(x1 + dx, y1 + dy, x2 + dx, y2 + dy, *rest)
+                              for x1, y1, x2, y2, *rest in detections.boxes],
+                    "roi": plate_box,
+                    "idle": motion_gate.idle,
+                })
+
+            # Detection and motion only look at the plate zone (a view, no copy)
+            plate = roi_view(frame, roi)
+
+            # Skip detection and preview refresh while nothing moves at the pass
+            if motion_gate.update(plate):
+                if detector is not None:
+                    # Hand the newest frame over whenever the detector is free
+                    if frame_index - last_detect >= config.detect_every and detector.submit(plate):
+                        last_detect = frame_index
+                        if config.tracking_enabled:
+                            key_thumbs[detector.seq] = tracker.thumb(plate)
+                    detections = detector.poll()
+                    if detections.seq != recorded_seq:
+                        recorded_seq = detections.seq
+                        blackbox.detections(detections)
+                    if config.tracking_enabled:
+                        # New boxes belong to the frame submitted with that seq (submit() may already
+                        # have sent a newer one); the tracker carries them from there to this frame
+                        if detections.seq != tracked_seq and detections.seq in key_thumbs:
+                            tracked_seq = detections.seq
+                            tracker.reset(detections.boxes, key_thumbs.pop(tracked_seq))
+                            key_thumbs = {seq: thumb for seq, thumb in key_thumbs.items() if seq > tracked_seq}
+                        if tracked_seq:
+                            if tracker.update(plate) is None and detector.submit(plate):
+                                last_detect = frame_index
+                                key_thumbs[detector.seq] = tracker.thumb(plate)
+                            detections.boxes = tracker.boxes
+                    detected = detections.detected
+                    annotated_frame = detections.draw(plate)
+                else:
+                    # Run YOLO detection every `detect_every` frames, reuse (or track) the boxes in between
+                    run_yolo = results is None or frame_index % config.detect_every == 0
+                    if config.tracking_enabled and not run_yolo:
+                        run_yolo = tracker.update(plate) is None  # plate lost or scene changed
+                    if run_yolo:
+                        detect_started = time.perf_counter()
+                        results, detected = detect_food(yolo_model, plate)
+                        blackbox.timing("detect", time.perf_counter() - detect_started)
+                        if publisher is not None or config.tracking_enabled or blackbox.enabled:
+                            detections = Detections.from_results(yolo_model, results, config.food_labels)
+                            blackbox.detections(detections)
+                        if config.tracking_enabled:
+                            tracker.reset(detections.boxes, tracker.thumb(plate))
+                    if config.tracking_enabled:
+                        detections.boxes = tracker.boxes
+                        annotated_frame = detections.draw(plate)
+                    else:
+                        annotated_frame = annotate_detections(results, plate)
+                frame_index += 1
+                if plate is not frame:
+                    if annotated_frame is not plate:
+                        plate[:] = annotated_frame
+                    annotated_frame = draw_roi(frame, roi)
+
+                # Show annotated frame instead of plain frame
+                display_frame = cv2.resize(annotated_frame, (config.image_width, config.image_height))
+                display_frame = draw_code_box(display_frame, code_text)
+                if not detected:
+                    cv2.putText(display_frame, "NO FOOD DETECTED", (20, 100),
+                                cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 3, cv2.LINE_AA)
+                if motion_gate.idle:
+                    cv2.putText(display_frame, "IDLE", (20, 150),
+                                cv2.FONT_HERSHEY_SIMPLEX, 1, (200, 200, 200), 2, cv2.LINE_AA)
+                cv2.imshow(WINDOW_NAME, display_frame)
 
             key = cv2.waitKey(1) & 0xFF
+            if key != 0xFF:
+                motion_gate.poke()
+                blackbox.key(key, code_text)
 
             # Handle alphanumeric input and backspace
             if 32 <= key <= 126:  # Printable characters
@@ -176,43 +260,38 @@ def main():
             elif key == 13:  # Enter
                 item_code = code_text.strip()
                 logging.info(f"🔸 Capturing image with code: {item_code}")
-                for _ in range(2): cap.read()
-                ret, frame = cap.read()
-                timestamp = datetime.now().strftime("%b %-d, %Y %-I:%M:%S %p")
-                safe_code = item_code.replace(" ", "_") if item_code else ""
-                filename = (f"captured_{timestamp.replace(':', '-')}_{safe_code}_{AI_LABEL}.jpg"
-                            if item_code else
-                            f"captured_{timestamp.replace(':', '-')}_{AI_LABEL}.jpg")
-                full_path = os.path.join(PHOTO_DIR, filename)
-                cv2.imwrite(full_path, frame)
-                logging.info(f"✅ Image saved: {full_path}")
-                play_success_sound()
-
-                current_hash = compute_image_hash(full_path)
-                if current_hash == last_image_hash:
-                    logging.info("⚠️ Duplicate image detected. Skipping send.")
-                    os.remove(full_path)
+                frame, jpeg, score, burst_size = capture_burst(cap, recent_frames, config.burst_after,
+                                                               config.roi, still_size)
+                if frame is None:
+                    logging.error("❌ Camera frame not available.")
                     code_text = ""
                     continue
-                last_image_hash = current_hash
-
-                description = 'Chinese Dragon Cafe - Milagiriya Branch'
-                caption_parts = []
-                if item_code:
-                    caption_parts.append(f"Order Number: {item_code}")
-                caption_parts.append(description)
-                caption_parts.append(f"Captured at {timestamp}")
-
-                # Launch AI analysis and Telegram sending in background
-                threading.Thread(
-                    target=analyze_and_send,
-                    args=(full_path, caption_parts),
-                    daemon=True
-                ).start()
-                logging.info("📤 AI analysis and Telegram upload started in background.")
+                logging.info(f"🎯 Sharpest of {burst_size} frames (score {score:.0f})")
+                if clamp_roi(config.roi, frame.shape) is not None:
+                    jpeg = None  # the camera's JPEG is the full frame; a crop must be re-encoded
+                frame = roi_view(frame, config.roi)
+                play_success_sound()
+
+                if encoder is not None:
+                    # Encoding, dedupe, pre-screen and upload happen in the encoder process
+                    latest = detector.latest
+                    if encoder.submit(frame, item_code, latest.food_conf, latest.dish, jpeg):
+                        logging.info("📦 Capture handed to the encoder process.")
+                else:
+                    food_conf, dish = (food_confidence(yolo_model, results, config.food_labels)
+                                       if config.prescreen_enabled else (0.0, None))
+                    captures.submit({"frame": frame, "jpeg": jpeg, "item_code": item_code,
+                                     "food_conf": food_conf, "dish": dish})
 
                 code_text = ""
-                time.sleep(COOLDOWN_SECONDS)
+                time.sleep(config.cooldown_seconds)
+                blackbox.skip()  # the cooldown is not a slow frame
+
+            elif key == PROFILE_KEY:
+                request_profile()
+
+            elif key == BLACKBOX_KEY:
+                blackbox.request("hotkey", force=True)
 
             elif key == 27:  # ESC
                 logging.info("👋 Exiting...")
@@ -221,9 +300,47 @@ def main():
     except KeyboardInterrupt:
         logging.info("👋 Exiting...")
 
+    except Exception:
+        logging.exception("💥 Capture loop crashed.")
+        blackbox.dump("crash", force=True)
+        raise
+
+    finally:
+        profiler.close()
+        blackbox.close()
+        watcher.stop()
+        cap.release()
+        cv2.destroyAllWindows()
+        if captures is not None:
+            captures.close()
+        reanalyzer.stop()
+        if collector is not None:
+            collector.stop()
+        if detector is not None:
+            detector.close()
+            encoder.close()
+        if publisher is not None:
+            publisher.close()
+
+def setup_roi():
+    """Grab one frame, let the user drag the plate zone and store it in the config file."""
+    cap = open_frame_source(config.camera_source, config.image_width, config.image_height)
+    try:
+        ret, frame = cap.read()
+        if not ret or frame is None:
+            logging.error("❌ Camera frame not available.")
+            return
+        roi = select_roi(frame.copy())
+        if roi is None:
+            logging.info("📐 ROI selection cancelled.")
+            return
+        save_roi(config_path(), roi)
     finally:
         cap.release()
         cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if "--setup-roi" in sys.argv[1:]:
+        setup_roi()
+    else:
+        main()
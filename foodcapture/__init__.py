@@ -0,0 +1 @@
+"""Shared capture, analysis and delivery code used by the food-capture scripts."""
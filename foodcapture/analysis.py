@@ -0,0 +1,136 @@
+"""Structured food-quality results.
+
+The OpenAI analysis is requested as JSON constrained by ``RESPONSE_FORMAT``
+and parsed into a ``FoodQuality`` record. The rating is an ``IntEnum`` so
+sidecars, batch CSVs and the capture index store a small integer instead of
+free text, and reporting can filter and average without regexes. The
+caption text is rendered from the record in the same layout as before.
+"""
+import re
+import json
+from enum import IntEnum
+from dataclasses import dataclass, asdict
+
+
+class Rating(IntEnum):
+    BAD = 0
+    NORMAL = 1
+    GOOD = 2
+    EXCELLENT = 3
+
+    @property
+    def emoji(self):
+        return "🔴🟠🟢🔵"[self]
+
+    @property
+    def label(self):
+        return self.name.lower()
+
+
+PROMPT = """You are a food inspector AI. Briefly analyze this food photo.
+Fill every field with one short phrase; use 'None' for unusual if nothing stands out.
+Rate the plate as bad, normal, good or excellent."""
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string", "description": "one short line"},
+        "color": {"type": "string", "description": "one word or phrase"},
+        "shape_size": {"type": "string", "description": "one word or phrase"},
+        "presentation": {"type": "string", "description": "short phrase"},
+        "unusual": {"type": "string", "description": "short phrase or 'None'"},
+        "rating": {"type": "string", "enum": [r.label for r in Rating]},
+    },
+    "required": ["summary", "color", "shape_size", "presentation", "unusual", "rating"],
+    "additionalProperties": False,
+}
+
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "food_quality", "strict": True, "schema": SCHEMA},
+}
+
+_TEXT_FIELDS = {
+    "summary": "summary", "color": "color", "shape/size": "shape_size",
+    "presentation": "presentation", "unusual": "unusual", "rating": "rating",
+}
+_LINE_RE = re.compile(r"^\s*([A-Za-z/]+)\s*:\s*(.+?)\s*$", re.MULTILINE)
+
+
+def parse_rating(value):
+    """Rating from a label ('good'), a number, or free text containing a label."""
+    if isinstance(value, Rating):
+        return value
+    if isinstance(value, int):
+        return Rating(value)
+    words = re.findall(r"[a-z]+", str(value).lower())
+    for word in words:
+        if word.upper() in Rating.__members__:
+            return Rating[word.upper()]
+    raise ValueError(f"No rating in {value!r}")
+
+
+@dataclass(slots=True, frozen=True)
+class FoodQuality:
+    summary: str
+    color: str
+    shape_size: str
+    presentation: str
+    unusual: str
+    rating: Rating
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            summary=str(data.get("summary", "")),
+            color=str(data.get("color", "")),
+            shape_size=str(data.get("shape_size", "")),
+            presentation=str(data.get("presentation", "")),
+            unusual=str(data.get("unusual", "")),
+            rating=parse_rating(data["rating"]),
+        )
+
+    @classmethod
+    def from_json(cls, content):
+        return cls.from_dict(json.loads(content))
+
+    @classmethod
+    def from_text(cls, text):
+        """Parse the older 'Summary: ... / Rating: good 🟢' free-text reply."""
+        data = {}
+        for key, value in _LINE_RE.findall(text):
+            name = _TEXT_FIELDS.get(key.lower())
+            if name:
+                data[name] = value
+        if "rating" not in data:
+            raise ValueError("No Rating line in analysis text")
+        return cls.from_dict(data)
+
+    @classmethod
+    def from_stored(cls, value):
+        """Load what a sidecar or index holds: a dict, or legacy free text."""
+        if value is None:
+            return None
+        if isinstance(value, dict):
+            return cls.from_dict(value)
+        try:
+            return cls.from_text(value)
+        except ValueError:
+            return None
+
+    @property
+    def is_unusual(self):
+        return self.unusual.strip().lower() not in ("", "none", "n/a")
+
+    def to_dict(self):
+        data = asdict(self)
+        data["rating"] = int(self.rating)
+        return data
+
+    def caption(self):
+        return (f"Summary: {self.summary}\n"
+                f"Color: {self.color}\n"
+                f"Shape/Size: {self.shape_size}\n"
+                f"Presentation: {self.presentation}\n"
+                f"Unusual: {self.unusual}\n"
+                f"Rating: {self.rating.label} {self.rating.emoji}")
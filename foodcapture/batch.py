@@ -0,0 +1,269 @@
+"""Offline batch analysis over the captured image archive.
+
+Walks the photo directory (optionally limited to a date range), runs YOLO
+detection and/or the OpenAI analysis on every image with a bounded worker
+pool, and appends one row per image to a CSV file. The CSV is also the
+checkpoint: rerunning with the same output and prompt skips images that
+already have a row with everything this run produces (the analysis for this
+prompt, detection with ``--detect``), so an interrupted run resumes where it
+stopped; rows with an error or missing columns are redone and a new row is
+appended. Before resuming and after each run the file is compacted to the
+latest row per image and prompt, so neither the CSV nor the Parquet copy
+(give an output ending in ``.parquet``, needs pyarrow) holds an image twice.
+
+    python -m foodcapture.batch --out scores.csv --since 2026-01-01 --workers 4 --rate 2
+    python -m foodcapture.batch --out rescore.csv --prompt-file new_prompt.txt
+
+With the built-in prompt the structured FoodQuality fields become columns
+(``rating`` as 0-3). A custom free-text prompt keeps the raw reply in
+``analysis`` and fills the columns only if it follows the
+``Summary: / Rating:`` layout.
+"""
+import os
+import csv
+import time
+import json
+import hashlib
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+from foodcapture.analysis import FoodQuality, PROMPT, SCHEMA
+from foodcapture.delivery import RateLimiter, IMAGE_EXTENSIONS
+
+QUALITY_COLUMNS = ["rating", "summary", "color", "shape_size", "presentation", "unusual"]
+COLUMNS = (["image", "captured_at", "item_code", "prompt_hash", "model", "food_detected", "labels"]
+           + QUALITY_COLUMNS + ["analysis", "error", "analyzed_at"])
+CAPTURE_TIME_FORMAT = "%b %d, %Y %I:%M:%S %p"
+
+
+def prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode()).hexdigest()[:12]
+
+
+def capture_time(image_path):
+    """Capture time from the filename written by save_capture(), else the file mtime."""
+    from foodcapture.core import parse_capture_filename
+    timestamp, _ = parse_capture_filename(image_path)
+    try:
+        return datetime.strptime(timestamp, CAPTURE_TIME_FORMAT)
+    except ValueError:
+        return datetime.fromtimestamp(os.path.getmtime(image_path))
+
+
+def iter_images(photo_dir, since=None, until=None):
+    """Yield image paths in photo_dir whose capture time is within [since, until)."""
+    with os.scandir(photo_dir) as entries:
+        for entry in sorted(entries, key=lambda e: e.name):
+            if not entry.is_file() or not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if since or until:
+                taken = capture_time(entry.path)
+                if (since and taken < since) or (until and taken >= until):
+                    continue
+            yield entry.path
+
+
+def load_checkpoint(out_path, prompt_id, analyze=True, detect=False):
+    """Return the set of images that already have every column this run fills.
+
+    A row counts only if it has no error, carries an analysis made with this
+    prompt (when analyzing) and a detection result (when detecting), so a
+    ``--detect --no-analyze`` run never hides images from a later analysis run.
+    """
+    if not os.path.exists(out_path):
+        return set()
+    with open(out_path, newline="") as f:
+        return {row["image"] for row in csv.DictReader(f)
+                if not row["error"]
+                and (not analyze or (row["prompt_hash"] == prompt_id and row["model"]))
+                and (not detect or row["food_detected"] != "")}
+
+
+def _row_key(row):
+    # Detection-only rows (no model) must not replace an analysis made with the same prompt.
+    return row["image"], row["prompt_hash"] if row["model"] else None
+
+
+def compact(out_path):
+    """Keep only the latest row per image and prompt; returns the number of rows dropped."""
+    if not os.path.exists(out_path):
+        return 0
+    latest, rows = {}, 0
+    with open(out_path, newline="") as f:
+        for rows, row in enumerate(csv.DictReader(f), 1):
+            latest[_row_key(row)] = rows - 1
+    dropped = rows - len(latest)
+    if not dropped:
+        return 0
+    keep = set(latest.values())
+    tmp_path = out_path + ".tmp"
+    with open(out_path, newline="") as f, open(tmp_path, "w", newline="") as out:
+        reader = csv.DictReader(f)
+        writer = csv.DictWriter(out, fieldnames=reader.fieldnames)
+        writer.writeheader()
+        writer.writerows(row for i, row in enumerate(reader) if i in keep)
+    os.replace(tmp_path, out_path)
+    logging.info(f"🧹 {dropped} superseded rows removed from {out_path}")
+    return dropped
+
+
+class BatchAnalyzer:
+    """Runs detection/analysis for one image at a time; safe to share across worker threads."""
+
+    def __init__(self, prompt=None, detect=False, analyze=True, rate=1.0, max_retries=5):
+        from foodcapture import core
+        self.core = core
+        self.prompt = prompt  # None -> built-in structured analysis
+        self.prompt_id = prompt_hash(prompt if prompt else PROMPT + json.dumps(SCHEMA, sort_keys=True))
+        self.analyze = analyze
+        self.limiter = RateLimiter(rate)
+        self.max_retries = max_retries
+        self.yolo_model = None
+        self._yolo_lock = threading.Lock()
+        if detect:
+            from foodcapture.quantize import load_detector
+            self.yolo_model = load_detector(core.config)
+
+    def _detect(self, image_path):
+        import cv2
+        frame = cv2.imread(image_path)
+        if frame is None:
+            raise ValueError("unreadable image")
+        with self._yolo_lock:  # one model instance, not thread-safe
+            results, detected = self.core.detect_food(self.yolo_model, frame)
+        labels = sorted({self.yolo_model.names[int(box.cls[0])] for box in results[0].boxes})
+        return detected, labels
+
+    def _analyze(self, image_path):
+        import openai
+        for attempt in range(self.max_retries):
+            self.limiter.wait()
+            try:
+                if self.prompt is None:
+                    return self.core.request_food_quality(image_path)
+                return self.core.request_image_analysis(image_path, self.prompt)
+            except openai.RateLimitError:
+                delay = 2 ** attempt
+                logging.warning(f"⏳ OpenAI rate limit, backing off {delay}s")
+                self.limiter.back_off(delay)
+        raise RuntimeError("rate limited after retries")
+
+    def process(self, image_path):
+        _, item_code = self.core.parse_capture_filename(image_path)
+        row = {
+            "image": os.path.basename(image_path),
+            "captured_at": capture_time(image_path).isoformat(timespec="seconds"),
+            "item_code": item_code,
+            "prompt_hash": self.prompt_id,
+            "model": self.core.config.openai_model if self.analyze else "",
+            "food_detected": "", "labels": "", "analysis": "", "error": "",
+            **dict.fromkeys(QUALITY_COLUMNS, ""),
+        }
+        try:
+            if self.yolo_model is not None:
+                detected, labels = self._detect(image_path)
+                row["food_detected"] = int(detected)
+                row["labels"] = "|".join(labels)
+            if self.analyze:
+                result = self._analyze(image_path)
+                if isinstance(result, FoodQuality):
+                    row.update(result.to_dict())
+                else:
+                    row["analysis"] = result
+                    quality = FoodQuality.from_stored(result)
+                    if quality is not None:
+                        row.update(quality.to_dict())
+        except Exception as e:
+            row["error"] = f"{type(e).__name__}: {e}"
+        row["analyzed_at"] = datetime.now().isoformat(timespec="seconds")
+        return row
+
+
+def run_batch(photo_dir, out_path, analyzer, workers=4, since=None, until=None):
+    """Analyze every pending image, appending rows to out_path as they finish."""
+    compact(out_path)
+    done = load_checkpoint(out_path, analyzer.prompt_id, analyzer.analyze, analyzer.yolo_model is not None)
+    pending = (p for p in iter_images(photo_dir, since, until) if os.path.basename(p) not in done)
+    if done:
+        logging.info(f"↩️ Resuming: {len(done)} images already analyzed with prompt {analyzer.prompt_id}")
+
+    new_file = not os.path.exists(out_path)
+    processed = errors = 0
+    started = time.monotonic()
+    with open(out_path, "a", newline="") as f, ThreadPoolExecutor(max_workers=workers) as pool:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        if new_file:
+            writer.writeheader()
+        in_flight = set()
+        exhausted = False
+        while in_flight or not exhausted:
+            # Keep at most 2x workers queued so memory stays flat over huge archives.
+            while not exhausted and len(in_flight) < workers * 2:
+                image_path = next(pending, None)
+                if image_path is None:
+                    exhausted = True
+                else:
+                    in_flight.add(pool.submit(analyzer.process, image_path))
+            if not in_flight:
+                break
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                row = future.result()
+                writer.writerow(row)
+                processed += 1
+                errors += bool(row["error"])
+            f.flush()  # checkpoint
+            if processed and processed % 100 == 0:
+                rate = processed / (time.monotonic() - started)
+                logging.info(f"📊 {processed} images ({rate:.1f}/s), {errors} errors")
+    compact(out_path)  # redone images now have two rows
+    logging.info(f"✅ Batch done: {processed} images, {errors} errors -> {out_path}")
+    return processed, errors
+
+
+def write_parquet(csv_path, parquet_path):
+    try:
+        import pyarrow.csv as pa_csv
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+    pq.write_table(pa_csv.read_csv(csv_path), parquet_path)
+    logging.info(f"🧱 Parquet written: {parquet_path}")
+
+
+def _parse_date(value):
+    return datetime.fromisoformat(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch-analyze stored captures.")
+    parser.add_argument("--dir", help="Photo directory (default: config photo_dir)")
+    parser.add_argument("--out", required=True, help="Results file (.csv, or .parquet for a Parquet copy)")
+    parser.add_argument("--since", type=_parse_date, help="Only captures at or after this date/time (ISO)")
+    parser.add_argument("--until", type=_parse_date, help="Only captures before this date/time (ISO)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=1.0, help="Max OpenAI requests per second")
+    parser.add_argument("--prompt-file", help="Analyze with this prompt instead of the built-in one")
+    parser.add_argument("--detect", action="store_true", help="Also run YOLO detection")
+    parser.add_argument("--no-analyze", action="store_true", help="Skip the OpenAI analysis")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s')
+    from foodcapture.core import config
+    prompt = None
+    if args.prompt_file:
+        with open(args.prompt_file) as f:
+            prompt = f.read()
+
+    csv_path = args.out[:-len(".parquet")] + ".csv" if args.out.endswith(".parquet") else args.out
+    analyzer = BatchAnalyzer(prompt, detect=args.detect, analyze=not args.no_analyze, rate=args.rate)
+    run_batch(args.dir or config.photo_dir, csv_path, analyzer, args.workers, args.since, args.until)
+    if csv_path != args.out:
+        write_parquet(csv_path, args.out)
+
+
+if __name__ == "__main__":
+    main()
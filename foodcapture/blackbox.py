@@ -0,0 +1,365 @@
+"""Black-box recorder: the last seconds of the kiosk, kept in memory and dumped on trouble.
+
+While the kiosk runs, ``BlackBox`` keeps a rolling window
+(``blackbox_seconds``, at most ``blackbox_max_mb``) of:
+
+* preview frames, downscaled to ``blackbox_width`` and JPEG-compressed, at
+  most ``blackbox_fps`` per second
+* keystrokes (order number edits, Enter, ESC) with the order number so far
+* detection results, loop times and capture-stage timings
+* log lines
+
+The window is written to ``blackbox_dir`` when an ERROR is logged, when a
+loop iteration takes longer than ``blackbox_slow_ms``, on Ctrl+B in the
+preview window or on ``kill -USR2 <pid>``. Automatic dumps are at least
+``DUMP_COOLDOWN`` seconds apart and only the newest ``blackbox_keep`` files
+are kept. A dump is one gzip file: a JSON line (metadata, the hot config and
+the event list) followed by the frame JPEGs, as in the collector batches::
+
+    python -m foodcapture.blackbox info blackbox/blackbox_20260314_123012_slow.bbx
+    python -m foodcapture.blackbox frames <dump> --out ./frames
+    python -m foodcapture.blackbox replay <dump> [--detect] [--stages encode,dedupe,record]
+
+``replay`` applies the recorded hot config and feeds the events back in
+order: frames (through YOLO with ``--detect``), keystrokes and the captures
+they made, through the given pipeline stages run inline. It then reports
+the recorded and replayed timings side by side. The default stages stay
+local (nothing is sent).
+"""
+import os
+import io
+import gzip
+import json
+import time
+import logging
+import argparse
+import threading
+from collections import Counter, deque
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from foodcapture.prescreen import downscale
+
+FORMAT_VERSION = 1
+SUFFIX = ".bbx"
+FRAME_QUALITY = 70
+DUMP_COOLDOWN = 60  # seconds between automatic (error / slow) dumps
+REPLAY_STAGES = "encode,dedupe,portion,record"  # local only; add analyze,deliver to include the network
+
+
+# ========== FILE FORMAT ==========
+def encode_session(meta, events):
+    """gzip(JSON line of meta + [t, kind, data, size] events, then the concatenated blobs)."""
+    start = events[0][0] if events else 0.0
+    header = {"version": FORMAT_VERSION, "meta": meta,
+              "events": [[round(t - start, 4), kind, data, len(blob)] for t, kind, data, blob in events]}
+    payload = io.BytesIO()
+    payload.write(json.dumps(header, ensure_ascii=False).encode() + b"\n")
+    for *_, blob in events:
+        payload.write(blob)
+    return gzip.compress(payload.getvalue(), compresslevel=1)
+
+
+def decode_session(body):
+    """(meta, [(t, kind, data, blob)]) from an encode_session body."""
+    data = gzip.decompress(body)
+    end = data.index(b"\n")
+    header = json.loads(data[:end])
+    if header.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported black-box format {header.get('version')}")
+    events, offset = [], end + 1
+    for t, kind, item, size in header["events"]:
+        events.append((t, kind, item, data[offset:offset + size]))
+        offset += size
+    return header["meta"], events
+
+
+def load_session(path):
+    with open(path, "rb") as f:
+        return decode_session(f.read())
+
+
+# ========== RECORDER ==========
+class _LogHandler(logging.Handler):
+    def __init__(self, blackbox):
+        super().__init__(logging.INFO)
+        self.blackbox = blackbox
+
+    def emit(self, record):
+        try:
+            self.blackbox.log(record.levelname, record.getMessage())
+            if record.levelno >= logging.ERROR:
+                self.blackbox.request("error")
+        except Exception:
+            self.handleError(record)
+
+
+class BlackBox:
+    """Memory-bounded rolling recording of the capture loop; see the module docstring."""
+
+    def __init__(self, config):
+        self.config = config
+        self._events = deque()  # (monotonic time, kind, data, blob)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._last_frame = float("-inf")
+        self._last_tick = None
+        self._last_dump = float("-inf")
+        self._requested = None  # (reason, forced) for the next tick()
+        self._writers = []
+
+    @property
+    def enabled(self):
+        return self.config.blackbox_enabled
+
+    def log_handler(self):
+        """A logging.Handler that records log lines and asks for a dump on ERROR."""
+        return _LogHandler(self)
+
+    def _add(self, kind, data, blob=b""):
+        now = time.monotonic()
+        with self._lock:
+            self._events.append((now, kind, data, blob))
+            self._bytes += len(blob)
+            horizon = now - self.config.blackbox_seconds
+            budget = self.config.blackbox_max_mb * 1024 * 1024
+            while self._events and (self._events[0][0] < horizon or self._bytes > budget):
+                self._bytes -= len(self._events.popleft()[3])
+
+    def __len__(self):
+        return len(self._events)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    # ---- recording (cheap no-ops while disabled) ----
+    def frame(self, frame, index=0):
+        """Record a preview frame if one is due at blackbox_fps (call before drawing on it)."""
+        now = time.monotonic()
+        if not self.enabled or now - self._last_frame < 1.0 / self.config.blackbox_fps:
+            return
+        self._last_frame = now
+        small = downscale(frame, self.config.blackbox_width)
+        ok, jpeg = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, FRAME_QUALITY])
+        if ok:
+            self._add("frame", {"index": index, "shape": list(frame.shape[:2])}, jpeg.tobytes())
+
+    def key(self, key, code_text):
+        """Record a keystroke with the order number as it was before the key."""
+        if self.enabled:
+            self._add("key", {"key": key, "code": code_text})
+
+    def detections(self, detections):
+        if self.enabled:
+            self._add("detect", detections.to_dict())
+
+    def timing(self, name, seconds):
+        """Record how long a stage took (also usable as a Pipeline listener)."""
+        if self.enabled:
+            self._add("timing", {"stage": name, "ms": round(seconds * 1000, 2)})
+
+    def log(self, level, message):
+        if self.enabled:
+            self._add("log", {"level": level, "message": message})
+
+    # ---- dumps ----
+    def request(self, reason="hotkey", force=False):
+        """Ask for a dump; written on the loop's next tick(). Safe from signal handlers and other threads."""
+        if self._requested is None or force:
+            self._requested = (reason, force)
+
+    def tick(self):
+        """Call once per loop iteration: records the loop time and writes requested dumps."""
+        now = time.monotonic()
+        if self._last_tick is not None and self.enabled:
+            elapsed = now - self._last_tick
+            self._add("timing", {"stage": "loop", "ms": round(elapsed * 1000, 2)})
+            if self.config.blackbox_slow_ms and elapsed * 1000 > self.config.blackbox_slow_ms:
+                logging.warning(f"🐢 Slow frame: {elapsed * 1000:.0f} ms")
+                self.request("slow")
+        self._last_tick = now
+        if self._requested is not None:
+            reason, force = self._requested
+            self._requested = None
+            self.dump(reason, force)
+
+    def skip(self):
+        """Do not count the time since the last tick (e.g. the deliberate capture cooldown)."""
+        self._last_tick = None
+
+    def dump(self, reason, force=False):
+        """Write the current window in the background; returns the path, or None if skipped."""
+        now = time.monotonic()
+        if not self.enabled or not self._events or (not force and now - self._last_dump < DUMP_COOLDOWN):
+            return None
+        self._last_dump = now
+        with self._lock:
+            events = list(self._events)
+        meta = {
+            "reason": reason,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "pid": os.getpid(),
+            "config": {name: getattr(self.config, name) for name in self.config.hot_fields()},
+        }
+        path = os.path.join(self.config.blackbox_dir,
+                            f"blackbox_{datetime.now():%Y%m%d_%H%M%S}_{reason}{SUFFIX}")
+        writer = threading.Thread(target=self._write, args=(path, meta, events), name="blackbox-dump", daemon=True)
+        self._writers = [w for w in self._writers if w.is_alive()] + [writer]
+        writer.start()
+        return path
+
+    def _write(self, path, meta, events):
+        os.makedirs(self.config.blackbox_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(encode_session(meta, events))
+        os.replace(tmp_path, path)
+        dumps = sorted(name for name in os.listdir(self.config.blackbox_dir) if name.endswith(SUFFIX))
+        for name in dumps[:-self.config.blackbox_keep]:
+            os.remove(os.path.join(self.config.blackbox_dir, name))
+        logging.info(f"📼 Black box ({meta['reason']}, {len(events)} events) written: {path}")
+
+    def close(self):
+        """Wait for dumps still being written."""
+        for writer in self._writers:
+            writer.join()
+
+
+# ========== INSPECT / REPLAY ==========
+def _stage_ms(events):
+    timings = {}
+    for _, kind, data, _ in events:
+        if kind == "timing":
+            timings.setdefault(data["stage"], []).append(data["ms"])
+    return timings
+
+
+def _summary(values):
+    ordered = sorted(values)
+    return (f"n={len(ordered):<5} p50={ordered[len(ordered) // 2]:8.1f} "
+            f"p95={ordered[int(len(ordered) * 0.95)]:8.1f} max={ordered[-1]:8.1f} ms")
+
+
+def info(path):
+    meta, events = load_session(path)
+    duration = events[-1][0] if events else 0.0
+    kinds = Counter(kind for _, kind, _, _ in events)
+    print(f"{path}\n  reason {meta['reason']}, written {meta['created']}, {duration:.1f}s, "
+          + ", ".join(f"{count} {kind}" for kind, count in kinds.items()))
+    for stage, values in _stage_ms(events).items():
+        print(f"  {stage:<10} {_summary(values)}")
+    keys = [data for _, kind, data, _ in events if kind == "key"]
+    if keys:
+        print("  keys: " + " ".join(_key_name(k["key"]) for k in keys))
+    for t, kind, data, _ in events:
+        if kind == "log" and data["level"] in ("WARNING", "ERROR", "CRITICAL"):
+            print(f"  {t:7.2f}s {data['message']}")
+
+
+def _key_name(key):
+    return {13: "⏎", 8: "⌫", 27: "ESC", 9: "TAB"}.get(key, chr(key) if 32 <= key <= 126 else f"<{key}>")
+
+
+def export_frames(path, out_dir):
+    _, events = load_session(path)
+    os.makedirs(out_dir, exist_ok=True)
+    count = 0
+    for t, kind, data, blob in events:
+        if kind == "frame":
+            with open(os.path.join(out_dir, f"{count:05d}_{t:08.3f}s_frame{data['index']}.jpg"), "wb") as f:
+                f.write(blob)
+            count += 1
+    print(f"{count} frames -> {out_dir}")
+
+
+def replay(path, stages=REPLAY_STAGES, detect=False, realtime=False, photo_dir=None):
+    """Feed a dump back through detection and the capture stages; returns the replayed timings."""
+    import tempfile
+    from foodcapture.core import config, detect_food, DuplicateFilter
+    from foodcapture.pipeline import Pipeline, Stage
+    from foodcapture.prescreen import ReferenceLibrary
+    from foodcapture.workers import Detections
+
+    meta, events = load_session(path)
+    for name, value in meta["config"].items():
+        if hasattr(config, name):
+            setattr(config, name, value)
+    config.photo_dir = photo_dir or tempfile.mkdtemp(prefix="foodcapture-replay-")
+    os.makedirs(config.photo_dir, exist_ok=True)
+    yolo_model = None
+    if detect:
+        from foodcapture.quantize import load_detector
+        yolo_model = load_detector(config)
+    # Inline stages: one capture at a time, in recorded order.
+    pipeline = Pipeline([Stage(name) for name in stages.split(",")], config, duplicates=DuplicateFilter(),
+                        references=ReferenceLibrary(config.prescreen_reference_dir))
+    replayed = {}
+    pipeline.listeners.append(lambda stage, seconds: replayed.setdefault(stage, []).append(seconds * 1000))
+
+    code_text, frame, detections, captures = "", None, Detections(), 0
+    started = time.monotonic()
+    for t, kind, data, blob in events:
+        if realtime:
+            time.sleep(max(0.0, t - (time.monotonic() - started)))
+        if kind == "frame":
+            frame = cv2.imdecode(np.frombuffer(blob, np.uint8), cv2.IMREAD_COLOR)
+            if yolo_model is not None:
+                t0 = time.perf_counter()
+                results, _ = detect_food(yolo_model, frame)
+                replayed.setdefault("detect", []).append((time.perf_counter() - t0) * 1000)
+                detections = Detections.from_results(yolo_model, results, config.food_labels)
+        elif kind == "detect" and yolo_model is None:
+            detections = Detections(**data)
+        elif kind == "key":
+            key = data["key"]
+            if 32 <= key <= 126:
+                code_text += chr(key)
+            elif key == 8:
+                code_text = code_text[:-1]
+            elif key == 13 and frame is not None:
+                pipeline.submit({"frame": frame.copy(), "item_code": code_text.strip(),
+                                 "food_conf": detections.food_conf, "dish": detections.dish})
+                captures += 1
+                code_text = ""
+    pipeline.close()
+
+    recorded = _stage_ms(events)
+    print(f"Replayed {path}: {sum(kind == 'frame' for _, kind, _, _ in events)} frames, "
+          f"{captures} captures -> {config.photo_dir}")
+    for stage in dict.fromkeys([*recorded, *replayed]):
+        print(f"  {stage:<10} recorded {_summary(recorded[stage]) if stage in recorded else '-':<45} "
+              f"replayed {_summary(replayed[stage]) if stage in replayed else '-'}")
+    return replayed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay black-box dumps.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    inf = sub.add_parser("info", help="Summary: events, timings, keys, warnings")
+    inf.add_argument("dumps", nargs="+")
+    frm = sub.add_parser("frames", help="Export the recorded frames as JPEGs")
+    frm.add_argument("dump")
+    frm.add_argument("--out", default="blackbox_frames")
+    rep = sub.add_parser("replay", help="Feed a dump back through detection and the capture stages")
+    rep.add_argument("dump")
+    rep.add_argument("--stages", default=REPLAY_STAGES, help=f"Comma-separated pipeline stages ({REPLAY_STAGES})")
+    rep.add_argument("--detect", action="store_true", help="Run YOLO on the frames instead of the recorded boxes")
+    rep.add_argument("--realtime", action="store_true", help="Keep the recorded pacing")
+    rep.add_argument("--dir", help="Photo dir for the replayed captures (default: a temp dir)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s')
+    if args.command == "info":
+        for path in args.dumps:
+            info(path)
+    elif args.command == "frames":
+        export_frames(args.dump, args.out)
+    else:
+        replay(args.dump, args.stages, args.detect, args.realtime, args.dir)
+
+
+if __name__ == "__main__":
+    main()
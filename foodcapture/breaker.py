@@ -0,0 +1,64 @@
+"""Circuit breaker for a remote dependency (the OpenAI analysis).
+
+``closed``: calls go through. A failure, or a success slower than
+``breaker_slow_seconds``, counts against the breaker; ``breaker_failures``
+in a row trip it ``open``. While open, ``allow()`` says no immediately, so
+callers skip the call instead of waiting for a timeout. After
+``breaker_reset_seconds`` one caller is let through as a ``half-open``
+probe: a fast success closes the breaker, anything else opens it again.
+Thresholds are hot config keys.
+"""
+import time
+import logging
+import threading
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    def __init__(self, config, name="remote"):
+        self.config = config
+        self.name = name
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if the caller may make the call now (at most one probe while half-open)."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.config.breaker_reset_seconds:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+                logging.info(f"🔌 {self.name} circuit half-open, probing.")
+                return True
+            return self.state == CLOSED
+
+    def record(self, ok, seconds):
+        """Report the outcome of an allowed call and how long it took."""
+        slow = seconds > self.config.breaker_slow_seconds
+        with self._lock:
+            self._probing = False
+            if ok and not slow:
+                if self.state != CLOSED:
+                    logging.info(f"✅ {self.name} circuit closed again.")
+                self.state = CLOSED
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.config.breaker_failures:
+                if self.state != OPEN:
+                    self.trips += 1
+                    reason = f"{seconds:.1f}s call" if ok else f"{self.failures} failures"
+                    logging.warning(f"⚡ {self.name} circuit open ({reason}); "
+                                    f"skipping it for {self.config.breaker_reset_seconds:.0f}s.")
+                self.state = OPEN
+                self._opened_at = time.monotonic()
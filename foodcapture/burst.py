@@ -0,0 +1,114 @@
+"""Pick the sharpest frame from a short burst around the Enter keypress.
+
+The preview loop pushes every frame into a ``FrameRing``: a few preallocated
+slots that frames are copied into with ``np.copyto``, so keeping the recent
+past costs a memcpy per frame and no allocations (the frame source itself
+reuses one buffer, so frames must be copied to survive the next read).
+
+On Enter, the ring's frames plus a few freshly read ones are scored with
+``prescreen.sharpness`` (Laplacian variance on a 320px grayscale copy) and
+the sharpest is saved, so a plate that was still moving at the keypress
+does not end up blurred.
+
+With MJPEG passthrough each slot also remembers the camera's compressed
+frame (a reference, the source allocates a new one per read), so the chosen
+frame can be saved without re-encoding.
+
+A loop that does not read continuously (the terminal presets wait in
+``input()``) calls ``drop_stale`` first: the driver kept the frames from
+before the keypress queued, and those would otherwise be the burst.
+"""
+import numpy as np
+
+from foodcapture.prescreen import sharpness
+from foodcapture.roi import roi_view
+
+STALE_FRAMES = 4  # OpenCV's default V4L2 buffer count
+
+
+class FrameRing:
+    """Fixed number of preallocated frame slots, overwritten oldest-first."""
+
+    def __init__(self, size):
+        self.size = size
+        self._slots = []
+        self._jpegs = []
+        self._next = 0
+        self._count = 0
+
+    def push(self, frame, jpeg=None):
+        if self.size <= 0:
+            return
+        if not self._slots or self._slots[0].shape != frame.shape or len(self._slots) != self.size:
+            self._slots = [np.empty_like(frame) for _ in range(self.size)]
+            self._jpegs = [None] * self.size
+            self._next = self._count = 0
+        np.copyto(self._slots[self._next], frame)
+        self._jpegs[self._next] = jpeg
+        self._next = (self._next + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+
+    def resize(self, size):
+        if size != self.size:
+            self.size = size
+            self._slots = []
+            self._next = self._count = 0
+
+    def clear(self):
+        """Forget buffered frames (keeps the slots allocated)."""
+        self._next = self._count = 0
+
+    def _order(self):
+        start = (self._next - self._count) % self.size if self.size else 0
+        return [(start + i) % self.size for i in range(self._count)]
+
+    def frames(self):
+        """Buffered frames, oldest first (views into the ring; copy to keep)."""
+        return [self._slots[i] for i in self._order()]
+
+    def items(self):
+        """Buffered (frame, jpeg) pairs, oldest first; jpeg is None without passthrough."""
+        return [(self._slots[i], self._jpegs[i]) for i in self._order()]
+
+
+def drop_stale(cap, count=STALE_FRAMES):
+    """Read and discard the frames the camera queued while nobody was reading."""
+    for _ in range(count):
+        ret, _ = cap.read()
+        if not ret:
+            break
+
+
+def sharpest(frames, roi=None):
+    """Return (frame, score, index) of the frame whose ROI is sharpest."""
+    scores = [sharpness(roi_view(frame, roi)) for frame in frames]
+    best = int(np.argmax(scores))
+    return frames[best], scores[best], best
+
+
+def capture_burst(cap, ring, after, roi=None, still_size=None):
+    """Score the buffered frames plus `after` new reads.
+
+    With ``still_size`` (dual-resolution mode) the buffered preview frames are
+    too small to save, so only stills grabbed at that size are scored.
+
+    Returns (frame, jpeg, score, burst_size); jpeg is the camera's compressed
+    frame with MJPEG passthrough, else None.
+    """
+    if still_size:
+        candidates = cap.grab_stills(*still_size, max(1, after))
+    else:
+        candidates = ring.items()
+        # burst_after = 0 with an empty ring (burst_before = 0, terminal presets) still needs one read.
+        for _ in range(after if candidates else max(1, after)):
+            ret, frame = cap.read()
+            if ret and frame is not None:
+                # The source reuses its buffer, so keep a copy of each new read.
+                candidates.append((frame.copy(), cap.jpeg))
+    if not candidates:
+        return None, None, 0.0, 0
+    _, score, best = sharpest([frame for frame, _ in candidates], roi)
+    frame, jpeg = candidates[best]
+    # Frames from before this capture must not leak into the next burst.
+    ring.clear()
+    return frame, jpeg, score, len(candidates)
@@ -0,0 +1,233 @@
+"""Local frame bus: the kiosk publishes its camera feed for other programs on the same machine.
+
+Only one process can open the camera, so with ``bus_name`` set the kiosk
+copies every frame into a named ``multiprocessing.shared_memory`` block
+together with the latest detection results. Any number of subscribers (a
+KDS screen, a second QA display, ``camera_source = "bus:<name>"``) attach to
+it by name and read at their own rate, without a socket, a pipe or a copy:
+
+    from foodcapture.bus import FrameSubscriber
+
+    with FrameSubscriber("foodcapture") as bus:
+        for frame in bus.frames(max_fps=5):
+            show(frame.image, frame.meta["boxes"])
+
+``meta["boxes"]`` are ``(x1, y1, x2, y2, conf, label)`` in the coordinates of
+the published (full) frame, also when the kiosk detects only inside its ROI;
+``meta["roi"]`` is that plate zone as ``[x, y, w, h]`` (None without one).
+
+Layout: a small control header, one header per slot (seqlock style: the
+sequence number is zeroed while the slot is rewritten), a JSON metadata area
+per slot, then the pixel slots. The publisher cycles through ``slots``
+buffers, so a frame stays intact for ``slots - 1`` further publishes;
+``BusFrame.valid`` tells a reader whether it was overwritten meanwhile and
+``BusFrame.copy()`` returns a checked copy for longer processing.
+"""
+import json
+import time
+import logging
+from dataclasses import dataclass, field
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+DEFAULT_BUS_NAME = "foodcapture"
+MAGIC = 0x46434255530001  # "FCBUS", layout version 1
+CONTROL_WORDS = 8
+SLOT_WORDS = 8
+META_BYTES = 8192
+STALL_SECONDS = 2.0
+
+# bus names published by this process (they share its resource tracker registration)
+_published = set()
+
+# control words
+_MAGIC, _SLOTS, _SLOT_BYTES, _LATEST = 0, 1, 2, 3
+# slot header words
+_SEQ, _HEIGHT, _WIDTH, _CHANNELS, _STAMP_NS, _META_LEN = range(6)
+
+
+def _layout(slots, slot_bytes):
+    meta = (CONTROL_WORDS + slots * SLOT_WORDS) * 8
+    pixels = meta + slots * META_BYTES
+    return meta, pixels, pixels + slots * slot_bytes
+
+
+class _BusMemory:
+    """NumPy views over the bus segment."""
+
+    def __init__(self, shm, slots, slot_bytes):
+        self.shm = shm
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        meta, self._pixels, _ = _layout(slots, slot_bytes)
+        self.control = np.ndarray((CONTROL_WORDS,), np.uint64, shm.buf)
+        self.headers = np.ndarray((slots, SLOT_WORDS), np.uint64, shm.buf, CONTROL_WORDS * 8)
+        self.meta = np.ndarray((slots, META_BYTES), np.uint8, shm.buf, meta)
+
+    def image(self, slot, shape):
+        return np.ndarray(shape, np.uint8, self.shm.buf, self._pixels + slot * self.slot_bytes)
+
+    def release(self):
+        self.control = self.headers = self.meta = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # frames still held by the caller keep the old mapping alive
+
+
+class FramePublisher:
+    """Owner side of the bus; ``publish`` copies one frame plus JSON metadata into the next slot."""
+
+    def __init__(self, name=DEFAULT_BUS_NAME, max_shape=(720, 1280, 3), slots=4):
+        slot_bytes = int(np.prod(max_shape))
+        size = _layout(slots, slot_bytes)[2]
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a run that crashed; subscribers re-attach once frames stop.
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = name
+        _published.add(name)
+        self.mem = _BusMemory(shm, slots, slot_bytes)
+        self.mem.control[_SLOTS] = slots
+        self.mem.control[_SLOT_BYTES] = slot_bytes
+        self.mem.control[_MAGIC] = MAGIC  # last, so subscribers never see a half-set header
+        self.seq = 0
+        logging.info(f"📡 Frame bus '{name}' up: {slots} slots of {tuple(max_shape)}")
+
+    def publish(self, frame, meta=None):
+        if frame.nbytes > self.mem.slot_bytes:
+            raise ValueError(f"frame {frame.shape} does not fit the bus slots")
+        data = json.dumps(meta).encode() if meta else b""
+        if len(data) > META_BYTES:
+            data = b""
+        self.seq += 1
+        slot = (self.seq - 1) % self.mem.slots
+        header = self.mem.headers[slot]
+        header[_SEQ] = 0
+        np.copyto(self.mem.image(slot, frame.shape), frame)
+        self.mem.meta[slot, :len(data)] = np.frombuffer(data, np.uint8)
+        height, width = frame.shape[:2]
+        header[_HEIGHT:_META_LEN + 1] = (height, width, frame.shape[2] if frame.ndim == 3 else 0,
+                                         time.time_ns(), len(data))
+        header[_SEQ] = self.seq
+        self.mem.control[_LATEST] = self.seq
+        return self.seq
+
+    def close(self):
+        shm = self.mem.shm
+        self.mem.release()
+        shm.unlink()
+        _published.discard(self.name)
+
+
+@dataclass
+class BusFrame:
+    seq: int
+    timestamp: float
+    image: np.ndarray          # view into the bus; see valid / copy()
+    meta: dict = field(default_factory=dict)
+    _header: np.ndarray = field(default=None, repr=False)
+
+    @property
+    def valid(self):
+        """False once the publisher has reused this frame's slot."""
+        return int(self._header[_SEQ]) == self.seq
+
+    def copy(self):
+        """A private copy of the image, or None if the slot was overwritten while copying."""
+        image = self.image.copy()
+        return image if self.valid else None
+
+
+class FrameSubscriber:
+    """Reader side of the bus; attach by name, then ``latest``, ``wait`` or iterate ``frames``."""
+
+    def __init__(self, name=DEFAULT_BUS_NAME):
+        self.name = name
+        self.mem = None
+        self.last_seq = 0
+        self.mem = self._attach()
+
+    def _attach(self):
+        shm = shared_memory.SharedMemory(name=self.name)
+        if self.name not in _published:
+            # Before Python 3.13 attaching registers the segment with this process's
+            # resource tracker, which would unlink the publisher's bus when we exit.
+            resource_tracker.unregister(shm._name, "shared_memory")
+        control = np.ndarray((CONTROL_WORDS,), np.uint64, shm.buf)
+        ready = int(control[_MAGIC]) == MAGIC
+        slots, slot_bytes = int(control[_SLOTS]), int(control[_SLOT_BYTES])
+        del control
+        if not ready:
+            shm.close()
+            raise ConnectionError(f"frame bus '{self.name}' is not ready")
+        return _BusMemory(shm, slots, slot_bytes)
+
+    def _reattach(self):
+        try:
+            mem = self._attach()
+        except (FileNotFoundError, ConnectionError):
+            return
+        self.mem.release()
+        self.mem = mem
+        if int(self.mem.control[_LATEST]) < self.last_seq:
+            self.last_seq = 0  # publisher restarted
+
+    def latest(self):
+        """The newest intact frame, or None if nothing has been published yet."""
+        seq = int(self.mem.control[_LATEST])
+        if not seq:
+            return None
+        slot = (seq - 1) % self.mem.slots
+        header = self.mem.headers[slot]
+        if int(header[_SEQ]) != seq:
+            return None
+        height, width, channels, stamp_ns, meta_len = (int(v) for v in header[_HEIGHT:_META_LEN + 1])
+        shape = (height, width, channels) if channels else (height, width)
+        meta = bytes(self.mem.meta[slot, :meta_len])
+        frame = BusFrame(seq, stamp_ns / 1e9, self.mem.image(slot, shape), _header=header)
+        if not frame.valid:
+            return None
+        frame.meta = json.loads(meta) if meta else {}
+        return frame
+
+    def wait(self, timeout=None, poll=0.005):
+        """Block until a frame newer than the last one returned arrives; None on timeout."""
+        start = stalled_since = time.monotonic()
+        while True:
+            frame = self.latest()
+            if frame is not None and frame.seq > self.last_seq:
+                self.last_seq = frame.seq
+                return frame
+            now = time.monotonic()
+            if timeout is not None and now - start >= timeout:
+                return None
+            if now - stalled_since >= STALL_SECONDS:
+                self._reattach()
+                stalled_since = now
+            time.sleep(poll)
+
+    def frames(self, max_fps=None):
+        """Yield new frames forever, skipping any that arrive faster than ``max_fps``."""
+        interval = 1.0 / max_fps if max_fps else 0.0
+        while True:
+            frame = self.wait()
+            yield frame
+            if interval:
+                time.sleep(max(0.0, interval - (time.time() - frame.timestamp)))
+
+    def close(self):
+        if self.mem is not None:
+            self.mem.release()
+            self.mem = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
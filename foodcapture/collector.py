@@ -0,0 +1,500 @@
+"""Optional central collector for multi-branch deployments.
+
+Each kiosk still sends to Telegram itself; with ``collector_url`` set it
+also pushes every capture and its delivery record to a collector, which
+keeps one archive and one index for all branches::
+
+    python -m foodcapture.collector serve --dir ./collected --port 8090 --analyze 4
+    # kiosk foodcapture.toml:  collector_url = "http://hq-server:8090"
+
+Kiosk side (``CollectorClient``): ``delivery.save_record`` hands every
+sidecar change to the client, which coalesces changes per image and sends
+them in batches of up to ``collector_batch_size`` every
+``collector_flush_seconds`` over one keep-alive HTTP session. A batch is one
+gzip body: a JSON manifest line followed by the raw JPEG bytes of the
+images the collector does not have yet. Image bytes go with the first push
+of a capture only; if the collector answers that it is missing an image
+(it was wiped, or the kiosk restarted), the next batch includes it. Failed
+batches are kept and retried with backoff, and a watermark file in the
+photo dir lets a restarted kiosk push what it had not sent.
+
+Collector side: a batch is stored with a single ``executemany`` upsert into
+``collector.sqlite3`` (WAL) and the images under ``<dir>/<branch>/``. With
+``--analyze N``, captures the kiosk sent without an AI analysis
+(pre-screened, deferred, or from kiosks without an OpenAI key) are analyzed
+by a central pool of N workers. Results are cached by image SHA-256, so
+identical images from retries or other branches cost one OpenAI call.
+Lookup: ``GET /captures?q=<order>&branch=<branch>&prefix=1``.
+"""
+import io
+import os
+import gzip
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from foodcapture import delivery
+from foodcapture.analysis import FoodQuality, Rating
+from foodcapture.index import MAX_LIMIT, query_limit
+
+DB_NAME = "collector.sqlite3"
+WATERMARK_NAME = "collector.state"
+MAX_BACKOFF = 60.0
+DEFAULT_LIMIT = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    branch TEXT NOT NULL,
+    image TEXT NOT NULL,
+    order_code TEXT NOT NULL COLLATE NOCASE,
+    captured_at TEXT,
+    state TEXT,
+    rating INTEGER,
+    summary TEXT,
+    analysis TEXT,                               -- FoodQuality.to_dict() as JSON
+    sha256 TEXT,
+    updated_at REAL,                             -- kiosk time of the sidecar change
+    received_at REAL,
+    PRIMARY KEY (branch, image)
+);
+CREATE INDEX IF NOT EXISTS captures_by_order ON captures (order_code, captured_at);
+CREATE INDEX IF NOT EXISTS captures_by_sha ON captures (sha256);
+CREATE TABLE IF NOT EXISTS analysis_cache (
+    sha256 TEXT PRIMARY KEY,
+    analysis TEXT NOT NULL,
+    created_at REAL
+);
+"""
+COLUMNS = ["branch", "image", "order_code", "captured_at", "state", "rating", "summary", "analysis",
+           "sha256", "updated_at", "received_at"]
+# Older sidecar pushes never overwrite newer ones; a push without analysis keeps a central one.
+UPSERT = (f"INSERT INTO captures ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+          "ON CONFLICT(branch, image) DO UPDATE SET "
+          "order_code = excluded.order_code, captured_at = excluded.captured_at, state = excluded.state, "
+          "rating = COALESCE(excluded.rating, rating), summary = COALESCE(excluded.summary, summary), "
+          "analysis = COALESCE(excluded.analysis, analysis), sha256 = COALESCE(excluded.sha256, sha256), "
+          "updated_at = excluded.updated_at, received_at = excluded.received_at "
+          "WHERE excluded.updated_at >= captures.updated_at")
+
+
+# ========== WIRE FORMAT ==========
+def encode_batch(branch, items, blobs):
+    """gzip(manifest JSON line + concatenated image bytes); items get a "size" for their blob."""
+    payload = io.BytesIO()
+    for item in items:
+        item["size"] = len(blobs.get(item["image"], b""))
+    payload.write(json.dumps({"branch": branch, "items": items}, ensure_ascii=False).encode() + b"\n")
+    for item in items:
+        payload.write(blobs.get(item["image"], b""))
+    # Level 1: the JPEGs do not shrink anyway, the manifest compresses well at any level.
+    return gzip.compress(payload.getvalue(), compresslevel=1)
+
+
+def decode_batch(body):
+    """(branch, items, {image: bytes}) from an encode_batch body; ValueError if it is malformed."""
+    data = gzip.decompress(body)
+    end = data.index(b"\n")
+    manifest = json.loads(data[:end])
+    if (not isinstance(manifest, dict) or not isinstance(manifest.get("branch"), str)
+            or not isinstance(manifest.get("items"), list)):
+        raise ValueError("manifest needs a branch and a list of items")
+    blobs, offset = {}, end + 1
+    for item in manifest["items"]:
+        if not isinstance(item, dict) or not isinstance(item.get("image"), str) or not os.path.basename(item["image"]):
+            raise ValueError("every item needs an image file name")
+        size = item.get("size", 0)
+        if not isinstance(size, int) or size < 0 or offset + size > len(data):
+            raise ValueError(f"bad size for {item['image']}")
+        if size:
+            blobs[item["image"]] = data[offset:offset + size]
+            offset += size
+    return manifest["branch"], manifest["items"], blobs
+
+
+# ========== KIOSK SIDE ==========
+def record_item(record):
+    """Manifest entry for a DeliveryRecord."""
+    from foodcapture.batch import capture_time
+    from foodcapture.core import parse_capture_filename
+    _, order_code = parse_capture_filename(record.image)
+    item = asdict(record)
+    item["image"] = os.path.basename(record.image)
+    item["order_code"] = order_code
+    try:
+        item["captured_at"] = capture_time(record.image).isoformat(timespec="seconds")
+    except OSError:
+        item["captured_at"] = None
+    return item
+
+
+class CollectorClient(threading.Thread):
+    """Batches sidecar changes to the collector in the background; see the module docstring."""
+
+    def __init__(self, config):
+        super().__init__(name="collector-client", daemon=True)
+        self.config = config
+        self.branch = config.collector_branch or config.branch_description
+        self.url = config.collector_url.rstrip("/") + "/ingest"
+        self.session = requests.Session()  # keep-alive: one connection for all batches
+        self._queue = OrderedDict()  # image path -> (record, send the image bytes too)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._backoff = 0.0
+        self.sent = self.batches = 0
+
+    def push(self, record, with_image=None):
+        """Queue a sidecar change (delivery.record_listeners calls this on every save)."""
+        with self._lock:
+            previous = self._queue.pop(record.image, None)
+            if with_image is None:
+                with_image = previous[1] if previous else record.state == delivery.PENDING
+            self._queue[record.image] = (delivery.DeliveryRecord(**asdict(record)), with_image)
+            full = len(self._queue) >= self.config.collector_batch_size
+        if full:
+            self._wake.set()
+
+    def _watermark_path(self):
+        return os.path.join(self.config.photo_dir, WATERMARK_NAME)
+
+    def _read_watermark(self):
+        try:
+            with open(self._watermark_path()) as f:
+                return float(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0.0
+
+    def _write_watermark(self, value):
+        tmp_path = self._watermark_path() + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(f"{value:.6f}")
+        os.replace(tmp_path, self._watermark_path())
+
+    def _scan(self):
+        """Queue sidecars changed since the last batch the collector confirmed."""
+        from foodcapture.batch import iter_images
+        since = self._read_watermark()
+        for image_path in iter_images(self.config.photo_dir):
+            record = delivery.load_record(image_path)
+            if record is not None and record.updated_at > since:
+                self.push(record, with_image=since == 0.0)
+        if self._queue:
+            logging.info(f"🛰️ {len(self._queue)} capture changes to push to the collector.")
+
+    def _take(self):
+        with self._lock:
+            batch = []
+            while self._queue and len(batch) < self.config.collector_batch_size:
+                batch.append(self._queue.popitem(last=False)[1])
+            return batch
+
+    def _requeue(self, batch):
+        with self._lock:
+            for record, with_image in reversed(batch):
+                if record.image not in self._queue:  # a newer change is already queued
+                    self._queue[record.image] = (record, with_image)
+                    self._queue.move_to_end(record.image, last=False)
+
+    def flush(self):
+        """Send one batch; returns False if the collector could not be reached."""
+        batch = self._take()
+        if not batch:
+            return True
+        items, blobs, paths = [], {}, {}
+        for record, with_image in batch:
+            item = record_item(record)
+            paths[item["image"]] = record
+            if with_image:
+                try:
+                    with open(record.image, "rb") as f:
+                        blobs[item["image"]] = f.read()
+                    item["sha256"] = hashlib.sha256(blobs[item["image"]]).hexdigest()
+                except OSError:
+                    pass  # deleted locally; the collector keeps the metadata
+            items.append(item)
+        body = encode_batch(self.branch, items, blobs)
+        try:
+            resp = self.session.post(self.url, data=body, timeout=30, headers={
+                "Content-Type": "application/octet-stream", "Content-Encoding": "gzip"})
+            resp.raise_for_status()
+            missing = resp.json().get("missing", [])
+        except (requests.RequestException, ValueError) as e:
+            self._requeue(batch)
+            self._backoff = min(MAX_BACKOFF, max(1.0, self._backoff * 2))
+            logging.warning(f"⚠️ Collector push failed ({e}); retrying in {self._backoff:.0f}s.")
+            return False
+        self._backoff = 0.0
+        self.sent += len(batch)
+        self.batches += 1
+        for name in missing:
+            self.push(paths[name], with_image=True)
+        with self._lock:
+            pending = [record.updated_at for record, _ in self._queue.values()]
+        self._write_watermark(min(pending) - 1e-6 if pending else max(r.updated_at for r, _ in batch))
+        logging.debug(f"🛰️ Pushed {len(batch)} captures ({len(body)} bytes) to the collector.")
+        return True
+
+    def start(self):
+        delivery.record_listeners.append(self.push)
+        super().start()
+
+    def run(self):
+        self._scan()
+        while not self._stopped.is_set():
+            self._wake.wait(self._backoff or self.config.collector_flush_seconds)
+            self._wake.clear()
+            while self._queue and not self._stopped.is_set() and self.flush():
+                pass
+
+    def stop(self, timeout=10):
+        """Stop and push what is left (best effort, bounded by timeout)."""
+        if self.push in delivery.record_listeners:
+            delivery.record_listeners.remove(self.push)
+        self._stopped.set()
+        self._wake.set()
+        self.join(timeout)
+        deadline = time.monotonic() + timeout
+        while self._queue and time.monotonic() < deadline and self.flush():
+            pass
+        self.session.close()
+
+
+# ========== COLLECTOR SIDE ==========
+class CollectorStore:
+    """The central archive: images under <root>/<branch>/ and one SQLite index."""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.path = os.path.join(root, DB_NAME)
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        conn.close()
+        self._local = threading.local()
+
+    def connect(self):
+        """One connection per server thread, kept open."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def image_path(self, branch, image):
+        # Branch and image names come from the network: keep them inside root.
+        safe_branch = "".join(c if c.isalnum() or c in " -_." else "_" for c in branch).strip(". ") or "_"
+        return os.path.join(self.root, safe_branch, os.path.basename(image))
+
+    def ingest(self, branch, items, blobs):
+        """Store one batch; returns the images the collector has no bytes for."""
+        now = time.time()
+        rows, missing = [], []
+        for item in items:
+            path = self.image_path(branch, item["image"])
+            blob = blobs.get(item["image"])
+            if blob is not None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(blob)
+                os.replace(tmp_path, path)
+            elif not os.path.exists(path):
+                missing.append(item["image"])
+            quality = FoodQuality.from_stored(item.get("analysis"))
+            rows.append((
+                branch, os.path.basename(item["image"]), item.get("order_code") or "", item.get("captured_at"),
+                item.get("state"), int(quality.rating) if quality else None, quality.summary if quality else None,
+                json.dumps(quality.to_dict(), ensure_ascii=False) if quality else None,
+                item.get("sha256"), item.get("updated_at", now), now,
+            ))
+        conn = self.connect()
+        with conn:
+            conn.executemany(UPSERT, rows)
+        return missing
+
+    def unanalyzed(self, branch, images):
+        """(image, sha256) of the given captures the kiosk finished without an analysis."""
+        conn = self.connect()
+        rows = conn.execute(
+            "SELECT image, sha256 FROM captures WHERE branch = ? AND analysis IS NULL AND sha256 IS NOT NULL "
+            "AND state IN ('sent', 'failed') AND image IN (SELECT value FROM json_each(?))", (branch, json.dumps(images)))
+        return [(row["image"], row["sha256"]) for row in rows]
+
+    def cached_analysis(self, sha256):
+        row = self.connect().execute("SELECT analysis FROM analysis_cache WHERE sha256 = ?", (sha256,)).fetchone()
+        return json.loads(row["analysis"]) if row else None
+
+    def store_analysis(self, sha256, analysis):
+        """Cache an analysis and apply it to every capture with the same image bytes."""
+        quality = FoodQuality.from_stored(analysis)
+        text = json.dumps(analysis, ensure_ascii=False)
+        conn = self.connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO analysis_cache (sha256, analysis, created_at) VALUES (?, ?, ?)",
+                         (sha256, text, time.time()))
+            conn.execute("UPDATE captures SET analysis = ?, rating = ?, summary = ? "
+                         "WHERE sha256 = ? AND analysis IS NULL",
+                         (text, int(quality.rating), quality.summary, sha256))
+
+    def find(self, code, branch=None, prefix=False, limit=DEFAULT_LIMIT):
+        where, args = "order_code = ?", [code.strip()]
+        if prefix:
+            # A range on the NOCASE index instead of LIKE, as in foodcapture.index.
+            where, args = "order_code >= ? AND order_code < ?", [code.strip(), code.strip() + "\U0010ffff"]
+        if branch:
+            where += " AND branch = ?"
+            args.append(branch)
+        rows = self.connect().execute(
+            f"SELECT * FROM captures WHERE {where} ORDER BY captured_at DESC LIMIT ?", (*args, limit))
+        results = []
+        for row in rows:
+            result = dict(row)
+            result["analysis"] = json.loads(row["analysis"]) if row["analysis"] else None
+            result["rating_label"] = Rating(row["rating"]).label if row["rating"] is not None else None
+            results.append(result)
+        return results
+
+
+class CentralAnalyzer:
+    """Analyzes incoming captures on a shared pool, one OpenAI call per distinct image."""
+
+    def __init__(self, store, workers):
+        self.store = store
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="central-analysis")
+        self._in_flight = {}  # sha256 -> Future, so concurrent duplicates share one call
+        self._lock = threading.Lock()
+        self.calls = self.cache_hits = 0
+
+    def submit(self, branch, images):
+        for image, sha256 in self.store.unanalyzed(branch, images):
+            cached = self.store.cached_analysis(sha256)
+            if cached is not None:
+                self.cache_hits += 1
+                self.store.store_analysis(sha256, cached)
+                continue
+            with self._lock:
+                if sha256 in self._in_flight:
+                    self.cache_hits += 1
+                    continue
+                self._in_flight[sha256] = self.pool.submit(self._analyze, self.store.image_path(branch, image), sha256)
+
+    def _analyze(self, path, sha256):
+        from foodcapture.core import guarded_analysis
+        try:
+            quality, _ = guarded_analysis(path)
+            if quality is not None:
+                with self._lock:
+                    self.calls += 1
+                self.store.store_analysis(sha256, quality.to_dict())
+                logging.info(f"🧠 Central analysis {os.path.basename(path)}: {quality.rating.label}")
+        finally:
+            with self._lock:
+                self._in_flight.pop(sha256, None)
+
+
+class _CollectorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive for the kiosks' sessions
+    store = None
+    analyzer = None
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/ingest":
+            return self._send(404, {"error": "not found"})
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            branch, items, blobs = decode_batch(body)
+        except (OSError, ValueError, KeyError) as e:
+            return self._send(400, {"error": f"bad batch: {e}"})
+        missing = self.store.ingest(branch, items, blobs)
+        if self.analyzer is not None:
+            self.analyzer.submit(branch, [item["image"] for item in items])
+        logging.info(f"📥 {branch}: {len(items)} captures, {len(blobs)} images ({len(body)} bytes)")
+        self._send(200, {"stored": len(items), "missing": missing})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/captures":
+            return self._send(404, {"error": "not found"})
+        query = parse_qs(url.query)
+        code = query.get("q", [""])[0]
+        if not code:
+            return self._send(400, {"error": "missing q"})
+        limit = query_limit(query, DEFAULT_LIMIT)
+        if limit is None:
+            return self._send(400, {"error": f"limit must be 1-{MAX_LIMIT}"})
+        self._send(200, self.store.find(code, branch=query.get("branch", [None])[0],
+                                        prefix=query.get("prefix", ["0"])[0] in ("1", "true"),
+                                        limit=limit))
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        logging.debug(fmt % args)
+
+
+def make_server(root, host="127.0.0.1", port=8090, analyze_workers=0):
+    store = CollectorStore(root)
+    analyzer = CentralAnalyzer(store, analyze_workers) if analyze_workers else None
+    handler = type("CollectorHandler", (_CollectorHandler,), {"store": store, "analyzer": analyzer})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(root, host="127.0.0.1", port=8090, analyze_workers=0):
+    server = make_server(root, host, port, analyze_workers)
+    logging.info(f"🛰️ Collector on http://{host}:{port}, archive in {root}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Central capture collector for several kiosks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    srv = sub.add_parser("serve", help="Accept capture batches from kiosks")
+    srv.add_argument("--dir", default="./collected", help="Archive directory")
+    srv.add_argument("--host", default="127.0.0.1")
+    srv.add_argument("--port", type=int, default=8090)
+    srv.add_argument("--analyze", type=int, default=0, metavar="N",
+                     help="Analyze captures that arrive without analysis on N workers")
+    fnd = sub.add_parser("find", help="Show captures for an order number across branches")
+    fnd.add_argument("code")
+    fnd.add_argument("--dir", default="./collected")
+    fnd.add_argument("--branch")
+    fnd.add_argument("--prefix", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s')
+    if args.command == "serve":
+        serve(args.dir, args.host, args.port, args.analyze)
+    else:
+        for r in CollectorStore(args.dir).find(args.code, branch=args.branch, prefix=args.prefix):
+            print(f"{r['branch']:<30} {r['order_code'] or '(no code)':<12} {r['captured_at']}  "
+                  f"{r['state'] or '-':<9} {r['rating_label'] or '-':<9} {r['image']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""Typed, validated configuration for the capture kiosk.
+
+Values are resolved in this order, later wins:
+
+1. the defaults below
+2. a TOML file (``foodcapture.toml``, or the path in ``FOODCAPTURE_CONFIG``)
+3. environment variables named after the field in upper case
+   (``COOLDOWN_SECONDS``, ``PHOTO_DIR``, ``BOT_TOKEN`` ...), including ``.env``
+   via ``load_dotenv``
+
+Fields marked ``hot`` are re-read from the TOML file while the kiosk runs
+(see ``ConfigWatcher``); everything else needs a restart because it is baked
+into the camera, the window or a worker pool at startup.
+"""
+import os
+import logging
+import threading
+import tomllib
+from dataclasses import dataclass, field, fields
+
+from dotenv import load_dotenv
+
+DEFAULT_CONFIG_PATH = "foodcapture.toml"
+
+
+def _hot(default, **meta):
+    return field(default=default, metadata={"hot": True, **meta})
+
+
+def _cold(default, **meta):
+    return field(default=default, metadata={"hot": False, **meta})
+
+
+@dataclass
+class CaptureConfig:
+    # ---- credentials / endpoints (restart) ----
+    bot_token: str = _cold(None)
+    chat_id: str = _cold(None)                 # receives the upload
+    fanout_chat_ids: list = _cold(())          # also get the photo, by file_id (no re-upload)
+    openai_api_key: str = _cold(None)
+    telegram_api_url: str = _cold("https://api.telegram.org")
+    collector_url: str = _cold("")             # central collector, e.g. http://hq:8090 (see foodcapture/collector.py)
+    collector_branch: str = _cold("")          # branch name at the collector; default branch_description
+
+    # ---- camera / window (restart) ----
+    camera_source: str = _cold("0")
+    mjpeg_passthrough: bool = _cold(False)  # save the camera's own JPEG instead of re-encoding
+    camera_offline_after: float = _cold(2.0, min=0.1, max=60)  # seconds without a frame before reconnecting
+    camera_retry_max: float = _cold(30.0, min=1, max=600)      # longest wait between reconnect attempts
+    camera_downtime_log: str = _cold("camera_downtime.csv")    # one row per outage
+    image_width: int = _cold(1280, min=160, max=7680)
+    image_height: int = _cold(720, min=120, max=4320)
+    preview_width: int = _cold(0, min=0, max=7680)    # >0: stream at preview size, image_* only for captures
+    preview_height: int = _cold(0, min=0, max=4320)
+    yolo_model: str = _cold("yolov8n.pt")
+    detector_precision: str = _cold("fp32")  # "int8": run int8_model (see foodcapture/quantize.py)
+    int8_model: str = _cold("")              # default <yolo_model stem>.int8.onnx
+    upload_workers: int = _cold(4, min=1, max=64)
+    multiprocess: bool = _cold(False)  # detector and encoder/uploader in separate processes
+    bus_name: str = _cold("")          # publish the feed on the local frame bus under this name
+    bus_slots: int = _cold(4, min=2, max=64)
+    photo_dir: str = _cold("./image")
+    profile_dir: str = _cold("./profiles")
+    blackbox_dir: str = _cold("./blackbox")
+
+    # ---- region of interest (hot) ----
+    roi: list = _hot((), item=int)  # [x, y, width, height] in camera pixels; empty = whole frame
+
+    # ---- captions / analysis (hot) ----
+    ai_label: str = _hot("food")
+    branch_description: str = _hot('Chinese Dragon Cafe - Milagiriya Branch')
+    openai_model: str = _hot("gpt-4o")
+    # COCO model: 'food' could be labeled as 'pizza', 'sandwich', 'hot dog', etc.
+    food_labels: list = _hot(("pizza", "sandwich", "hot dog", "apple", "banana", "cake"))
+    telegram_chat_rate: float = _hot(1.0, min=0.01, max=30)    # messages per second per chat
+    openai_timeout: float = _hot(30.0, min=1, max=600)         # per-request timeout, seconds
+    breaker_failures: int = _hot(3, min=1, max=100)            # failed/slow calls in a row that open the breaker
+    breaker_slow_seconds: float = _hot(20.0, min=0.1, max=600)  # a slower success counts as a failure
+    breaker_reset_seconds: float = _hot(60.0, min=1, max=3600)  # open time before a half-open probe
+
+    # ---- performance knobs (hot) ----
+    cooldown_seconds: float = _hot(2.0, min=0, max=60)
+    detect_every: int = _hot(1, min=1, max=300)            # run YOLO on every Nth preview frame
+    tracking_enabled: bool = _hot(False)                   # move the boxes with optical flow between YOLO runs
+    tracking_width: int = _hot(320, min=64, max=1920)      # greyscale width the tracker works at
+    tracking_scene_change: float = _hot(12.0, min=0, max=255)  # mean grey change vs. last detection that forces YOLO
+    inference_size: int = _hot(640, min=32, max=1920)      # YOLO imgsz, multiple of 32
+    jpeg_quality: int = _hot(95, min=10, max=100)
+    dedupe_cache_size: int = _hot(1, min=1, max=10000)     # recent image hashes treated as duplicates
+    motion_gate_enabled: bool = _hot(True)                 # idle the pipeline while the scene is static
+    motion_idle_after: float = _hot(5.0, min=0, max=3600)  # seconds without motion before idling
+    motion_idle_fps: float = _hot(2.0, min=0.1, max=60)    # detection/preview rate while idle
+    motion_pixel_threshold: int = _hot(12, min=1, max=255)  # grey-level change that counts as moved
+    motion_area_threshold: float = _hot(0.01, min=0, max=1)  # fraction of thumbnail pixels that must move
+    burst_before: int = _hot(3, min=0, max=30)             # buffered preview frames considered on Enter
+    burst_after: int = _hot(2, min=0, max=30)              # extra frames read after Enter
+    profile_seconds: float = _hot(10.0, min=1, max=600)
+    collector_batch_size: int = _hot(50, min=1, max=1000)      # captures per collector batch
+    collector_flush_seconds: float = _hot(2.0, min=0.1, max=600)
+    profile_on_start: bool = _cold(False)
+
+    # ---- black-box recorder (see foodcapture/blackbox.py) ----
+    blackbox_enabled: bool = _hot(True)
+    blackbox_seconds: float = _hot(30.0, min=1, max=600)     # rolling window kept in memory
+    blackbox_max_mb: float = _hot(16.0, min=1, max=1024)     # and never more than this
+    blackbox_fps: float = _hot(10.0, min=0.1, max=120)       # recorded preview frames per second
+    blackbox_width: int = _hot(320, min=64, max=1920)        # recorded frame width
+    blackbox_slow_ms: float = _hot(500.0, min=0, max=60000)  # dump on a slower loop iteration; 0 = off
+    blackbox_keep: int = _hot(20, min=1, max=1000)           # newest dumps kept in blackbox_dir
+
+    # ---- local pre-screen before the OpenAI call (hot) ----
+    prescreen_enabled: bool = _hot(False)
+    prescreen_reference_dir: str = _cold("./reference")         # <dir>/<yolo label>/*.jpg
+    prescreen_min_food_conf: float = _hot(0.6, min=0, max=1)
+    prescreen_min_sharpness: float = _hot(100.0, min=0)         # Laplacian variance at 320px
+    prescreen_min_brightness: float = _hot(60.0, min=0, max=255)
+    prescreen_max_brightness: float = _hot(200.0, min=0, max=255)
+    prescreen_max_clipped: float = _hot(0.05, min=0, max=1)     # fraction of crushed/blown pixels
+    prescreen_min_similarity: float = _hot(0.7, min=-1, max=1)  # histogram correlation vs dish reference
+
+    # ---- segmentation portion metrics (see foodcapture/portion.py) ----
+    portion_enabled: bool = _hot(False)
+    portion_model: str = _cold("yolov8n-seg.pt")
+    portion_reference: str = _cold("./reference/portions.json")  # written by `python -m foodcapture.portion build`
+    portion_plate_labels: list = _hot(("bowl", "plate"))         # masks that count as the plate
+    portion_tolerance: float = _hot(0.25, min=0, max=1)         # ratio outside 1 +/- this is small/large
+
+    def __post_init__(self):
+        errors = []
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if value is None:
+                continue
+            try:
+                value = _coerce(value, f.type, f.metadata.get("item", str))
+            except (TypeError, ValueError):
+                errors.append(f"{f.name}: expected {f.type.__name__}, got {value!r}")
+                continue
+            if "min" in f.metadata and value < f.metadata["min"]:
+                errors.append(f"{f.name}: {value} is below {f.metadata['min']}")
+            if "max" in f.metadata and value > f.metadata["max"]:
+                errors.append(f"{f.name}: {value} is above {f.metadata['max']}")
+            setattr(self, f.name, value)
+        if isinstance(self.inference_size, int) and self.inference_size % 32:
+            errors.append(f"inference_size: {self.inference_size} is not a multiple of 32")
+        if self.detector_precision not in ("fp32", "int8"):
+            errors.append(f"detector_precision: expected fp32 or int8, got {self.detector_precision!r}")
+        if isinstance(self.roi, list) and self.roi and (len(self.roi) != 4 or min(self.roi[2:]) <= 0):
+            errors.append(f"roi: expected [x, y, width, height] with positive size, got {self.roi}")
+        if errors:
+            raise ValueError("Invalid configuration:\n  " + "\n  ".join(errors))
+
+    @classmethod
+    def hot_fields(cls):
+        return [f.name for f in fields(cls) if f.metadata.get("hot")]
+
+
+def _coerce(value, type_, item_type=str):
+    if type_ is bool:
+        if isinstance(value, str):
+            if value.strip().lower() in ("1", "true", "yes", "on"):
+                return True
+            if value.strip().lower() in ("0", "false", "no", "off", ""):
+                return False
+            raise ValueError(value)
+        return bool(value)
+    if type_ is list:
+        if isinstance(value, str):
+            value = [item.strip() for item in value.split(",") if item.strip()]
+        return [item_type(item) for item in value]
+    if type_ is int and isinstance(value, float) and not value.is_integer():
+        raise ValueError(value)
+    return type_(value)
+
+
+def _read_file(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "rb") as f:
+        data = tomllib.load(f)
+    known = {f.name for f in fields(CaptureConfig)}
+    unknown = sorted(set(data) - known)
+    if unknown:
+        raise ValueError(f"Unknown config keys in {path}: {', '.join(unknown)}")
+    return data
+
+
+def _read_env():
+    values = {}
+    for f in fields(CaptureConfig):
+        env_value = os.getenv(f.name.upper())
+        if env_value is not None:
+            values[f.name] = env_value
+    return values
+
+
+def config_path():
+    return os.getenv("FOODCAPTURE_CONFIG", DEFAULT_CONFIG_PATH)
+
+
+def load_config(path=None):
+    """Build a validated CaptureConfig from defaults, the TOML file and the environment."""
+    load_dotenv()
+    values = _read_file(path or config_path())
+    values.update(_read_env())
+    return CaptureConfig(**values)
+
+
+class ConfigWatcher(threading.Thread):
+    """Polls the config file and applies changed hot fields to a live CaptureConfig.
+
+    Readers pick up new values the next time they read the attribute, so the
+    camera, window and worker pools keep running. Invalid edits are logged
+    and ignored; edits to restart-only fields are logged and not applied.
+    """
+
+    def __init__(self, config, path=None, interval=2.0):
+        super().__init__(name="config-watcher", daemon=True)
+        self.config = config
+        self.path = path or config_path()
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._mtime = self._current_mtime()
+
+    def _current_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            mtime = self._current_mtime()
+            if mtime != self._mtime:
+                self._mtime = mtime
+                self.reload()
+
+    def reload(self):
+        try:
+            values = _read_file(self.path)
+            values.update(_read_env())
+            fresh = CaptureConfig(**values)
+        except (ValueError, TypeError, tomllib.TOMLDecodeError) as e:
+            logging.warning(f"⚠️ Config reload rejected: {e}")
+            return
+        hot = set(CaptureConfig.hot_fields())
+        for f in fields(CaptureConfig):
+            old, new = getattr(self.config, f.name), getattr(fresh, f.name)
+            if old == new:
+                continue
+            if f.name in hot:
+                setattr(self.config, f.name, new)
+                logging.info(f"🔧 Config {f.name}: {old!r} -> {new!r}")
+            else:
+                logging.warning(f"⚠️ Config {f.name} changed; restart to apply.")
+
+    def stop(self):
+        self._stop_event.set()
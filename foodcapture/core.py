@@ -0,0 +1,397 @@
+import os
+import time
+import base64
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+
+import cv2
+import openai
+import requests
+
+from foodcapture import delivery
+from foodcapture.analysis import FoodQuality, PROMPT, RESPONSE_FORMAT
+from foodcapture.breaker import CircuitBreaker
+from foodcapture.config import load_config
+from foodcapture.fanout import FanOut, photo_file_id
+from foodcapture.index import write_thumbnail
+from foodcapture.mjpeg import ensure_huffman_tables
+from foodcapture.prescreen import PrescreenResult, prescreen as run_prescreen
+
+# ========== CONFIG ==========
+config = load_config()
+ANALYSIS_FALLBACK = "Food image"
+ANALYSIS_DEFERRED = "Food image (analysis pending ⏳)"
+REANALYSIS_INTERVAL = 10  # seconds between re-analysis queue checks
+analysis_breaker = CircuitBreaker(config, "OpenAI")
+telegram_fanout = FanOut(config)
+
+
+# ========== UTILITY FUNCTIONS ==========
+def compute_image_hash(image_path):
+    """Return a SHA256 hash of the image contents."""
+    with open(image_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def send_telegram_photo(photo_path, caption="Food Image Capture"):
+    telegram_fanout.limiter(config.chat_id).wait()
+    url = f"{config.telegram_api_url}/bot{config.bot_token}/sendPhoto"
+    with open(photo_path, 'rb') as photo:
+        response = requests.post(
+            url,
+            data={'chat_id': config.chat_id, 'caption': caption},
+            files={'photo': photo}
+        )
+    return response
+
+def edit_telegram_caption(message_id, caption, chat_id=None):
+    return telegram_fanout.post(chat_id or config.chat_id, "editMessageCaption",
+                                {'message_id': message_id, 'caption': caption})
+
+def request_image_analysis(photo_path, prompt=PROMPT, response_format=None):
+    """Ask OpenAI to analyze the photo and return the raw reply; raises on API errors."""
+    openai.api_key = config.openai_api_key
+    # One attempt per call: the circuit breaker must see each failure and its real
+    # latency, and the Reanalyzer (or the batch back-off) does the retrying.
+    openai.max_retries = 0
+    with open(photo_path, "rb") as f:
+        img_data = base64.b64encode(f.read()).decode()
+
+    extra = {"response_format": response_format} if response_format else {}
+    response = openai.chat.completions.create(
+        model=config.openai_model,
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {"type": "image_url", "image_url": {
+                        "url": f"data:image/jpeg;base64,{img_data}"
+                    }}
+                ]
+            }
+        ],
+        timeout=config.openai_timeout,
+        **extra
+    )
+    return response.choices[0].message.content
+
+def request_food_quality(photo_path):
+    """Schema-constrained analysis parsed into a FoodQuality; raises on API or parse errors."""
+    return FoodQuality.from_json(request_image_analysis(photo_path, PROMPT, RESPONSE_FORMAT))
+
+def analyze_image_with_openai(photo_path, prompt=None):
+    """FoodQuality for the photo (the raw reply to a free-text prompt), or None if the analysis failed."""
+    try:
+        if prompt:
+            return request_image_analysis(photo_path, prompt)
+        return request_food_quality(photo_path)
+    except Exception as e:
+        logging.warning(f"OpenAI analysis failed: {e}")
+        return None
+
+def guarded_analysis(photo_path, prompt=None):
+    """Analysis behind the circuit breaker: (FoodQuality or None, whether the call was made)."""
+    if not analysis_breaker.allow():
+        return None, False
+    started = time.monotonic()
+    quality = analyze_image_with_openai(photo_path, prompt)
+    analysis_breaker.record(quality is not None, time.monotonic() - started)
+    return quality, True
+
+def draw_code_box(frame, code_text):
+    """Overlay the current Order Number on the frame."""
+    overlay = frame.copy()
+    cv2.rectangle(overlay, (10, 10), (500, 60), (0, 0, 0), -1)  # background box
+    cv2.putText(overlay, f"Order Number: {code_text}", (20, 45),
+                cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
+    alpha = 0.6
+    cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
+    return frame
+
+def detect_food(yolo_model, frame):
+    """Run YOLO on the frame and return (results, detected)."""
+    results = yolo_model(frame, imgsz=config.inference_size, verbose=False)
+    detected = False
+    for box in results[0].boxes:
+        cls_id = int(box.cls[0])
+        label = yolo_model.names[cls_id]
+        if label in config.food_labels:
+            detected = True
+    return results, detected
+
+def annotate_detections(results, frame):
+    """Draw the boxes from a (possibly earlier) detection onto the frame."""
+    return results[0].plot(img=frame)
+
+def save_capture(frame, item_code, jpeg=None):
+    """Write the captured frame to the photo dir and return (full_path, timestamp).
+
+    With ``jpeg`` (the camera's own MJPEG frame) those bytes are written as is
+    instead of re-encoding ``frame``.
+    """
+    timestamp = datetime.now().strftime("%b %-d, %Y %-I:%M:%S %p")
+    safe_code = item_code.replace(" ", "_") if item_code else ""
+    filename = (f"captured_{timestamp.replace(':', '-')}_{safe_code}_{config.ai_label}.jpg"
+                if item_code else
+                f"captured_{timestamp.replace(':', '-')}_{config.ai_label}.jpg")
+    full_path = os.path.join(config.photo_dir, filename)
+    if jpeg is not None:
+        with open(full_path, "wb") as f:
+            f.write(ensure_huffman_tables(jpeg))
+    else:
+        cv2.imwrite(full_path, frame, [cv2.IMWRITE_JPEG_QUALITY, config.jpeg_quality])
+    return full_path, timestamp
+
+def parse_capture_filename(filename):
+    """Recover (timestamp, item_code) from a save_capture() filename."""
+    parts = os.path.splitext(os.path.basename(filename))[0].split("_")
+    if len(parts) < 3 or parts[0] != "captured":
+        return "", ""
+    timestamp = parts[1].replace("-", ":")
+    item_code = " ".join(parts[2:-1])
+    return timestamp, item_code
+
+class DuplicateFilter:
+    """Remembers the most recent image hashes (config.dedupe_cache_size of them)."""
+
+    def __init__(self):
+        self._hashes = OrderedDict()
+
+    def is_duplicate(self, image_hash):
+        if image_hash in self._hashes:
+            self._hashes.move_to_end(image_hash)
+            return True
+        self._hashes[image_hash] = True
+        while len(self._hashes) > config.dedupe_cache_size:
+            self._hashes.popitem(last=False)
+        return False
+
+def build_caption_parts(item_code, timestamp, template=None):
+    """Caption lines; a preset's ``template`` lines may use {item_code}, {timestamp} and {analysis}."""
+    if template is not None:
+        return [line.format(item_code=item_code, timestamp=timestamp, analysis="{analysis}")
+                for line in template]
+    caption_parts = []
+    if item_code:
+        caption_parts.append(f"Order Number: {item_code}")
+    caption_parts.append(config.branch_description)
+    caption_parts.append(f"Captured at {timestamp}")
+    return caption_parts
+
+def drop_duplicate(full_path, duplicates):
+    """True (and the file removed) if the image duplicates a recent capture."""
+    if not duplicates.is_duplicate(compute_image_hash(full_path)):
+        return False
+    logging.info("⚠️ Duplicate image detected. Skipping send.")
+    os.remove(full_path)
+    return True
+
+def create_record(frame, full_path, timestamp, item_code, references=None, food_conf=0.0, dish=None,
+                  portion=None, caption=None, prompt=None):
+    """Thumbnail, pre-screen and the pending delivery record; returns the caption parts.
+
+    ``caption`` and ``prompt`` are a preset's caption template and free-text
+    analysis prompt (see presets.py); None means the kiosk's.
+    """
+    write_thumbnail(full_path, frame)
+    caption_parts = build_caption_parts(item_code, timestamp, caption)
+    if portion is not None:
+        caption_parts.append(portion.caption())
+    record = delivery.DeliveryRecord(image=full_path, caption_parts=caption_parts, prompt=prompt,
+                                     portion=portion.to_dict() if portion is not None else None)
+    if config.prescreen_enabled and references is not None:
+        screen = run_prescreen(frame, food_conf, dish, references, config)
+        logging.info(f"🔎 Pre-screen: {screen.verdict} {', '.join(screen.reasons)}")
+        record.prescreen = screen.to_dict()
+    delivery.save_record(record)
+    return caption_parts
+
+def build_caption(record, quality_text):
+    """The caption parts with the analysis in the template's {analysis} line, else appended."""
+    if any("{analysis}" in part for part in record.caption_parts):
+        return "\n".join(part.replace("{analysis}", quality_text or "") for part in record.caption_parts)
+    if quality_text is None:
+        return "\n".join(record.caption_parts)
+    return "\n".join(record.caption_parts + [f"\nAI Food Quality:\n{quality_text}"])
+
+def analysis_text(record):
+    """Caption text from the analysis or passed pre-screen the record already has, else None."""
+    if record.prompt and record.analysis is not None:
+        return record.analysis  # the reply to a free-text prompt, as is
+    quality = FoodQuality.from_stored(record.analysis)
+    if quality is not None:
+        return quality.caption()
+    prescreen = PrescreenResult(**record.prescreen) if record.prescreen else None
+    if prescreen is not None and not prescreen.needs_remote:
+        return prescreen.caption()
+    return None
+
+def store_analysis(record, result):
+    """Keep a successful analysis on the record; returns its caption text."""
+    record.analysis = result.to_dict() if isinstance(result, FoodQuality) else result
+    record.reanalyze = record.analysis_failed = False
+    return analysis_text(record)
+
+def pending_text(record):
+    """Caption text while the analysis is still to be redone: failed, or not tried yet."""
+    return ANALYSIS_FALLBACK if record.analysis_failed else ANALYSIS_DEFERRED
+
+def analyze_capture(record):
+    """Run the OpenAI analysis if the record needs one; returns the caption text.
+
+    The caller saves the record.
+    """
+    quality_text = analysis_text(record)
+    if quality_text is not None:
+        if record.analysis is None:
+            logging.info("🟢 Local pre-screen passed, skipping OpenAI analysis.")
+        return quality_text
+    delivery.mark(record, delivery.ANALYZING)
+    logging.info("🔍 Analyzing food quality with OpenAI...")
+    quality, attempted = guarded_analysis(record.image, record.prompt)
+    if quality is not None:
+        if isinstance(quality, FoodQuality):
+            logging.info(f"🧠 Food quality result: {quality.rating.label} - {quality.summary}")
+        else:
+            logging.info(f"🧠 Description: {quality}")
+        return store_analysis(record, quality)
+    # Send now, fill in the analysis later (see Reanalyzer).
+    if not attempted:
+        logging.info("⚡ OpenAI circuit open, sending without analysis.")
+    record.reanalyze = True
+    record.analysis_failed = attempted
+    return pending_text(record)
+
+def analyze_and_send(photo_path, caption_parts=None, analyze=True):
+    # Run in background: Analyze food quality, then send to Telegram.
+    # Progress is recorded in the capture's delivery sidecar, so this is
+    # safe to call again for the same image (see foodcapture.delivery).
+    # With analyze=False only an analysis already in the sidecar is used
+    # (see the analyze stage in foodcapture.pipeline).
+    record = delivery.load_record(photo_path) or delivery.DeliveryRecord(
+        image=photo_path, caption_parts=list(caption_parts or []))
+    if record.state == delivery.SENT:
+        if None in record.fanout.values():
+            telegram_fanout.send(record)
+            delivery.save_record(record)
+        else:
+            logging.info(f"⏭️ Already sent as message {record.message_id}: {photo_path}")
+        return None
+
+    if analyze:
+        quality_text = analyze_capture(record)
+    else:
+        quality_text = analysis_text(record) or (pending_text(record) if record.reanalyze else None)
+    record.caption = build_caption(record, quality_text)
+
+    record.attempts += 1
+    try:
+        resp = send_telegram_photo(photo_path, caption=record.caption)
+    except requests.RequestException as e:
+        logging.error(f"❌ Telegram error: {e}")
+        delivery.mark(record, delivery.FAILED, last_error=str(e))
+        resp = None
+    else:
+        if resp.status_code == 200:
+            message_id = resp.json().get("result", {}).get("message_id")
+            delivery.mark(record, delivery.SENT, message_id=message_id, last_error=None,
+                          file_id=photo_file_id(resp), fanout={chat: None for chat in config.fanout_chat_ids})
+            logging.info("✅ Image sent to Telegram.")
+            if record.fanout:
+                telegram_fanout.send(record)
+                delivery.save_record(record)
+        else:
+            delivery.mark(record, delivery.FAILED, last_error=resp.text[:500])
+            logging.error(f"❌ Telegram error: {resp.text}")
+    if record.reanalyze:
+        reanalyzer.add(photo_path)  # queued once the record is saved, see Reanalyzer
+    return resp
+
+class Reanalyzer(threading.Thread):
+    """Background re-analysis of captures sent while OpenAI was down or failing.
+
+    Captures are queued by analyze_and_send (and found again from their
+    ``reanalyze`` sidecar flag on start). Whenever the circuit breaker lets
+    calls through, the analysis is redone and the already-sent Telegram
+    message gets its caption edited.
+    """
+
+    def __init__(self, photo_dir=None, interval=REANALYSIS_INTERVAL):
+        super().__init__(name="reanalyzer", daemon=True)
+        self.photo_dir = photo_dir
+        self.interval = interval
+        self._queue = deque()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+    def add(self, photo_path):
+        with self._lock:
+            if photo_path not in self._queued:
+                self._queued.add(photo_path)
+                self._queue.append(photo_path)
+
+    def __len__(self):
+        return len(self._queue)
+
+    def _pop(self):
+        with self._lock:
+            if not self._queue:
+                return None
+            photo_path = self._queue.popleft()
+            self._queued.discard(photo_path)
+            return photo_path
+
+    def _scan(self):
+        from foodcapture.batch import iter_images
+        for photo_path in iter_images(self.photo_dir or config.photo_dir):
+            record = delivery.load_record(photo_path)
+            if record is not None and record.reanalyze:
+                self.add(photo_path)
+        if self._queue:
+            logging.info(f"🔁 {len(self._queue)} captures waiting for re-analysis.")
+
+    def reanalyze(self, photo_path):
+        """Redo one analysis; returns False if it has to be retried later."""
+        record = delivery.load_record(photo_path)
+        if record is None or not record.reanalyze:
+            return True
+        quality, attempted = guarded_analysis(photo_path, record.prompt)
+        if quality is None:
+            return False
+        record.caption = build_caption(record, store_analysis(record, quality))
+        if record.state == delivery.SENT:
+            messages = {config.chat_id: record.message_id, **record.fanout}
+            for chat_id, message_id in messages.items():
+                if message_id is None:
+                    continue
+                try:
+                    resp = edit_telegram_caption(message_id, record.caption, chat_id)
+                    if resp.status_code != 200:
+                        logging.warning(f"⚠️ Caption update failed in {chat_id}: {resp.text[:200]}")
+                except requests.RequestException as e:
+                    logging.warning(f"⚠️ Caption update failed in {chat_id}: {e}")
+        delivery.save_record(record)
+        logging.info(f"🧠 Re-analyzed {os.path.basename(photo_path)}: {quality.rating.label}")
+        return True
+
+    def run(self):
+        self._scan()
+        while not self._stopped.is_set():
+            while (photo_path := self._pop()) is not None:
+                if not self.reanalyze(photo_path):
+                    self.add(photo_path)
+                    break
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+
+reanalyzer = Reanalyzer()
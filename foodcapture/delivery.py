@@ -0,0 +1,232 @@
+"""Per-capture delivery state and the reconcile command.
+
+Every capture gets a JSON sidecar next to the image
+(``captured_..._food.jpg`` -> ``captured_..._food.json``) that records where
+it is in the pipeline::
+
+    pending -> analyzing -> sent     (with the Telegram message_id)
+                         -> failed   (with the last error)
+
+A sent capture with fan-out chats still missing (see foodcapture.fanout)
+only gets those chats on the next attempt.
+
+``reconcile`` walks the photo directory and resends only captures that are
+failed, have no sidecar, or have been stuck in pending/analyzing for too
+long. Sent captures are never sent again, so it is safe to run repeatedly:
+
+    python -m foodcapture.delivery reconcile --rate 0.5
+    python -m foodcapture.delivery reconcile --since 2026-10-01 --dry-run
+
+Images without a sidecar only count as undelivered if they were captured
+after delivery tracking started in that folder, i.e. no earlier than the
+oldest capture that has a sidecar (or ``--since``). The archive from before
+then is never re-sent to the chat.
+"""
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+
+PENDING = "pending"
+ANALYZING = "analyzing"
+SENT = "sent"
+FAILED = "failed"
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+STALE_SECONDS = 600  # pending/analyzing older than this is treated as lost
+
+# Called with every record save_record writes (e.g. the collector client).
+record_listeners = []
+
+
+@dataclass
+class DeliveryRecord:
+    image: str
+    state: str = PENDING
+    caption_parts: list = field(default_factory=list)
+    analysis: dict = None  # FoodQuality.to_dict(), or the raw reply to a free-text prompt
+    prescreen: dict = None  # PrescreenResult.to_dict()
+    portion: dict = None    # PortionResult.to_dict()
+    message_id: int = None
+    caption: str = None     # as sent, reused for the fan-out chats
+    file_id: str = None     # Telegram's id of the uploaded photo
+    fanout: dict = field(default_factory=dict)  # chat_id -> message_id, None while not sent there
+    reanalyze: bool = False  # analysis skipped or failed; redo it and edit the caption later
+    prompt: str = None      # free-text analysis prompt of the preset; None = structured FoodQuality
+    analysis_failed: bool = False  # the last attempt was made and failed (not skipped by the breaker)
+    attempts: int = 0
+    last_error: str = None
+    updated_at: float = 0.0
+
+
+def record_path(image_path):
+    return os.path.splitext(image_path)[0] + ".json"
+
+
+def load_record(image_path):
+    """Return the DeliveryRecord for an image, or None if it has no sidecar."""
+    try:
+        with open(record_path(image_path)) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"⚠️ Unreadable delivery record for {image_path}: {e}")
+        return None
+    data["image"] = image_path
+    return DeliveryRecord(**data)
+
+
+def save_record(record):
+    """Atomically write the sidecar so a crash never leaves half a file."""
+    record.updated_at = time.time()
+    data = asdict(record)
+    data["image"] = os.path.basename(record.image)
+    path = record_path(record.image)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+    # Keep the order-number lookup in step with every state change.
+    from foodcapture.index import index_record
+    index_record(record)
+    for listener in record_listeners:
+        listener(record)
+    return record
+
+
+def mark(record, state, **changes):
+    record.state = state
+    for key, value in changes.items():
+        setattr(record, key, value)
+    return save_record(record)
+
+
+def needs_delivery(record, now=None, stale_seconds=STALE_SECONDS):
+    if record is None:
+        return True
+    if record.state == SENT:
+        return None in record.fanout.values()
+    if record.state == FAILED:
+        return True
+    return (now or time.time()) - record.updated_at > stale_seconds
+
+
+class RateLimiter:
+    """Spaces out calls to at most `rate` per second (shared across threads)."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+    def back_off(self, seconds):
+        """Push the next slot out, e.g. after Telegram answers 429 retry_after."""
+        with self._lock:
+            self._next = max(self._next, time.monotonic() + seconds)
+
+
+def retry_after(resp):
+    """Seconds Telegram asked us to wait on a 429, else None."""
+    if resp is None or resp.status_code != 429:
+        return None
+    try:
+        return float(resp.json().get("parameters", {}).get("retry_after", 1))
+    except ValueError:
+        return 1.0
+
+
+def tracking_since(photo_dir):
+    """Capture time of the oldest image with a sidecar (None if none has one yet)."""
+    from foodcapture.batch import capture_time
+    return min((capture_time(os.path.join(photo_dir, name)) for name in os.listdir(photo_dir)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+                and os.path.exists(record_path(os.path.join(photo_dir, name)))), default=None)
+
+
+def find_undelivered(photo_dir, stale_seconds=STALE_SECONDS, since=None):
+    """Yield (image_path, record_or_None) for captures that still need sending.
+
+    Images without a sidecar count only if captured at or after ``since``
+    (default: tracking_since), so the pre-sidecar archive is left alone.
+    """
+    from foodcapture.batch import capture_time
+    now = time.time()
+    since = since or tracking_since(photo_dir)
+    for name in sorted(os.listdir(photo_dir)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        image_path = os.path.join(photo_dir, name)
+        record = load_record(image_path)
+        if record is None and (since is None or capture_time(image_path) < since):
+            continue
+        if needs_delivery(record, now, stale_seconds):
+            yield image_path, record
+
+
+def reconcile(photo_dir, rate=0.5, stale_seconds=STALE_SECONDS, dry_run=False, max_retries=3, since=None):
+    """Resend every undelivered capture in photo_dir, at most `rate` sends per second."""
+    from foodcapture.core import analyze_and_send, build_caption_parts, parse_capture_filename
+
+    limiter = RateLimiter(rate)
+    sent = failed = 0
+    for image_path, record in find_undelivered(photo_dir, stale_seconds, since):
+        state = record.state if record else "missing"
+        if dry_run:
+            logging.info(f"🔁 Would resend ({state}): {image_path}")
+            continue
+        if record is None:
+            timestamp, item_code = parse_capture_filename(os.path.basename(image_path))
+            save_record(DeliveryRecord(image=image_path, caption_parts=build_caption_parts(item_code, timestamp)))
+        for _ in range(max_retries):
+            limiter.wait()
+            logging.info(f"🔁 Resending ({state}): {image_path}")
+            resp = analyze_and_send(image_path)
+            delay = retry_after(resp)
+            if delay is None:
+                break
+            logging.warning(f"⏳ Telegram rate limit, waiting {delay:.0f}s")
+            limiter.back_off(delay)
+        record = load_record(image_path)
+        if record is not None and record.state == SENT:
+            sent += 1
+        else:
+            failed += 1
+    logging.info(f"🔁 Reconcile done: {sent} sent, {failed} still failing.")
+    return sent, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture delivery state tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("reconcile", help="Resend failed or missing captures")
+    rec.add_argument("--dir", help="Photo directory (default: config photo_dir)")
+    rec.add_argument("--rate", type=float, default=0.5, help="Max sends per second")
+    rec.add_argument("--stale", type=float, default=STALE_SECONDS,
+                     help="Seconds after which pending/analyzing counts as lost")
+    rec.add_argument("--since", type=datetime.fromisoformat,
+                     help="Resend captures without a sidecar from this date/time (ISO) on "
+                          "(default: the oldest capture that has one)")
+    rec.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s')
+    from foodcapture.core import config
+    reconcile(args.dir or config.photo_dir, rate=args.rate, stale_seconds=args.stale, dry_run=args.dry_run,
+              since=args.since)
+
+
+if __name__ == "__main__":
+    main()
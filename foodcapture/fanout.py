@@ -0,0 +1,98 @@
+"""Upload once, then fan a capture out to more Telegram chats by ``file_id``.
+
+The photo bytes go up once, to ``chat_id``. Telegram's answer carries a
+``file_id`` for the stored photo, and every chat in ``fanout_chat_ids``
+(manager, QA group ...) gets a ``sendPhoto`` that references it instead of
+re-uploading the JPEG. Those requests are tiny and go out in parallel.
+
+Each chat has its own ``RateLimiter`` (``telegram_chat_rate`` messages per
+second, hot) and a 429 ``retry_after`` only pushes back that chat. Sent
+message ids are kept per chat in the capture's sidecar (``fanout``), so a
+reconcile run only sends what is still missing.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from foodcapture.delivery import RateLimiter, retry_after
+
+MAX_RETRIES = 3
+
+
+def photo_file_id(resp):
+    """file_id of the largest size in a sendPhoto answer, or None."""
+    try:
+        sizes = resp.json().get("result", {}).get("photo") or []
+    except ValueError:
+        return None
+    return sizes[-1].get("file_id") if sizes else None
+
+
+class FanOut:
+    def __init__(self, config):
+        self.config = config
+        self._limiters = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def limiter(self, chat_id):
+        """The RateLimiter for one chat, following the current telegram_chat_rate."""
+        with self._lock:
+            limiter = self._limiters.get(chat_id)
+            if limiter is None:
+                limiter = self._limiters[chat_id] = RateLimiter(self.config.telegram_chat_rate)
+            limiter.interval = 1.0 / self.config.telegram_chat_rate
+            return limiter
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fanout")
+            return self._pool
+
+    def post(self, chat_id, method, data, files=None):
+        """Rate-limited Bot API call for one chat, retrying after a 429."""
+        url = f"{self.config.telegram_api_url}/bot{self.config.bot_token}/{method}"
+        limiter = self.limiter(chat_id)
+        for _ in range(MAX_RETRIES):
+            limiter.wait()
+            resp = requests.post(url, data={"chat_id": chat_id, **data}, files=files)
+            delay = retry_after(resp)
+            if delay is None:
+                return resp
+            logging.warning(f"⏳ Telegram rate limit for chat {chat_id}, waiting {delay:.0f}s")
+            limiter.back_off(delay)
+        return resp
+
+    def _send_one(self, chat_id, file_id, caption):
+        try:
+            resp = self.post(chat_id, "sendPhoto", {"photo": file_id, "caption": caption})
+        except requests.RequestException as e:
+            logging.error(f"❌ Fan-out to {chat_id} failed: {e}")
+            return None
+        if resp.status_code != 200:
+            logging.error(f"❌ Fan-out to {chat_id} failed: {resp.text[:200]}")
+            return None
+        return resp.json().get("result", {}).get("message_id")
+
+    def send(self, record):
+        """Send the record's photo to every fan-out chat that does not have it yet.
+
+        Fills ``record.fanout`` in place and returns True when every chat has it.
+        """
+        pending = [chat for chat, message_id in record.fanout.items() if message_id is None]
+        if not pending:
+            return True
+        if not record.file_id:
+            logging.error(f"❌ No file_id to fan out {record.image}")
+            return False
+        pool = self._executor()
+        futures = {chat: pool.submit(self._send_one, chat, record.file_id, record.caption)
+                   for chat in pending}
+        for chat, future in futures.items():
+            record.fanout[chat] = future.result()
+        sent = sum(message_id is not None for message_id in record.fanout.values())
+        logging.info(f"📣 Fanned out to {sent}/{len(record.fanout)} chats.")
+        return sent == len(record.fanout)
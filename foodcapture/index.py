@@ -0,0 +1,288 @@
+"""Order-number index over the capture archive.
+
+A SQLite database in the photo directory (``captures.sqlite3``) maps order
+numbers to captures: file, capture time, delivery state, AI rating and portion
+verdict (see portion.py), plus a small thumbnail in ``<photo_dir>/thumbs/``.
+``delivery.save_record`` updates the row every time a sidecar is written, so
+new captures and their analysis results appear without rescanning the folder;
+``rebuild`` backfills an existing archive.
+
+    python -m foodcapture.index find 1234               # exact order number
+    python -m foodcapture.index find 12 --prefix --json
+    python -m foodcapture.index rebuild [--no-thumbs]
+    python -m foodcapture.index serve --port 8089       # GET /orders?q=12&prefix=1
+
+Order numbers are matched case-insensitively through an index on
+``order_code``, and prefix search is a range scan on that index, so lookups
+stay in the millisecond range with hundreds of thousands of rows.
+"""
+import os
+import json
+import sqlite3
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+import cv2
+
+from foodcapture.analysis import FoodQuality, Rating
+
+INDEX_NAME = "captures.sqlite3"
+THUMB_DIR = "thumbs"
+THUMB_WIDTH = 240
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 10000
+IMAGE_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    image TEXT PRIMARY KEY,                      -- file name inside the photo dir
+    order_code TEXT NOT NULL COLLATE NOCASE,
+    captured_at TEXT,                            -- ISO 8601, local time
+    state TEXT,
+    rating INTEGER,                              -- analysis.Rating, 0-3
+    summary TEXT,
+    message_id INTEGER,
+    updated_at REAL,
+    portion TEXT,                                -- portion.PortionResult verdict
+    portion_ratio REAL,                          -- vs. the dish reference
+    plate_coverage REAL
+);
+CREATE INDEX IF NOT EXISTS captures_by_order ON captures (order_code, captured_at);
+"""
+# Columns added after the first release; connect() adds them to older index files.
+ADDED_COLUMNS = {"portion": "TEXT", "portion_ratio": "REAL", "plate_coverage": "REAL"}
+COLUMNS = ["image", "order_code", "captured_at", "state", "rating", "summary", "message_id", "updated_at",
+           *ADDED_COLUMNS]
+UPSERT = (f"INSERT INTO captures ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+          "ON CONFLICT(image) DO UPDATE SET "
+          + ", ".join(f"{c} = excluded.{c}" for c in COLUMNS[1:]))
+
+_ready = set()
+_ready_lock = threading.Lock()
+
+
+def index_path(photo_dir):
+    return os.path.join(photo_dir, INDEX_NAME)
+
+
+def thumb_path(image_path):
+    photo_dir, name = os.path.split(image_path)
+    return os.path.join(photo_dir, THUMB_DIR, name)
+
+
+def connect(photo_dir):
+    """Open the index (creating it on first use); one connection per thread."""
+    path = index_path(photo_dir)
+    conn = sqlite3.connect(path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    with _ready_lock:
+        if path not in _ready:
+            # WAL lets the kiosk, the encoder process and the query API use it concurrently.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(captures)")}
+            for column, type_ in ADDED_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE captures ADD COLUMN {column} {type_}")
+            _ready.add(path)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def write_thumbnail(image_path, frame=None):
+    """Write the thumbnail for a capture, from the in-memory frame if given."""
+    if frame is None:
+        frame = cv2.imread(image_path, cv2.IMREAD_REDUCED_COLOR_4)
+        if frame is None:
+            return None
+    h, w = frame.shape[:2]
+    if w > THUMB_WIDTH:
+        frame = cv2.resize(frame, (THUMB_WIDTH, max(1, h * THUMB_WIDTH // w)), interpolation=cv2.INTER_AREA)
+    path = thumb_path(image_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cv2.imwrite(path, frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    return path
+
+
+def _row(image_path, record=None):
+    from foodcapture.batch import capture_time
+    from foodcapture.core import parse_capture_filename
+    _, order_code = parse_capture_filename(image_path)
+    quality = FoodQuality.from_stored(record.analysis) if record else None
+    portion = (record.portion if record else None) or {}
+    return (
+        os.path.basename(image_path),
+        order_code,
+        capture_time(image_path).isoformat(timespec="seconds"),
+        record.state if record else None,
+        int(quality.rating) if quality else None,
+        quality.summary if quality else None,
+        record.message_id if record else None,
+        record.updated_at if record else None,
+        portion.get("verdict"),
+        portion.get("ratio"),
+        portion.get("coverage"),
+    )
+
+
+def index_record(record):
+    """Insert or update the row for a DeliveryRecord; never raises into the delivery path."""
+    try:
+        conn = connect(os.path.dirname(record.image) or ".")
+        with conn:
+            conn.execute(UPSERT, _row(record.image, record))
+        conn.close()
+    except (sqlite3.Error, OSError) as e:
+        logging.warning(f"⚠️ Capture index not updated for {record.image}: {e}")
+
+
+def rebuild(photo_dir, thumbs=True):
+    """Index every image in photo_dir (from its sidecar if it has one); returns the row count."""
+    from foodcapture.batch import iter_images
+    from foodcapture.delivery import load_record
+    conn = connect(photo_dir)
+    names = []
+    with conn:
+        for image_path in iter_images(photo_dir):
+            conn.execute(UPSERT, _row(image_path, load_record(image_path)))
+            if thumbs and not os.path.exists(thumb_path(image_path)):
+                write_thumbnail(image_path)
+            names.append(os.path.basename(image_path))
+            if len(names) % 1000 == 0:
+                logging.info(f"🗂️ Indexed {len(names)} captures...")
+        # Forget rows whose image was deleted from the folder.
+        conn.execute("DELETE FROM captures WHERE image NOT IN (SELECT value FROM json_each(?))",
+                     (json.dumps(names),))
+    conn.close()
+    logging.info(f"🗂️ Index rebuilt: {len(names)} captures in {index_path(photo_dir)}")
+    return len(names)
+
+
+def find(photo_dir, code, prefix=False, limit=DEFAULT_LIMIT):
+    """Captures for an order number (or every order starting with it), newest first."""
+    code = code.strip()
+    conn = connect(photo_dir)
+    if prefix:
+        # A range on the NOCASE index instead of LIKE, so the index is always used.
+        rows = conn.execute(
+            "SELECT * FROM captures WHERE order_code >= ? AND order_code < ? "
+            "ORDER BY captured_at DESC LIMIT ?", (code, code + "\U0010ffff", limit))
+    else:
+        rows = conn.execute(
+            "SELECT * FROM captures WHERE order_code = ? ORDER BY captured_at DESC LIMIT ?", (code, limit))
+    results = [_result(photo_dir, row) for row in rows]
+    conn.close()
+    return results
+
+
+def _result(photo_dir, row):
+    result = dict(row)
+    result["image"] = os.path.join(photo_dir, row["image"])
+    thumb = thumb_path(result["image"])
+    result["thumb"] = thumb if os.path.exists(thumb) else None
+    result["rating_label"] = Rating(row["rating"]).label if row["rating"] is not None else None
+    return result
+
+
+def query_limit(query, default=DEFAULT_LIMIT):
+    """The ``limit`` query parameter as an int in 1..MAX_LIMIT, or None if it is not one."""
+    try:
+        limit = int(query.get("limit", [default])[0])
+    except ValueError:
+        return None
+    return limit if 1 <= limit <= MAX_LIMIT else None
+
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    photo_dir = "."
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/orders":
+            query = parse_qs(url.query)
+            code = query.get("q", [""])[0]
+            if not code:
+                return self._send(400, b'{"error": "missing q"}', "application/json")
+            limit = query_limit(query)
+            if limit is None:
+                return self._send(400, f'{{"error": "limit must be 1-{MAX_LIMIT}"}}'.encode(), "application/json")
+            results = find(self.photo_dir, code, prefix=query.get("prefix", ["0"])[0] in ("1", "true"),
+                           limit=limit)
+            for result in results:
+                result["image_url"] = f"/images/{quote(os.path.basename(result['image']))}"
+                result["thumb_url"] = f"/thumbs/{quote(os.path.basename(result['thumb']))}" if result["thumb"] else None
+            return self._send(200, json.dumps(results, ensure_ascii=False).encode(), "application/json")
+        for route, directory in (("/images/", self.photo_dir), ("/thumbs/", os.path.join(self.photo_dir, THUMB_DIR))):
+            if url.path.startswith(route):
+                name = os.path.basename(unquote(url.path[len(route):]))
+                path = os.path.join(directory, name)
+                # Only captures and thumbnails, never the index database or the sidecars.
+                content_type = IMAGE_TYPES.get(os.path.splitext(name)[1].lower())
+                if content_type and os.path.isfile(path):
+                    with open(path, "rb") as f:
+                        return self._send(200, f.read(), content_type)
+        self._send(404, b'{"error": "not found"}', "application/json")
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        logging.debug(fmt % args)
+
+
+def serve(photo_dir, host="127.0.0.1", port=8089):
+    handler = type("QueryHandler", (_QueryHandler,), {"photo_dir": photo_dir})
+    server = ThreadingHTTPServer((host, port), handler)
+    logging.info(f"🔎 Capture lookup on http://{host}:{port}/orders?q=<order number>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up captures by order number.")
+    parser.add_argument("--dir", help="Photo directory (default: config photo_dir)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fnd = sub.add_parser("find", help="Show the captures for an order number")
+    fnd.add_argument("code")
+    fnd.add_argument("--prefix", action="store_true", help="Match every order starting with CODE")
+    fnd.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    fnd.add_argument("--json", action="store_true")
+    reb = sub.add_parser("rebuild", help="Index the whole photo directory")
+    reb.add_argument("--no-thumbs", action="store_true")
+    srv = sub.add_parser("serve", help="Local HTTP query API")
+    srv.add_argument("--host", default="127.0.0.1")
+    srv.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s')
+    from foodcapture.core import config
+    photo_dir = args.dir or config.photo_dir
+    if args.command == "rebuild":
+        rebuild(photo_dir, thumbs=not args.no_thumbs)
+    elif args.command == "serve":
+        serve(photo_dir, args.host, args.port)
+    else:
+        results = find(photo_dir, args.code, prefix=args.prefix, limit=args.limit)
+        if args.json:
+            print(json.dumps(results, ensure_ascii=False, indent=1))
+        elif not results:
+            print("No captures found.")
+        else:
+            for r in results:
+                print(f"{r['order_code'] or '(no code)':<12} {r['captured_at']}  {r['state'] or '-':<9} "
+                      f"{r['rating_label'] or '-':<9} {r['portion'] or '-':<7} {r['image']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Helpers for keeping the camera's own MJPEG frames (``mjpeg_passthrough``).
+
+Many USB webcams send MJPEG frames without Huffman tables (the "AVI1"
+variant); decoders are expected to use the standard tables from the JPEG
+spec, Annex K. Browsers, Telegram and PIL do not always cope with that, so
+``ensure_huffman_tables`` inserts the standard DHT segment before the scan
+when a frame has none. Frames that already carry tables are returned as is.
+"""
+import struct
+
+# (table class << 4 | table id, code counts for lengths 1..16, symbols)
+_STANDARD_TABLES = [
+    (0x00, [0, 1, 5, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0], list(range(12))),
+    (0x01, [0, 3, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0], list(range(12))),
+    (0x10, [0, 2, 1, 3, 3, 2, 4, 3, 5, 5, 4, 4, 0, 0, 1, 0x7d], [
+        0x01, 0x02, 0x03, 0x00, 0x04, 0x11, 0x05, 0x12, 0x21, 0x31, 0x41, 0x06, 0x13, 0x51, 0x61, 0x07,
+        0x22, 0x71, 0x14, 0x32, 0x81, 0x91, 0xa1, 0x08, 0x23, 0x42, 0xb1, 0xc1, 0x15, 0x52, 0xd1, 0xf0,
+        0x24, 0x33, 0x62, 0x72, 0x82, 0x09, 0x0a, 0x16, 0x17, 0x18, 0x19, 0x1a, 0x25, 0x26, 0x27, 0x28,
+        0x29, 0x2a, 0x34, 0x35, 0x36, 0x37, 0x38, 0x39, 0x3a,
+        *range(0x43, 0x4b), *range(0x53, 0x5b), *range(0x63, 0x6b), *range(0x73, 0x7b),
+        *range(0x83, 0x8b), *range(0x92, 0x9b), *range(0xa2, 0xab), *range(0xb2, 0xbb),
+        *range(0xc2, 0xcb), *range(0xd2, 0xdb), *range(0xe1, 0xeb), *range(0xf1, 0xfb),
+    ]),
+    (0x11, [0, 2, 1, 2, 4, 4, 3, 4, 7, 5, 4, 4, 0, 1, 2, 0x77], [
+        0x00, 0x01, 0x02, 0x03, 0x11, 0x04, 0x05, 0x21, 0x31, 0x06, 0x12, 0x41, 0x51, 0x07, 0x61, 0x71,
+        0x13, 0x22, 0x32, 0x81, 0x08, 0x14, 0x42, 0x91, 0xa1, 0xb1, 0xc1, 0x09, 0x23, 0x33, 0x52, 0xf0,
+        0x15, 0x62, 0x72, 0xd1, 0x0a, 0x16, 0x24, 0x34, 0xe1, 0x25, 0xf1, 0x17, 0x18, 0x19, 0x1a, 0x26,
+        0x27, 0x28, 0x29, 0x2a, 0x35, 0x36, 0x37, 0x38, 0x39, 0x3a,
+        *range(0x43, 0x4b), *range(0x53, 0x5b), *range(0x63, 0x6b), *range(0x73, 0x7b),
+        *range(0x82, 0x8b), *range(0x92, 0x9b), *range(0xa2, 0xab), *range(0xb2, 0xbb),
+        *range(0xc2, 0xcb), *range(0xd2, 0xdb), *range(0xe2, 0xeb), *range(0xf2, 0xfb),
+    ]),
+]
+
+
+def _dht_segment():
+    body = b"".join(bytes([tc]) + bytes(counts) + bytes(symbols) for tc, counts, symbols in _STANDARD_TABLES)
+    return b"\xff\xc4" + struct.pack(">H", len(body) + 2) + body
+
+
+STANDARD_DHT = _dht_segment()
+
+
+def is_jpeg(data):
+    return len(data) > 4 and data[0] == 0xFF and data[1] == 0xD8
+
+
+def _scan_offset(data):
+    """(offset of the SOS marker, whether a DHT segment came before it); offset is None if malformed."""
+    i, has_dht = 2, False
+    while i + 4 <= len(data) and data[i] == 0xFF:
+        marker = data[i + 1]
+        if marker == 0xDA:
+            return i, has_dht
+        if marker == 0xC4:
+            has_dht = True
+        i += 2 + (data[i + 2] << 8 | data[i + 3])
+    return None, has_dht
+
+
+def ensure_huffman_tables(data):
+    """Return JPEG bytes that decode on their own, inserting the standard DHT if missing."""
+    data = memoryview(data).cast("B")
+    sos, has_dht = _scan_offset(data)
+    if sos is None or has_dht:
+        return data
+    return b"".join((data[:sos], STANDARD_DHT, data[sos:]))
@@ -0,0 +1,248 @@
+"""Declarative capture pipeline: stages, executors and the stage library.
+
+A capture flows through a list of stages::
+
+    source -> detect -> overlay -> capture     per frame, in the UI loop (see presets.py)
+           -> encode -> dedupe -> portion -> record -> analyze -> deliver     per capture, this engine
+
+Each capture stage is a ``Stage(name, executor, workers)`` from the library
+below; the executor decides where it runs:
+
+* ``inline``: in the thread that finished the previous stage (the UI loop
+  for the first stages)
+* ``thread``: on the stage's own thread pool of ``workers`` threads
+* ``process``: on a process pool (``spawn``); the stage function and the
+  item must pickle, so only stateless stages such as ``encode`` qualify
+* ``async``: on a shared asyncio loop thread, at most ``workers`` at a
+  time; coroutine stages run natively, plain functions via ``to_thread``
+
+Items are plain dicts (``frame``, ``item_code``, ``jpeg``, ``food_conf``,
+``dish`` in; ``path``, ``timestamp``, ``caption_parts`` added on the way).
+A stage returning None drops the item, which is how ``dedupe`` works.
+The submitted ``frame`` may be a view into a buffer the caller reuses (the
+burst ring, the encoder's shared slots), so the first stage that leaves the
+submitting thread gets a copy of it.
+``Pipeline.submit`` returns a Future for the finished item.
+"""
+import time
+import asyncio
+import inspect
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+
+EXECUTORS = ("inline", "thread", "process", "async")
+
+
+@dataclass
+class Stage:
+    name: str
+    executor: str = "inline"
+    workers: int = None  # thread/process/async concurrency; None = config.upload_workers
+
+
+# ========== STAGE LIBRARY ==========
+def encode(item):
+    """Write the JPEG (or the camera's own MJPEG bytes) to the photo dir."""
+    from foodcapture.core import save_capture
+    item["path"], item["timestamp"] = save_capture(item["frame"], item.get("item_code", ""), item.get("jpeg"))
+    logging.info(f"✅ Image saved: {item['path']}")
+    return item
+
+
+class Dedupe:
+    """Drops a capture whose bytes match a recent one (config.dedupe_cache_size)."""
+
+    def __init__(self, resources):
+        from foodcapture.core import DuplicateFilter
+        self.duplicates = resources.get("duplicates") or DuplicateFilter()
+        self._lock = threading.Lock()
+
+    def __call__(self, item):
+        from foodcapture.core import drop_duplicate
+        with self._lock:
+            return None if drop_duplicate(item["path"], self.duplicates) else item
+
+
+class Portion:
+    """Segmentation portion metrics (config.portion_enabled), kept for the record stage."""
+
+    def __init__(self, resources):
+        from foodcapture.core import config
+        self.meter = resources.get("portions")
+        if self.meter is None and config.portion_enabled:
+            from foodcapture.portion import PortionMeter
+            self.meter = PortionMeter(config)
+            self.meter.model()  # at startup, not on the first capture
+
+    def __call__(self, item):
+        from foodcapture.core import config
+        if not config.portion_enabled:
+            return item
+        if self.meter is None:
+            from foodcapture.portion import PortionMeter
+            self.meter = PortionMeter(config)
+        item["portion"] = self.meter.measure(item["frame"], item.get("dish"))
+        if item["portion"] is not None:
+            logging.info(f"🍛 {item['portion'].caption()}")
+        return item
+
+
+class Record:
+    """Thumbnail, optional pre-screen and the pending delivery sidecar."""
+
+    def __init__(self, resources):
+        self.references = resources.get("references")
+        self.caption = resources.get("caption")  # a preset's caption template / free-text prompt
+        self.prompt = resources.get("prompt")
+
+    def __call__(self, item):
+        from foodcapture.core import create_record
+        item["caption_parts"] = create_record(
+            item["frame"], item["path"], item["timestamp"], item.get("item_code", ""),
+            self.references, item.get("food_conf", 0.0), item.get("dish"), item.pop("portion", None),
+            self.caption, self.prompt)
+        item.pop("frame", None)  # not needed past this point; keeps later hops cheap
+        item.pop("jpeg", None)
+        return item
+
+
+def analyze(item):
+    """OpenAI analysis (behind the circuit breaker) stored in the sidecar."""
+    from foodcapture import delivery
+    from foodcapture.core import analyze_capture
+    record = delivery.load_record(item["path"])
+    if record is not None and record.state != delivery.SENT:
+        analyze_capture(record)
+        delivery.save_record(record)
+    return item
+
+
+def deliver(item):
+    """Send to Telegram (and the fan-out chats) with whatever analysis the sidecar has."""
+    from foodcapture.core import analyze_and_send
+    analyze_and_send(item["path"], item.get("caption_parts"), analyze=False)
+    return item
+
+
+STAGES = {
+    "encode": lambda resources: encode,
+    "dedupe": Dedupe,
+    "portion": Portion,
+    "record": Record,
+    "analyze": lambda resources: analyze,
+    "deliver": lambda resources: deliver,
+}
+
+
+# ========== ENGINE ==========
+class Pipeline:
+    """Runs items through a list of Stage specs; see the module docstring."""
+
+    def __init__(self, stages, config, **resources):
+        self.stages = list(stages)
+        self._fns, self._pools = [], []
+        self._loop = self._loop_thread = None
+        self.in_flight = 0
+        self.stats = {stage.name: [0, 0.0] for stage in self.stages}  # name -> [items, seconds]
+        self.listeners = []  # called with (stage name, seconds) after each stage, e.g. BlackBox.timing
+        self._lock = threading.Lock()
+        for stage in self.stages:
+            if stage.name not in STAGES:
+                raise ValueError(f"Unknown pipeline stage {stage.name!r}; expected one of {', '.join(STAGES)}")
+            if stage.executor not in EXECUTORS:
+                raise ValueError(f"Stage {stage.name}: unknown executor {stage.executor!r}")
+            self._fns.append(STAGES[stage.name](resources))
+            self._pools.append(self._make_pool(stage, stage.workers or config.upload_workers))
+
+    def _make_pool(self, stage, workers):
+        if stage.executor == "thread":
+            return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=stage.name)
+        if stage.executor == "process":
+            return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        if stage.executor == "async":
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever, name="pipeline-async",
+                                                     daemon=True)
+                self._loop_thread.start()
+            return asyncio.Semaphore(workers)
+        return None
+
+    def __len__(self):
+        return self.in_flight
+
+    def submit(self, item):
+        """Start an item down the pipeline; the Future resolves to the final item or None."""
+        done = Future()
+        with self._lock:
+            self.in_flight += 1
+        done.add_done_callback(self._finished)
+        self._run(0, item, done, owned=False)
+        return done
+
+    def _finished(self, _):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _run(self, index, item, done, owned=True):
+        if item is None or index == len(self.stages):
+            done.set_result(item)
+            return
+        stage, fn, pool = self.stages[index], self._fns[index], self._pools[index]
+        started = time.perf_counter()
+        if stage.executor == "inline":
+            try:
+                result = fn(item)
+            except Exception as e:
+                return self._failed(stage, e, done)
+            self._account(stage, started)
+            return self._run(index + 1, result, done, owned)
+        if not owned and stage.executor != "process" and item.get("frame") is not None:
+            item["frame"] = item["frame"].copy()  # the caller reuses its buffer once submit returns
+        if stage.executor == "async":
+            future = asyncio.run_coroutine_threadsafe(self._run_async(pool, fn, item), self._loop)
+        else:
+            future = pool.submit(fn, item)
+        future.add_done_callback(lambda f: self._continue(index, started, f, done))
+
+    async def _run_async(self, semaphore, fn, item):
+        async with semaphore:
+            if inspect.iscoroutinefunction(fn):
+                return await fn(item)
+            return await asyncio.to_thread(fn, item)
+
+    def _continue(self, index, started, future, done):
+        stage = self.stages[index]
+        try:
+            result = future.result()
+        except Exception as e:
+            return self._failed(stage, e, done)
+        self._account(stage, started)
+        self._run(index + 1, result, done)
+
+    def _account(self, stage, started):
+        seconds = time.perf_counter() - started
+        with self._lock:
+            stats = self.stats[stage.name]
+            stats[0] += 1
+            stats[1] += seconds
+        for listener in self.listeners:
+            listener(stage.name, seconds)
+
+    def _failed(self, stage, error, done):
+        logging.error(f"❌ Pipeline stage {stage.name} failed: {error}")
+        done.set_exception(error)
+
+    def close(self, wait=True):
+        """Finish what is in flight (if wait) and stop the pools."""
+        while wait and self.in_flight:
+            time.sleep(0.05)
+        for pool in self._pools:
+            if isinstance(pool, (ThreadPoolExecutor, ProcessPoolExecutor)):
+                pool.shutdown(wait=wait)
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
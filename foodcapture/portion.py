@@ -0,0 +1,241 @@
+"""Local portion metrics from a YOLO segmentation model (``portion_enabled``).
+
+The OpenAI prompt's portion-size judgement costs a remote call and is not
+repeatable. Here a ``-seg`` model (``portion_model``) runs once on the
+captured frame, and the masks are turned into plain numbers with NumPy:
+
+* ``food_area``: fraction of the frame covered by food masks
+* ``coverage``: fraction of the plate (``portion_plate_labels``) covered by
+  food, which does not depend on how far the camera is from the pass
+* ``colours``: the most common colours of the food pixels
+
+They are compared with the mean of the same dish's reference photos
+(``portion_reference``, built from ``prescreen_reference_dir``)::
+
+    python -m foodcapture.portion build
+    python -m foodcapture.portion measure captured_....jpg
+
+``ratio`` is this plate over the reference (coverage when both have a plate,
+food area otherwise) and the verdict is ``small``/``ok``/``large`` outside or
+inside ``portion_tolerance``. The result goes into the caption, the sidecar
+(``portion``) and the order index.
+"""
+import os
+import json
+import logging
+import argparse
+import threading
+from dataclasses import dataclass, field, asdict
+
+import cv2
+import numpy as np
+
+from foodcapture.prescreen import downscale
+
+SMALL = "small"
+OK = "ok"
+LARGE = "large"
+UNKNOWN = "unknown"   # no reference stats for the dish
+NO_FOOD = "no food"   # no food mask at all
+
+COLOUR_LEVELS = 4  # per channel when counting dominant colours (64 bins)
+TOP_COLOURS = 3
+
+
+def dominant_colours(pixels, count=TOP_COLOURS):
+    """[[#rrggbb, share], ...] of the most common colours among BGR pixels (N x 3)."""
+    if not len(pixels):
+        return []
+    step = 256 // COLOUR_LEVELS
+    bins = pixels.astype(np.intp) // step
+    codes = (bins[:, 0] * COLOUR_LEVELS + bins[:, 1]) * COLOUR_LEVELS + bins[:, 2]
+    counts = np.bincount(codes, minlength=COLOUR_LEVELS ** 3)
+    sums = np.stack([np.bincount(codes, weights=pixels[:, c], minlength=COLOUR_LEVELS ** 3)
+                     for c in range(3)], axis=1)
+    top = np.argsort(counts)[::-1][:count]
+    top = top[counts[top] > 0]
+    means = sums[top] / counts[top, None]  # mean colour of each bin, not its corner
+    return [["#%02x%02x%02x" % (round(r), round(g), round(b)), round(float(n) / len(pixels), 3)]
+            for (b, g, r), n in zip(means, counts[top])]
+
+
+def segment_masks(results, names, shape, scale=1.0):
+    """{label: bool mask of `shape`} from a segmentation result, drawn at `scale`."""
+    masks = {}
+    if results is None or results[0].masks is None:
+        return masks
+    classes = results[0].boxes.cls.cpu().numpy().astype(int)
+    for cls_id, polygon in zip(classes, results[0].masks.xy):
+        if len(polygon) < 3:
+            continue
+        label = names[cls_id]
+        mask = masks.setdefault(label, np.zeros(shape, np.uint8))
+        cv2.fillPoly(mask, [np.round(polygon * scale).astype(np.int32)], 1)
+    return {label: mask.astype(bool) for label, mask in masks.items()}
+
+
+@dataclass
+class PortionResult:
+    verdict: str
+    dish: str = None
+    food_area: float = 0.0
+    coverage: float = None
+    ratio: float = None
+    colours: list = field(default_factory=list)
+
+    def caption(self):
+        if self.verdict == NO_FOOD:
+            return "Portion: no food found"
+        plate = f", {self.coverage:.0%} of the plate" if self.coverage is not None else ""
+        if self.ratio is None:
+            return f"Portion: {self.food_area:.0%} of the frame{plate} (no reference)"
+        return f"Portion: {self.verdict} ({self.ratio:.2f}x reference{plate})"
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def portion_metrics(frame, masks, food_labels, plate_labels, dish=None):
+    """PortionResult (without the reference comparison) from masks made at the frame's size."""
+    food = np.zeros(frame.shape[:2], bool)
+    areas = {}
+    for label, mask in masks.items():
+        if label in food_labels:
+            food |= mask
+            areas[label] = int(mask.sum())
+    if not food.any():
+        return PortionResult(NO_FOOD, dish)
+    plate = np.zeros_like(food)
+    for label in plate_labels:
+        if label in masks:
+            plate |= masks[label]
+    # A plate mask only counts if the food is actually on it.
+    plate_area = int((plate | food).sum()) if (plate & food).any() else 0
+    return PortionResult(
+        UNKNOWN,
+        dish or max(areas, key=areas.get),
+        food_area=round(float(food.mean()), 4),
+        coverage=round(float(food.sum()) / plate_area, 4) if plate_area else None,
+        colours=dominant_colours(frame[food]),
+    )
+
+
+class PortionReferences:
+    """Mean food_area / coverage per dish, from the JSON written by ``build``."""
+
+    def __init__(self, path):
+        self.path = path
+        self.stats = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.stats = json.load(f)
+            logging.info(f"🍛 Portion references loaded for: {', '.join(self.stats) or 'none'}")
+
+    def compare(self, result, tolerance):
+        """Fill in ratio and verdict against the dish's reference."""
+        reference = self.stats.get(result.dish)
+        if result.verdict == NO_FOOD or reference is None:
+            return result
+        if result.coverage is not None and reference.get("coverage"):
+            ratio = result.coverage / reference["coverage"]
+        elif reference.get("food_area"):
+            ratio = result.food_area / reference["food_area"]
+        else:
+            return result
+        result.ratio = round(ratio, 3)
+        result.verdict = SMALL if ratio < 1 - tolerance else LARGE if ratio > 1 + tolerance else OK
+        return result
+
+
+class PortionMeter:
+    """Runs the segmentation model (one call at a time) and measures a frame."""
+
+    def __init__(self, config):
+        self.config = config
+        self.references = PortionReferences(config.portion_reference)
+        self._model = None
+        self._lock = threading.Lock()
+
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                try:
+                    from ultralytics import YOLO
+                except ImportError:
+                    logging.error("❌ Portion metrics need ultralytics: pip install ultralytics")
+                    self._model = False
+                else:
+                    self._model = YOLO(self.config.portion_model)
+            return self._model
+
+    def measure(self, frame, dish=None, compare=True):
+        """PortionResult for a BGR frame, or None if the model is not available."""
+        model = self.model()
+        if not model:
+            return None
+        with self._lock:
+            results = model(frame, imgsz=self.config.inference_size, verbose=False)
+        small = downscale(frame)
+        scale = small.shape[1] / frame.shape[1]
+        masks = segment_masks(results, model.names, small.shape[:2], scale)
+        result = portion_metrics(small, masks, self.config.food_labels, self.config.portion_plate_labels, dish)
+        if compare:
+            self.references.compare(result, self.config.portion_tolerance)
+        return result
+
+
+def build_references(meter, reference_dir, out_path):
+    """Measure <reference_dir>/<label>/*.jpg and write the per-dish means to out_path."""
+    stats = {}
+    for label in sorted(os.listdir(reference_dir)) if os.path.isdir(reference_dir) else []:
+        label_dir = os.path.join(reference_dir, label)
+        if not os.path.isdir(label_dir):
+            continue
+        results = []
+        for name in sorted(os.listdir(label_dir)):
+            image = cv2.imread(os.path.join(label_dir, name))
+            if image is not None:
+                result = meter.measure(image, dish=label, compare=False)
+                if result is not None and result.verdict != NO_FOOD:
+                    results.append(result)
+        if not results:
+            logging.warning(f"⚠️ No food found in the {label} references")
+            continue
+        coverages = [r.coverage for r in results if r.coverage is not None]
+        stats[label] = {
+            "food_area": round(float(np.mean([r.food_area for r in results])), 4),
+            "coverage": round(float(np.mean(coverages)), 4) if coverages else None,
+            "count": len(results),
+        }
+        logging.info(f"🍛 {label}: {stats[label]}")
+    with open(out_path, "w") as f:
+        json.dump(stats, f, indent=1)
+    logging.info(f"✅ Portion references for {len(stats)} dishes -> {out_path}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Segmentation-based portion metrics.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bld = sub.add_parser("build", help="Per-dish reference stats from the reference photos")
+    bld.add_argument("--dir", help="Reference photos (default: config prescreen_reference_dir)")
+    bld.add_argument("--out", help="Output JSON (default: config portion_reference)")
+    msr = sub.add_parser("measure", help="Print the metrics for images")
+    msr.add_argument("images", nargs="+")
+    msr.add_argument("--dish", help="Dish label (default: the largest food mask)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s')
+    from foodcapture.core import config
+    meter = PortionMeter(config)
+    if args.command == "build":
+        build_references(meter, args.dir or config.prescreen_reference_dir, args.out or config.portion_reference)
+        return
+    for path in args.images:
+        image = cv2.imread(path)
+        result = meter.measure(image, args.dish) if image is not None else None
+        print(json.dumps({"image": path, **(result.to_dict() if result else {})}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
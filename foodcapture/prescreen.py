@@ -0,0 +1,150 @@
+"""Local CPU pre-screen that decides whether a capture needs the OpenAI analysis.
+
+Cheap checks on the captured frame:
+
+* YOLO food confidence (taken from the latest preview detection)
+* exposure: mean brightness and the fraction of crushed/blown pixels
+* sharpness: Laplacian variance of a 320px-wide grayscale copy
+* colour: HSV histogram correlation against reference photos of the same dish
+
+A plate that passes every check is ``pass`` and is sent without the remote
+call. Anything else is ``uncertain`` (a check could not run, e.g. no
+reference for the dish) or ``flag`` (a check failed) and still goes to
+``analyze_image_with_openai``. Thresholds live in the ``prescreen_*`` config
+keys and are hot-reloadable.
+"""
+import os
+import logging
+from dataclasses import dataclass, field, asdict
+
+import cv2
+import numpy as np
+
+PASS = "pass"
+UNCERTAIN = "uncertain"
+FLAG = "flag"
+
+ANALYSIS_WIDTH = 320
+HIST_BINS = [30, 32]          # hue, saturation
+HIST_RANGES = [0, 180, 0, 256]
+
+
+def downscale(frame, width=ANALYSIS_WIDTH):
+    h, w = frame.shape[:2]
+    if w <= width:
+        return frame
+    return cv2.resize(frame, (width, int(h * width / w)), interpolation=cv2.INTER_AREA)
+
+
+def sharpness(frame):
+    """Variance of the Laplacian on a downscaled grayscale copy; higher is sharper."""
+    gray = cv2.cvtColor(downscale(frame), cv2.COLOR_BGR2GRAY)
+    return float(cv2.Laplacian(gray, cv2.CV_32F).var())
+
+
+def exposure(frame):
+    """(mean brightness 0-255, fraction of pixels crushed below 5 or blown above 250)."""
+    gray = cv2.cvtColor(downscale(frame), cv2.COLOR_BGR2GRAY)
+    clipped = np.count_nonzero((gray < 5) | (gray > 250)) / gray.size
+    return float(gray.mean()), float(clipped)
+
+
+def color_histogram(frame):
+    hsv = cv2.cvtColor(downscale(frame), cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, HIST_BINS, HIST_RANGES)
+    return cv2.normalize(hist, hist, 1.0, 0.0, cv2.NORM_L1)
+
+
+def food_confidence(yolo_model, results, food_labels):
+    """(best food-class confidence, its label) from a YOLO result, or (0.0, None)."""
+    if results is None or not len(results[0].boxes):
+        return 0.0, None
+    boxes = results[0].boxes
+    classes = boxes.cls.cpu().numpy().astype(int)
+    confs = boxes.conf.cpu().numpy()
+    names = np.array([yolo_model.names[c] for c in classes])
+    mask = np.isin(names, food_labels)
+    if not mask.any():
+        return 0.0, None
+    best = int(np.argmax(np.where(mask, confs, -1.0)))
+    return float(confs[best]), str(names[best])
+
+
+class ReferenceLibrary:
+    """Mean colour histogram per dish, built from <reference_dir>/<label>/*.jpg."""
+
+    def __init__(self, reference_dir):
+        self.histograms = {}
+        if not os.path.isdir(reference_dir):
+            return
+        for label in sorted(os.listdir(reference_dir)):
+            label_dir = os.path.join(reference_dir, label)
+            if not os.path.isdir(label_dir):
+                continue
+            hists = []
+            for name in os.listdir(label_dir):
+                image = cv2.imread(os.path.join(label_dir, name))
+                if image is not None:
+                    hists.append(color_histogram(image))
+            if hists:
+                self.histograms[label] = np.mean(hists, axis=0).astype(np.float32)
+        logging.info(f"🍽️ Pre-screen references loaded for: {', '.join(self.histograms) or 'none'}")
+
+    def similarity(self, label, frame):
+        reference = self.histograms.get(label)
+        if reference is None:
+            return None
+        return float(cv2.compareHist(reference, color_histogram(frame), cv2.HISTCMP_CORREL))
+
+
+@dataclass
+class PrescreenResult:
+    verdict: str
+    food_conf: float
+    dish: str = None
+    brightness: float = 0.0
+    clipped: float = 0.0
+    sharpness: float = 0.0
+    similarity: float = None
+    reasons: list = field(default_factory=list)
+
+    @property
+    def needs_remote(self):
+        return self.verdict != PASS
+
+    def caption(self):
+        return (f"Local pre-screen passed ✅ ({self.dish}, conf {self.food_conf:.2f}, "
+                f"sharpness {self.sharpness:.0f}, match {self.similarity:.2f})")
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def prescreen(frame, food_conf, dish, references, config):
+    """Run the local checks on a captured frame and return a PrescreenResult."""
+    brightness, clipped = exposure(frame)
+    result = PrescreenResult(
+        verdict=PASS, food_conf=food_conf, dish=dish,
+        brightness=brightness, clipped=clipped, sharpness=sharpness(frame),
+    )
+    flags, unknowns = [], []
+    if food_conf < config.prescreen_min_food_conf:
+        flags.append(f"food confidence {food_conf:.2f}")
+    if not config.prescreen_min_brightness <= brightness <= config.prescreen_max_brightness:
+        flags.append(f"brightness {brightness:.0f}")
+    if clipped > config.prescreen_max_clipped:
+        flags.append(f"clipped {clipped:.1%}")
+    if result.sharpness < config.prescreen_min_sharpness:
+        flags.append(f"sharpness {result.sharpness:.0f}")
+    result.similarity = references.similarity(dish, frame) if dish else None
+    if result.similarity is None:
+        unknowns.append(f"no reference for {dish or 'unknown dish'}")
+    elif result.similarity < config.prescreen_min_similarity:
+        flags.append(f"colour match {result.similarity:.2f}")
+
+    if flags:
+        result.verdict = FLAG
+    elif unknowns:
+        result.verdict = UNCERTAIN
+    result.reasons = flags + unknowns
+    return result
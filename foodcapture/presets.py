@@ -0,0 +1,209 @@
+"""The capture script variants as presets of the shared pipeline.
+
+Every ``food-capture*.py`` script used to be its own copy of the loop; now
+each one is a ``Preset``: which per-frame stages run in the UI loop
+(preview window, typed order number, YOLO overlay, success sound) and which
+capture stages run after Enter, on which executor (see pipeline.py)::
+
+    python -m foodcapture.presets list
+    python -m foodcapture.presets v2.4
+
+``kiosk`` is the stage list ``food-capture.py`` builds on; that script adds
+the features this generic loop leaves out (ROI, motion gate, tracking,
+multiprocess mode, frame bus, camera supervision, profiling).
+
+A preset keeps its script's caption text, OpenAI prompt and overlay. What
+they all share on purpose: file names and the timestamp format (save_capture,
+so the index and batch tools read every capture), the OpenAI model
+(``openai_model``), the burst's sharpest-frame pick, and delivery through the
+sidecars. A failed analysis is therefore captioned "Food image" and edited in
+once the Reanalyzer succeeds, where v2.1 sent "⚠️ Failed to get description.".
+"""
+import os
+import sys
+import time
+import logging
+from dataclasses import dataclass, field
+
+import cv2
+
+from foodcapture.pipeline import Pipeline, Stage
+
+WINDOW_NAME = "📷 Live Feed - Press Enter to Capture"
+
+
+@dataclass
+class Preset:
+    description: str
+    stages: list = field(default_factory=list)  # capture stages, see pipeline.STAGES
+    preview: bool = True      # live window; False: press Enter in the terminal
+    order_code: bool = False  # type an order number into the preview
+    detect: bool = False      # YOLO boxes on the preview
+    sound: bool = False       # play success.wav on capture
+    caption: list = None      # caption lines ({item_code}, {timestamp}, {analysis}); None = the kiosk's
+    prompt: str = None        # free-text OpenAI prompt; None = the structured FoodQuality analysis
+
+
+# What food-capture3.1.py asked before the analysis became structured.
+V3_PROMPT = """You are a food inspector AI. Briefly analyze this food photo and reply in this format:
+
+Summary: [one short line]
+Color: [one word or phrase]
+Shape/Size: [one word or phrase]
+Packaging: [short phrase or 'N/A']
+Presentation: [short phrase]
+Unusual: [short phrase or 'None']
+Rating: [bad|normal|good|excellent] [emoji: 🔴🟠🟢🔵]
+
+Keep it concise and use the emoji for the rating at the end.
+"""
+
+PRESETS = {
+    "v0.1": Preset("Capture on Enter in the terminal, save only.",
+                   [Stage("encode")], preview=False),
+    "v1": Preset("Capture on Enter in the terminal and send to Telegram.",
+                 [Stage("encode"), Stage("record"), Stage("deliver")], preview=False,
+                 caption=["Milagiriya Food Captured"]),
+    "v2": Preset("Terminal capture with duplicate check, sent inline.",
+                 [Stage("encode"), Stage("dedupe"), Stage("record"), Stage("deliver")], preview=False,
+                 caption=["Food capture", "", "Captured at {timestamp}"]),
+    "v2.1": Preset("Live preview; free-text AI description and send inline.",
+                   [Stage("encode"), Stage("record"), Stage("analyze"), Stage("deliver")],
+                   caption=["{analysis}", "", "Captured at {timestamp}"],
+                   prompt="Please analyze the following image."),
+    "v2.2": Preset("Live preview with duplicate check, sent inline as 'Chinese Dragon Cafe'.",
+                   [Stage("encode"), Stage("dedupe"), Stage("record"), Stage("deliver")],
+                   caption=["Chinese Dragon Cafe", "", "Captured at {timestamp}"]),
+    "v2.3": Preset("Live preview with duplicate check, sent inline as 'Chinese Dragon Cafe - Milagiriya'.",
+                   [Stage("encode"), Stage("dedupe"), Stage("record"), Stage("deliver")],
+                   caption=["Chinese Dragon Cafe - Milagiriya", "", "Captured at {timestamp}"]),
+    "v2.4": Preset("Order numbers on the preview, upload in the background.",
+                   [Stage("encode"), Stage("dedupe"), Stage("record"), Stage("deliver", "thread")],
+                   order_code=True),
+    "v3.1": Preset("Order numbers on the preview, analysis and upload in the background.",
+                   [Stage("encode"), Stage("dedupe"), Stage("record"),
+                    Stage("analyze", "thread"), Stage("deliver", "thread")],
+                   order_code=True, sound=True, prompt=V3_PROMPT),
+    "kiosk": Preset("The full kiosk (food-capture.py) capture stages.",
+                    [Stage("encode"), Stage("dedupe"), Stage("portion", "thread", 1), Stage("record"),
+                     Stage("analyze", "thread"), Stage("deliver", "thread")],
+                    order_code=True, detect=True, sound=True),
+}
+
+
+def play_success_sound():
+    from playsound import playsound
+    playsound('success.wav', block=False)
+
+
+def capture_item(cap, ring, item_code, yolo_model=None, results=None, stale=False):
+    """Pick the sharpest frame of a burst and wrap it as a pipeline item (None if no frame).
+
+    With ``stale`` (nothing read the camera while waiting for Enter) the
+    queued frames from before the keypress are dropped first.
+    """
+    from foodcapture.burst import capture_burst, drop_stale
+    from foodcapture.core import config
+    from foodcapture.prescreen import food_confidence
+    if stale:
+        drop_stale(cap)
+    frame, jpeg, score, burst_size = capture_burst(cap, ring, config.burst_after)
+    if frame is None:
+        return None
+    logging.info(f"🎯 Sharpest of {burst_size} frames (score {score:.0f})")
+    food_conf, dish = (food_confidence(yolo_model, results, config.food_labels)
+                       if yolo_model is not None and results is not None and config.prescreen_enabled
+                       else (0.0, None))
+    return {"frame": frame, "jpeg": jpeg, "item_code": item_code, "food_conf": food_conf, "dish": dish}
+
+
+def run(name):
+    """Run a preset's capture loop until ESC / Ctrl+C."""
+    from foodcapture.burst import FrameRing
+    from foodcapture.core import config, draw_code_box, detect_food, annotate_detections, reanalyzer, DuplicateFilter
+    from foodcapture.prescreen import ReferenceLibrary
+    from foodcapture.sources import open_frame_source
+
+    preset = PRESETS[name]
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s')
+    os.makedirs(config.photo_dir, exist_ok=True)
+    cap = open_frame_source(config.camera_source, config.image_width, config.image_height,
+                            passthrough=config.mjpeg_passthrough)
+    # The local pre-screen works from YOLO's food confidence, so only presets that detect get it.
+    pipeline = Pipeline(preset.stages, config, duplicates=DuplicateFilter(), caption=preset.caption,
+                        prompt=preset.prompt,
+                        references=ReferenceLibrary(config.prescreen_reference_dir) if preset.detect else None)
+    yolo_model = None
+    if preset.detect:
+        from foodcapture.quantize import load_detector
+        yolo_model = load_detector(config)
+    if any(stage.name == "analyze" for stage in preset.stages):
+        reanalyzer.start()
+    ring = FrameRing(config.burst_before if preset.preview else 0)
+    logging.info(f"📸 Preset {name}: {preset.description}")
+
+    code_text, frame_index, results = "", 0, None
+    try:
+        while True:
+            if not preset.preview:
+                input("📸 Press [Enter] to capture. Ctrl+C to exit.")
+                key = 13
+            else:
+                ret, frame = cap.read()
+                if not ret or frame is None:
+                    logging.error("❌ Camera frame not available.")
+                    if cv2.waitKey(100) & 0xFF == 27:
+                        break
+                    continue
+                ring.push(frame, cap.jpeg)
+                if yolo_model is not None:
+                    if results is None or frame_index % config.detect_every == 0:
+                        results, _ = detect_food(yolo_model, frame)
+                    frame = annotate_detections(results, frame)
+                frame_index += 1
+                display_frame = cv2.resize(frame, (config.image_width, config.image_height))
+                if preset.order_code:
+                    display_frame = draw_code_box(display_frame, code_text)
+                cv2.imshow(WINDOW_NAME, display_frame)
+                key = cv2.waitKey(1) & 0xFF
+
+            if preset.order_code and 32 <= key <= 126:
+                code_text += chr(key)
+            elif preset.order_code and key == 8:
+                code_text = code_text[:-1]
+            elif key == 13:
+                item = capture_item(cap, ring, code_text.strip(), yolo_model, results,
+                                    stale=not preset.preview)
+                code_text = ""
+                if item is None:
+                    logging.error("❌ Camera frame not available.")
+                    continue
+                if preset.sound:
+                    play_success_sound()
+                pipeline.submit(item)
+                time.sleep(config.cooldown_seconds)
+            elif key == 27:
+                logging.info("👋 Exiting...")
+                break
+    except KeyboardInterrupt:
+        logging.info("👋 Exiting...")
+    finally:
+        cap.release()
+        cv2.destroyAllWindows()
+        pipeline.close()
+        reanalyzer.stop()
+
+
+def main():
+    name = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if name not in PRESETS:
+        for key, preset in PRESETS.items():
+            stages = " -> ".join(f"{s.name}" + (f" [{s.executor}]" if s.executor != "inline" else "")
+                                 for s in preset.stages)
+            print(f"{key:<6} {preset.description}\n       {stages}")
+        return
+    run(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""On-demand profiling of the capture loop without restarting the kiosk.
+
+A profiling run lasts a fixed number of seconds and produces, in the log
+directory:
+
+* ``<tag>.pstats``    - cProfile of the main (cv2 window) loop, open with ``pstats`` or snakeviz
+* ``<tag>.collapsed`` - stack samples of every thread in collapsed-stack format,
+                        feed to flamegraph.pl or speedscope
+* ``<tag>.txt``       - FPS and queue state at start/end plus the top functions
+
+Runs are requested with ``request()`` (safe to call from a signal handler or
+another thread) and driven by calling ``tick()`` once per loop iteration, so
+cProfile is always enabled and disabled on the loop's own thread.
+"""
+import os
+import sys
+import time
+import cProfile
+import logging
+import pstats
+import threading
+from collections import Counter
+from datetime import datetime
+
+
+class FpsMeter:
+    """Smoothed frames-per-second of the loop that calls tick()."""
+
+    def __init__(self, smoothing=0.9):
+        self.smoothing = smoothing
+        self.fps = 0.0
+        self._last = None
+
+    def tick(self):
+        now = time.perf_counter()
+        if self._last is not None and now > self._last:
+            instant = 1.0 / (now - self._last)
+            self.fps = instant if not self.fps else self.smoothing * self.fps + (1 - self.smoothing) * instant
+        self._last = now
+        return self.fps
+
+
+class _StackSampler(threading.Thread):
+    """Samples the Python stacks of all other threads at a fixed interval."""
+
+    def __init__(self, interval):
+        super().__init__(name="profiler-sampler", daemon=True)
+        self.interval = interval
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        names = {}
+        while not self._stop_event.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class LoopProfiler:
+    """Profiles the calling loop and samples worker threads for `duration` seconds."""
+
+    def __init__(self, log_dir, duration=10, interval=0.005, stats_fn=None):
+        self.log_dir = log_dir
+        self.duration = duration
+        self.interval = interval
+        self.stats_fn = stats_fn or (lambda: {})
+        self._requested = threading.Event()
+        self._profile = None
+        self._sampler = None
+        self._started_at = None
+        self._start_stats = None
+
+    @property
+    def active(self):
+        return self._profile is not None
+
+    def request(self, *_):
+        """Ask for a profiling run; the loop starts it on its next tick()."""
+        self._requested.set()
+
+    def tick(self):
+        if self._profile is None:
+            if self._requested.is_set():
+                self._requested.clear()
+                self._start()
+        elif time.monotonic() - self._started_at >= self.duration:
+            self._stop()
+
+    def close(self):
+        if self._profile is not None:
+            self._stop()
+
+    def _start(self):
+        logging.info(f"🩺 Profiling capture loop for {self.duration}s...")
+        self._start_stats = self.stats_fn()
+        self._started_at = time.monotonic()
+        self._sampler = _StackSampler(self.interval)
+        self._sampler.start()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def _stop(self):
+        self._profile.disable()
+        self._sampler.stop()
+        end_stats = self.stats_fn()
+        os.makedirs(self.log_dir, exist_ok=True)
+        tag = datetime.now().strftime("profile_%Y%m%d_%H%M%S")
+        if "fps" in end_stats:
+            tag += f"_fps{end_stats['fps']:.0f}"
+        base = os.path.join(self.log_dir, tag)
+
+        self._profile.dump_stats(base + ".pstats")
+        with open(base + ".collapsed", "w") as f:
+            for stack, count in self._sampler.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(base + ".txt", "w") as f:
+            f.write(f"duration: {time.monotonic() - self._started_at:.1f}s\n")
+            f.write(f"start: {self._start_stats}\n")
+            f.write(f"end: {end_stats}\n\n")
+            stats = pstats.Stats(self._profile, stream=f)
+            stats.sort_stats("cumulative").print_stats(30)
+
+        logging.info(f"🩺 Profile written: {base}.pstats / .collapsed / .txt")
+        self._profile = None
+        self._sampler = None
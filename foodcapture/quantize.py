@@ -0,0 +1,177 @@
+"""INT8 detector: static quantization of the YOLO model, calibrated on our own captures.
+
+``detector_precision = "int8"`` makes the kiosk, the detector process, the
+presets and the batch re-scorer load ``int8_model`` (default
+``<yolo_model stem>.int8.onnx``) instead of the FP32 ``yolo_model``. Build it
+once per model, on the machine or a copy of the archive::
+
+    python -m foodcapture.quantize build [--images ./image] [--count 300]
+
+The model is exported to ONNX (dynamic input size, so ``inference_size``
+stays hot) and quantized with onnxruntime in QDQ format: per-channel INT8
+weights, UINT8 activations. Activation ranges are calibrated on ``--count``
+captures spread evenly over the archive, letterboxed exactly like
+ultralytics does at ``inference_size``. Only Conv and MatMul are quantized;
+the detection head's decode (sigmoid, concat, box arithmetic) stays in
+float, which is where a fully quantized YOLO loses most of its accuracy.
+The calibration file list is written next to the model
+(``.calibration.txt``) so ``benchmarks/compare_detectors.py`` can leave
+those images out when it compares the model with the FP32 ONNX export
+(``<yolo_model stem>.onnx``), which build() keeps.
+
+Needs ``pip install ultralytics onnx onnxruntime``.
+"""
+import os
+import logging
+import argparse
+
+import cv2
+import numpy as np
+
+LETTERBOX_COLOR = (114, 114, 114)
+QUANTIZED_OPS = ["Conv", "MatMul"]
+
+
+def fp32_onnx_path(config):
+    """Where build() leaves the FP32 ONNX export (ultralytics writes it next to the .pt)."""
+    return os.path.splitext(config.yolo_model)[0] + ".onnx"
+
+
+def int8_model_path(config):
+    return config.int8_model or os.path.splitext(config.yolo_model)[0] + ".int8.onnx"
+
+
+def calibration_list_path(model_path):
+    return os.path.splitext(model_path)[0] + ".calibration.txt"
+
+
+def detector_path(config):
+    """Model file for config.detector_precision; falls back to FP32 if the INT8 file is missing."""
+    if config.detector_precision != "int8":
+        return config.yolo_model
+    path = int8_model_path(config)
+    if not os.path.exists(path):
+        logging.warning(f"⚠️ {path} not found (python -m foodcapture.quantize build); using FP32 {config.yolo_model}")
+        return config.yolo_model
+    return path
+
+
+def load_detector(config):
+    """The YOLO detector for config.detector_precision."""
+    from ultralytics import YOLO
+    path = detector_path(config)
+    if path != config.yolo_model:
+        logging.info(f"🧮 INT8 detector: {path}")
+    return YOLO(path, task="detect")
+
+
+def letterbox(frame, size):
+    """Resize keeping the aspect ratio and pad to size x size, as ultralytics' LetterBox."""
+    h, w = frame.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = round(w * scale), round(h * scale)
+    if (new_w, new_h) != (w, h):
+        frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    dw, dh = (size - new_w) / 2, (size - new_h) / 2
+    top, bottom = round(dh - 0.1), round(dh + 0.1)
+    left, right = round(dw - 0.1), round(dw + 0.1)
+    return cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR)
+
+
+def model_input(frame, size):
+    """1x3xSxS float32 RGB in [0, 1], the FP32 model's input for a BGR frame."""
+    image = letterbox(frame, size)[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(image, dtype=np.float32)[None] / 255.0
+
+
+def calibration_images(photo_dir, count):
+    """`count` capture paths spread evenly over the archive (all lighting, all dishes)."""
+    from foodcapture.batch import iter_images
+    paths = list(iter_images(photo_dir))
+    if len(paths) <= count:
+        return paths
+    return [paths[int(i)] for i in np.linspace(0, len(paths) - 1, count)]
+
+
+def _reader(paths, input_name, size):
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class ArchiveReader(CalibrationDataReader):
+        """Feeds the calibration images one at a time, so memory stays flat."""
+
+        def __init__(self):
+            self._paths = iter(paths)
+
+        def get_next(self):
+            for path in self._paths:
+                frame = cv2.imread(path)
+                if frame is not None:
+                    return {input_name: model_input(frame, size)}
+            return None
+
+    return ArchiveReader()
+
+
+def build(config, photo_dir, count, out_path=None, method="minmax"):
+    """Export, calibrate and quantize; returns the INT8 model path."""
+    try:
+        import onnx
+        from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+        from ultralytics import YOLO
+    except ImportError:
+        raise SystemExit("INT8 quantization needs: pip install ultralytics onnx onnxruntime")
+
+    out_path = out_path or int8_model_path(config)
+    paths = calibration_images(photo_dir, count)
+    if not paths:
+        raise SystemExit(f"No captures in {photo_dir} to calibrate on")
+    logging.info(f"🧮 Exporting {config.yolo_model} to ONNX at {config.inference_size}px...")
+    fp32_path = YOLO(config.yolo_model).export(format="onnx", imgsz=config.inference_size, dynamic=True)
+    prepared_path = os.path.splitext(out_path)[0] + ".prep.onnx"
+    # Symbolic shape inference cannot resolve the dynamic height/width through the
+    # head's reshapes; ONNX's own shape inference and the optimizer still run.
+    quant_pre_process(fp32_path, prepared_path, skip_symbolic_shape=True)
+
+    fp32 = onnx.load(fp32_path)
+    input_name = fp32.graph.input[0].name
+    logging.info(f"🧮 Calibrating on {len(paths)} captures from {photo_dir} ({method})...")
+    quantize_static(
+        prepared_path, out_path, _reader(paths, input_name, config.inference_size),
+        quant_format=QuantFormat.QDQ, per_channel=True,
+        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+        op_types_to_quantize=QUANTIZED_OPS,
+        calibrate_method={"minmax": CalibrationMethod.MinMax, "entropy": CalibrationMethod.Entropy,
+                          "percentile": CalibrationMethod.Percentile}[method],
+    )
+    os.remove(prepared_path)
+
+    # ultralytics reads class names, stride and task from the ONNX metadata; keep them.
+    quantized = onnx.load(out_path)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(fp32.metadata_props)
+    onnx.save(quantized, out_path)
+    with open(calibration_list_path(out_path), "w") as f:
+        f.write("\n".join(os.path.basename(path) for path in paths) + "\n")
+    logging.info(f"✅ INT8 model {out_path} ({os.path.getsize(out_path) / 1e6:.1f} MB, "
+                 f"FP32 ONNX {os.path.getsize(fp32_path) / 1e6:.1f} MB)")
+    return out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the INT8 detector.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bld = sub.add_parser("build", help="Export yolo_model to ONNX and quantize it to INT8")
+    bld.add_argument("--images", help="Captures to calibrate on (default: config photo_dir)")
+    bld.add_argument("--count", type=int, default=300, help="Calibration images, spread over the archive")
+    bld.add_argument("--out", help="INT8 model path (default: config int8_model)")
+    bld.add_argument("--method", choices=("minmax", "entropy", "percentile"), default="minmax")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s')
+    from foodcapture.core import config
+    build(config, args.images or config.photo_dir, args.count, args.out, args.method)
+
+
+if __name__ == "__main__":
+    main()
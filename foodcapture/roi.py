@@ -0,0 +1,85 @@
+"""Region of interest: the part of the pass where plates are actually put down.
+
+``roi_view`` returns a NumPy slice of the frame (a view, no pixels are
+copied), so detection, the motion gate, burst scoring, the pre-screen and
+the saved JPEG all work on the plate zone only. YOLO cost and upload size
+shrink roughly with the ROI area.
+
+The ROI is the ``roi`` config key ([x, y, width, height] at
+``image_width`` x ``image_height``; ``scale_roi`` maps it onto a lower
+preview resolution); draw it once with
+
+    python food-capture.py --setup-roi
+"""
+import os
+import re
+import logging
+
+import cv2
+
+ROI_COLOR = (0, 200, 255)
+
+
+def clamp_roi(roi, frame_shape):
+    """Clip [x, y, w, h] to the frame; returns None for an empty or missing ROI."""
+    if not roi:
+        return None
+    height, width = frame_shape[:2]
+    x, y, w, h = roi
+    x0, y0 = max(0, min(x, width)), max(0, min(y, height))
+    x1, y1 = max(x0, min(x + w, width)), max(y0, min(y + h, height))
+    if x1 == x0 or y1 == y0:
+        return None
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def roi_view(frame, roi):
+    """The ROI of the frame as a view into the same buffer (whole frame if no ROI)."""
+    box = clamp_roi(roi, frame.shape)
+    if box is None:
+        return frame
+    x, y, w, h = box
+    return frame[y:y + h, x:x + w]
+
+
+def scale_roi(roi, sx, sy):
+    """Map an ROI given at one resolution onto a frame scaled by (sx, sy)."""
+    if not roi:
+        return roi
+    x, y, w, h = roi
+    return [round(x * sx), round(y * sy), max(1, round(w * sx)), max(1, round(h * sy))]
+
+
+def draw_roi(frame, roi):
+    box = clamp_roi(roi, frame.shape)
+    if box is not None:
+        x, y, w, h = box
+        cv2.rectangle(frame, (x, y), (x + w, y + h), ROI_COLOR, 2)
+    return frame
+
+
+def select_roi(frame, window_name="Select plate zone - drag, then Enter/Space (c = cancel)"):
+    """Let the user drag the ROI on a frame; returns [x, y, w, h] or None if cancelled."""
+    x, y, w, h = cv2.selectROI(window_name, frame, showCrosshair=True, fromCenter=False)
+    cv2.destroyWindow(window_name)
+    if w == 0 or h == 0:
+        return None
+    return [int(x), int(y), int(w), int(h)]
+
+
+def save_roi(config_path, roi):
+    """Write `roi = [...]` into the TOML config, replacing an existing roi line."""
+    line = f"roi = [{', '.join(str(v) for v in roi)}]"
+    text = ""
+    if os.path.exists(config_path):
+        with open(config_path) as f:
+            text = f.read()
+    pattern = re.compile(r"^roi\s*=.*$", re.MULTILINE)
+    if pattern.search(text):
+        text = pattern.sub(line, text, count=1)
+    else:
+        # Top-level keys must come before any [table] header.
+        text = line + "\n" + text
+    with open(config_path, "w") as f:
+        f.write(text)
+    logging.info(f"📐 ROI saved to {config_path}: {roi}")
@@ -0,0 +1,49 @@
+"""Frame slots in ``multiprocessing.shared_memory`` for handing frames between processes.
+
+A ``SharedFrameRing`` is one shared block cut into ``slots`` equally sized
+frame buffers. The producer copies a frame into a slot with ``put`` and sends
+only ``(slot, shape)`` over a queue; the consumer wraps the same bytes with
+``view`` as a NumPy array, so no pixels go through pickle or a pipe. Slot
+ownership (who may write which slot when) is up to the caller.
+"""
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedFrameRing:
+    def __init__(self, slots, max_shape, dtype=np.uint8, name=None):
+        self.slots = slots
+        self.max_shape = tuple(max_shape)
+        self.dtype = np.dtype(dtype)
+        self.slot_bytes = int(np.prod(self.max_shape)) * self.dtype.itemsize
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * slots)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+    def spec(self):
+        """Picklable description for ``attach`` in another process."""
+        return self.shm.name, self.slots, self.max_shape, self.dtype.str
+
+    @classmethod
+    def attach(cls, spec):
+        name, slots, max_shape, dtype = spec
+        return cls(slots, max_shape, dtype=dtype, name=name)
+
+    def view(self, slot, shape):
+        """NumPy array over the slot's bytes (no copy); drop it before ``close``."""
+        return np.ndarray(shape, self.dtype, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def put(self, slot, frame):
+        """Copy a frame into a slot and return its shape for the control message."""
+        if frame.nbytes > self.slot_bytes:
+            raise ValueError(f"frame {frame.shape} does not fit a {self.max_shape} slot")
+        np.copyto(self.view(slot, frame.shape), frame)
+        return frame.shape
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
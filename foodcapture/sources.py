@@ -0,0 +1,404 @@
+"""Frame sources: one interface over cameras, video files, image folders and streams.
+
+Every source follows the ``cv2.VideoCapture`` calling convention
+(``ret, frame = source.read()``, ``source.release()``) so the capture loop
+does not care where frames come from.
+
+Sources backed by ``cv2.VideoCapture`` decode into a preallocated buffer
+(``cap.read(image=buf)``) instead of allocating a new 1280x720 BGR array
+(~2.7 MB) per frame. The returned frame is therefore only valid until the
+next ``read()``; copy it if you need to keep it.
+
+A camera opened with ``passthrough`` also keeps the compressed MJPEG frame
+it decoded in ``source.jpeg``, so a capture can be saved byte for byte
+instead of being re-encoded.
+"""
+import os
+import csv
+import sys
+import time
+import logging
+
+import cv2
+
+from foodcapture.bus import DEFAULT_BUS_NAME, FrameSubscriber
+from foodcapture.mjpeg import is_jpeg
+
+BUS_PREFIX = "bus:"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+STREAM_PREFIXES = ("rtsp://", "rtmp://", "http://", "https://", "udp://", "tcp://")
+
+
+STILL_WARMUP_FRAMES = 2  # frames dropped after a resolution switch (exposure settles, stale buffers)
+
+
+class FrameSource:
+    """Base class for everything the capture loop can read frames from."""
+
+    jpeg = None  # compressed bytes of the last frame, for sources that pass them through
+
+    def grab_stills(self, width, height, count=1):
+        """Read ``count`` (frame, jpeg) pairs for a capture at width x height.
+
+        Sources that cannot change resolution return what they stream.
+        """
+        stills = []
+        for _ in range(count):
+            ret, frame = self.read()
+            if ret and frame is not None:
+                # The source may reuse its buffer, so keep a copy of each read.
+                stills.append((frame.copy(), self.jpeg))
+        return stills
+
+    def read(self):
+        raise NotImplementedError
+
+    def isOpened(self):
+        return True
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class _CaptureSource(FrameSource):
+    """Wraps a cv2.VideoCapture and reuses one frame buffer across reads."""
+
+    def __init__(self, cap, reuse_buffer=True):
+        self.cap = cap
+        self.reuse_buffer = reuse_buffer
+        self._buffer = None
+
+    def read(self):
+        if self.reuse_buffer and self._buffer is not None:
+            ret, frame = self.cap.read(image=self._buffer)
+        else:
+            ret, frame = self.cap.read()
+        if ret and frame is not None and self.reuse_buffer:
+            # OpenCV hands back a new array if the frame size changed.
+            self._buffer = frame
+        return ret, frame
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def release(self):
+        self.cap.release()
+        self._buffer = None
+
+    def resolution(self):
+        return int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def set_resolution(self, width, height):
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        return self.resolution()
+
+
+class CameraSource(_CaptureSource):
+    """A local camera; on Linux opened through V4L2 and negotiated to MJPEG.
+
+    MJPEG keeps 1280x720 within USB 2.0 bandwidth at full frame rate and is
+    cheaper to decode than the raw YUYV most webcams fall back to.
+    """
+
+    def __init__(self, device=0, width=1280, height=720, fps=None, fourcc="MJPG", reuse_buffer=True,
+                 passthrough=False):
+        backend = cv2.CAP_V4L2 if sys.platform.startswith("linux") else cv2.CAP_ANY
+        cap = cv2.VideoCapture(device, backend)
+        if fourcc:
+            # FOURCC must be set before the size for V4L2 to pick the MJPEG mode.
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            cap.set(cv2.CAP_PROP_FPS, fps)
+        super().__init__(cap, reuse_buffer)
+        self.device = device
+        self.passthrough = False
+        if cap.isOpened():
+            negotiated = int(cap.get(cv2.CAP_PROP_FOURCC))
+            fourcc_str = "".join(chr((negotiated >> 8 * i) & 0xFF) for i in range(4))
+            logging.info(f"🎥 Camera {device}: {int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))}x"
+                         f"{int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))} {fourcc_str}")
+            if passthrough and fourcc_str == "MJPG":
+                # Hand us the compressed frame; we decode it ourselves and keep the bytes.
+                self.passthrough = bool(cap.set(cv2.CAP_PROP_CONVERT_RGB, 0))
+            if passthrough and not self.passthrough:
+                logging.warning(f"⚠️ MJPEG passthrough unavailable ({fourcc_str}), captures are re-encoded.")
+
+    def grab_stills(self, width, height, count=1):
+        """Switch the camera to width x height for ``count`` frames, then back to the preview size.
+
+        V4L2 restarts the stream on a size change, so this costs a few frame
+        intervals; it is meant for the occasional capture, not every frame.
+        """
+        preview = self.resolution()
+        if preview == (width, height):
+            return super().grab_stills(width, height, count)
+        actual = self.set_resolution(width, height)
+        try:
+            if actual != (width, height):
+                logging.warning(f"⚠️ Camera gave {actual[0]}x{actual[1]} for a {width}x{height} still.")
+            for _ in range(STILL_WARMUP_FRAMES):
+                self.read()
+            return super().grab_stills(width, height, count)
+        finally:
+            self.set_resolution(*preview)
+
+    def read(self):
+        if not self.passthrough:
+            return super().read()
+        ret, raw = self.cap.read()
+        if not ret or raw is None:
+            self.jpeg = None
+            return False, None
+        raw = raw.reshape(-1)
+        frame = cv2.imdecode(raw, cv2.IMREAD_COLOR) if is_jpeg(raw) else None
+        if frame is None:
+            logging.warning("⚠️ Camera frame is not a JPEG, MJPEG passthrough switched off.")
+            self.passthrough = False
+            self.jpeg = None
+            self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+            return super().read()
+        self.jpeg = raw
+        return True, frame
+
+
+class StreamSource(_CaptureSource):
+    """A network stream (RTSP/HTTP) decoded through FFmpeg with minimal buffering."""
+
+    def __init__(self, url, reuse_buffer=True):
+        cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG)
+        # Keep latency low: we always want the newest frame, not a backlog.
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        super().__init__(cap, reuse_buffer)
+        self.url = url
+
+
+class VideoFileSource(_CaptureSource):
+    """A recorded video file, optionally looping forever."""
+
+    def __init__(self, path, loop=False, reuse_buffer=True):
+        super().__init__(cv2.VideoCapture(path), reuse_buffer)
+        self.path = path
+        self.loop = loop
+
+    def read(self):
+        ret, frame = super().read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = super().read()
+        return ret, frame
+
+
+class ImageFolderSource(FrameSource):
+    """Images from a directory, read in name order."""
+
+    def __init__(self, path, loop=False):
+        self.path = path
+        self.loop = loop
+        self.files = sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self._index = 0
+
+    def isOpened(self):
+        return bool(self.files)
+
+    def read(self):
+        for _ in range(len(self.files)):
+            if self._index >= len(self.files):
+                if not self.loop:
+                    break
+                self._index = 0
+            path = self.files[self._index]
+            self._index += 1
+            frame = cv2.imread(path)
+            if frame is not None:
+                return True, frame
+            logging.warning(f"⚠️ Unreadable image skipped: {path}")
+        return False, None
+
+
+class BusSource(FrameSource):
+    """Frames another kiosk process publishes on the local frame bus (``bus:<name>``).
+
+    Each read returns a private copy, since the publisher recycles its slots.
+    """
+
+    def __init__(self, name, timeout=5.0):
+        self.subscriber = FrameSubscriber(name)
+        self.timeout = timeout
+
+    def read(self):
+        frame = self.subscriber.wait(self.timeout)
+        image = frame.copy() if frame is not None else None
+        return image is not None, image
+
+    def release(self):
+        self.subscriber.close()
+
+
+class SupervisedSource(FrameSource):
+    """Keeps a source alive: reopens it with exponential backoff when frames stop.
+
+    ``opener`` builds the underlying source (e.g. ``lambda: open_frame_source(...)``).
+    If no good frame arrives for ``offline_after`` seconds the source is released
+    and reopened after 0.5 s, 1 s, 2 s ... up to ``retry_max``; reads return
+    ``(False, None)`` immediately meanwhile, so the caller can keep its window
+    responsive. Errors are logged once per ``log_interval`` instead of per read,
+    and every outage is appended to ``downtime_log`` (CSV) when it ends.
+    """
+
+    RETRY_MIN = 0.5
+
+    def __init__(self, opener, offline_after=2.0, retry_max=30.0, log_interval=30.0, downtime_log=None):
+        self.opener = opener
+        self.offline_after = offline_after
+        self.retry_max = retry_max
+        self.log_interval = log_interval
+        self.downtime_log = downtime_log
+        self.source = None
+        self.down_since = None       # monotonic start of the current outage
+        self._down_wall = None
+        self.outages = 0
+        self.downtime = 0.0          # seconds, finished outages only
+        self.attempts = 0            # reconnect attempts in the current outage
+        self.failed_reads = 0
+        self.next_retry = 0.0
+        self._retry_delay = self.RETRY_MIN
+        self._last_log = 0.0
+        self._last_frame = time.monotonic()
+        self._open()
+        if self.source is None:
+            self._go_offline("could not open the camera")
+
+    @property
+    def jpeg(self):
+        return self.source.jpeg if self.source is not None else None
+
+    @property
+    def online(self):
+        return self.down_since is None
+
+    def _open(self):
+        try:
+            source = self.opener()
+        except Exception as e:
+            logging.debug(f"Camera open failed: {e}")
+            return False
+        if not source.isOpened():
+            source.release()
+            return False
+        self.source = source
+        self._last_frame = time.monotonic()
+        return True
+
+    def _go_offline(self, reason):
+        now = time.monotonic()
+        if self.source is not None:
+            self.source.release()
+            self.source = None
+        if self.down_since is None:
+            self.down_since, self._down_wall = now, time.time()
+            self.outages += 1
+            self.attempts = 0
+            self._retry_delay = self.RETRY_MIN
+            self._last_log = now
+            logging.error(f"❌ Camera offline ({reason}), reconnecting with backoff.")
+        self.next_retry = now + self._retry_delay
+        self._retry_delay = min(self._retry_delay * 2, self.retry_max)
+
+    def _back_online(self):
+        seconds = time.monotonic() - self.down_since
+        self.downtime += seconds
+        logging.info(f"✅ Camera back after {seconds:.1f}s ({self.attempts} reconnect attempts, "
+                     f"{self.outages} outages, {self.downtime:.0f}s down in total).")
+        if self.downtime_log:
+            new_file = not os.path.exists(self.downtime_log)
+            with open(self.downtime_log, "a", newline="") as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(["started", "ended", "seconds", "attempts"])
+                writer.writerow([time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self._down_wall)),
+                                 time.strftime("%Y-%m-%dT%H:%M:%S"), f"{seconds:.1f}", self.attempts])
+        self.down_since = self._down_wall = None
+        self.failed_reads = 0
+
+    def read(self):
+        now = time.monotonic()
+        if self.source is None:
+            if now >= self.next_retry:
+                self.attempts += 1
+                if not self._open():
+                    self._go_offline("reopen failed")
+            if now - self._last_log >= self.log_interval:
+                self._last_log = now
+                logging.warning(f"⚠️ Camera still offline after {now - self.down_since:.0f}s "
+                                f"({self.attempts} attempts, next in {max(0.0, self.next_retry - now):.1f}s).")
+            if self.source is None:
+                return False, None
+
+        ret, frame = self.source.read()
+        if ret and frame is not None:
+            self._last_frame = time.monotonic()
+            if self.down_since is not None:
+                self._back_online()
+            return ret, frame
+        self.failed_reads += 1
+        if not self.source.isOpened() or now - self._last_frame >= self.offline_after:
+            self._go_offline(f"{self.failed_reads} failed reads")
+        return False, None
+
+    def grab_stills(self, width, height, count=1):
+        if self.source is None:
+            return []
+        return self.source.grab_stills(width, height, count)
+
+    def metrics(self):
+        current = time.monotonic() - self.down_since if self.down_since is not None else 0.0
+        return {
+            "camera_online": self.online,
+            "camera_outages": self.outages,
+            "camera_downtime_s": round(self.downtime + current, 1),
+            "camera_reconnect_attempts": self.attempts,
+        }
+
+    def release(self):
+        if self.source is not None:
+            self.source.release()
+            self.source = None
+
+
+def open_frame_source(spec, width=1280, height=720, loop=False, passthrough=False):
+    """Open a FrameSource from a spec string.
+
+    ``0`` or ``/dev/video0`` -> camera, ``rtsp://...`` -> stream,
+    ``bus:<name>`` -> frame bus, a directory -> image folder, anything else
+    -> video file. ``passthrough`` keeps a camera's MJPEG bytes (see CameraSource).
+    """
+    spec = str(spec)
+    if spec.startswith(BUS_PREFIX):
+        return BusSource(spec[len(BUS_PREFIX):] or DEFAULT_BUS_NAME)
+    if spec.isdigit():
+        return CameraSource(int(spec), width, height, passthrough=passthrough)
+    if spec.startswith("/dev/video"):
+        return CameraSource(spec, width, height, passthrough=passthrough)
+    if spec.startswith(STREAM_PREFIXES):
+        return StreamSource(spec)
+    if os.path.isdir(spec):
+        return ImageFolderSource(spec, loop=loop)
+    return VideoFileSource(spec, loop=loop)
@@ -0,0 +1,84 @@
+"""Cheap box tracking between YOLO runs (``tracking_enabled``).
+
+With ``detect_every = N`` YOLO only sees every Nth preview frame. Without
+tracking the boxes from the last run stay where they were while the plate
+moves; with it, ``BoxTracker`` moves them along on every frame using sparse
+Lucas-Kanade optical flow on a small greyscale copy (``tracking_width`` px
+wide), which costs a couple of milliseconds at 720p.
+
+Each box is tracked by the median motion of a few corner points picked
+inside it at the last detection; points that fail a forward-backward flow
+check are dropped. ``update`` returns None, asking for a fresh YOLO run
+right away, when a box loses its points (plate gone or covered) or when the
+frame differs from the detection keyframe by more than
+``tracking_scene_change`` grey levels on average (new plate, hand in view).
+"""
+import cv2
+import numpy as np
+
+MAX_POINTS = 20  # corner points per box
+MIN_POINTS = 3   # fewer surviving points and the box counts as lost
+MAX_FB_ERROR = 1.0  # px at tracking size a point may miss when flowed back
+LK_PARAMS = dict(winSize=(15, 15), maxLevel=2,
+                 criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+
+class BoxTracker:
+    def __init__(self, config):
+        self.config = config
+        self.boxes = []
+        self._key = None
+        self._previous = None
+        self._points = []
+
+    def thumb(self, frame):
+        """(small greyscale copy, scale) used as a tracking keyframe."""
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.config.tracking_width / w)
+        small = cv2.resize(frame, (max(1, round(w * scale)), max(1, round(h * scale))),
+                           interpolation=cv2.INTER_AREA) if scale < 1 else frame
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), scale
+
+    def reset(self, boxes, key):
+        """Start tracking the boxes of a detection made on the keyframe `key` (see thumb)."""
+        gray, scale = key
+        self.boxes = [tuple(box) for box in boxes]
+        self._key = self._previous = key
+        self._points = []
+        for x1, y1, x2, y2, *_ in self.boxes:
+            mask = np.zeros_like(gray)
+            mask[int(y1 * scale):int(y2 * scale) + 1, int(x1 * scale):int(x2 * scale) + 1] = 255
+            self._points.append(cv2.goodFeaturesToTrack(gray, MAX_POINTS, 0.01, 3, mask=mask))
+
+    def update(self, frame):
+        """Move the boxes onto this frame; None if a new detection is needed."""
+        if self._key is None:
+            return None
+        gray, scale = key = self.thumb(frame)
+        key_gray, previous = self._key[0], self._previous[0]
+        if gray.shape != key_gray.shape or cv2.absdiff(gray, key_gray).mean() > self.config.tracking_scene_change:
+            return None
+
+        tracked = [i for i, points in enumerate(self._points) if points is not None and len(points)]
+        if tracked:
+            # One flow call for the points of all boxes.
+            old = np.concatenate([self._points[i] for i in tracked])
+            new, status, _ = cv2.calcOpticalFlowPyrLK(previous, gray, old, None, **LK_PARAMS)
+            # Forward-backward check: points that do not flow back home are on something else.
+            back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, previous, new, None, **LK_PARAMS)
+            fb_error = np.linalg.norm((back - old).reshape(-1, 2), axis=1)
+            status = status.ravel().astype(bool) & back_status.ravel().astype(bool) & (fb_error < MAX_FB_ERROR)
+            start = 0
+            for i in tracked:
+                end = start + len(self._points[i])
+                ok = status[start:end]
+                if ok.sum() < MIN_POINTS:
+                    return None
+                shift = np.median(new[start:end][ok] - old[start:end][ok], axis=0).ravel() / scale
+                dx, dy = float(shift[0]), float(shift[1])
+                x1, y1, x2, y2, *rest = self.boxes[i]
+                self.boxes[i] = (x1 + dx, y1 + dy, x2 + dx, y2 + dy, *rest)
+                self._points[i] = new[start:end][ok].reshape(-1, 1, 2)
+                start = end
+        self._previous = key
+        return self.boxes
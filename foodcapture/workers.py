@@ -0,0 +1,241 @@
+"""Detector and encoder/upload processes for the kiosk (``multiprocess = true``).
+
+In the single-process layout the cv2 UI loop, YOLO, JPEG encoding and the
+upload threads all share one GIL. With ``multiprocess`` enabled the kiosk
+splits into three processes:
+
+* capture/UI (``food-capture.py``): camera, preview, keyboard, burst pick
+* detector (``DetectorProcess``): YOLO on the newest frame it is handed
+* encoder (``EncoderProcess``): the kiosk capture pipeline (JPEG encode,
+  dedupe, pre-screen, sidecar, analysis and upload pools)
+
+Frames travel through ``SharedFrameRing`` slots; the queues carry only small
+tuples. The encoder replies with each freed slot and with its pipeline's
+in-flight count whenever that changes, which is what the profiler reports
+as ``uploads_in_flight``. The detector works latest-frame-wins: the UI hands it a frame only
+when it is idle and keeps drawing the last boxes meanwhile, so a slow model
+lowers the detection rate but never the preview rate. Children use the
+``spawn`` start method and their own ``ConfigWatcher``, so hot keys apply to
+them too.
+"""
+import os
+import time
+import queue
+import signal
+import logging
+import multiprocessing
+from dataclasses import dataclass, field, asdict
+
+import cv2
+
+from foodcapture.shm import SharedFrameRing
+
+ENCODER_SLOTS = 4
+SLOT_WAIT_SECONDS = 30
+BOX_COLOR = (0, 255, 0)
+
+_mp = multiprocessing.get_context("spawn")
+
+
+@dataclass
+class Detections:
+    """Picklable summary of one YOLO pass, in the coordinates of the submitted frame."""
+    seq: int = 0
+    boxes: list = field(default_factory=list)  # (x1, y1, x2, y2, conf, label)
+    detected: bool = False
+    food_conf: float = 0.0
+    dish: str = None
+
+    @classmethod
+    def from_results(cls, yolo_model, results, food_labels, seq=0):
+        from foodcapture.prescreen import food_confidence
+        boxes = results[0].boxes
+        food_conf, dish = food_confidence(yolo_model, results, food_labels)
+        return cls(
+            seq=seq,
+            boxes=[(*xyxy, conf, yolo_model.names[int(cls_id)]) for xyxy, conf, cls_id in
+                   zip(boxes.xyxy.tolist(), boxes.conf.tolist(), boxes.cls.tolist())],
+            detected=food_conf > 0, food_conf=food_conf, dish=dish,
+        )
+
+    def to_dict(self):
+        return asdict(self)
+
+    def draw(self, frame):
+        for x1, y1, x2, y2, conf, label in self.boxes:
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), BOX_COLOR, 2)
+            cv2.putText(frame, f"{label} {conf:.2f}", (int(x1), max(int(y1) - 6, 14)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, BOX_COLOR, 2, cv2.LINE_AA)
+        return frame
+
+
+def _setup_child(log_file):
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] %(processName)s: %(message)s',
+        handlers=[logging.StreamHandler(), logging.FileHandler(log_file, mode='a')],
+        force=True,
+    )
+    # Ctrl+C goes to the whole process group; the UI process shuts us down cleanly.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _detector_main(ring_spec, requests, replies, log_file):
+    _setup_child(log_file)
+    from foodcapture.config import ConfigWatcher
+    from foodcapture.core import config, detect_food
+    from foodcapture.quantize import load_detector
+
+    ring = SharedFrameRing.attach(ring_spec)
+    yolo_model = load_detector(config)
+    watcher = ConfigWatcher(config)
+    watcher.start()
+    logging.info(f"🧠 Detector process ready (pid {os.getpid()}).")
+    replies.put(Detections())
+    try:
+        while (message := requests.get()) is not None:
+            seq, slot, shape = message
+            results, _ = detect_food(yolo_model, ring.view(slot, shape))
+            replies.put(Detections.from_results(yolo_model, results, config.food_labels, seq))
+            # Results keep a reference to the shared frame; release it before the next pass.
+            results = None
+    finally:
+        watcher.stop()
+        ring.close()
+
+
+def _encoder_main(ring_spec, requests, replies, log_file):
+    _setup_child(log_file)
+    from foodcapture.config import ConfigWatcher
+    from foodcapture.core import config, reanalyzer, DuplicateFilter
+    from foodcapture.collector import CollectorClient
+    from foodcapture.pipeline import Pipeline
+    from foodcapture.prescreen import ReferenceLibrary
+    from foodcapture.presets import PRESETS
+
+    ring = SharedFrameRing.attach(ring_spec)
+    # In-flight counts nobody reads any more must not keep this process from exiting.
+    replies.cancel_join_thread()
+    # Same stages as the single-process kiosk; the slot is free once submit returns
+    # (the pipeline copies the frame before it leaves this thread).
+    captures = Pipeline(PRESETS["kiosk"].stages, config, duplicates=DuplicateFilter(),
+                        references=ReferenceLibrary(config.prescreen_reference_dir))
+    watcher = ConfigWatcher(config)
+    watcher.start()
+    reanalyzer.start()
+    collector = CollectorClient(config) if config.collector_url else None
+    if collector is not None:
+        collector.start()
+    logging.info(f"📦 Encoder process ready (pid {os.getpid()}).")
+    try:
+        while (message := requests.get()) is not None:
+            slot, shape, item_code, food_conf, dish, jpeg = message
+            try:
+                done = captures.submit({"frame": ring.view(slot, shape), "jpeg": jpeg, "item_code": item_code,
+                                        "food_conf": food_conf, "dish": dish})
+                done.add_done_callback(lambda _: replies.put((None, len(captures))))
+            finally:
+                replies.put((slot, len(captures)))  # the UI may reuse the slot now
+    finally:
+        captures.close()
+        reanalyzer.stop()
+        if collector is not None:
+            collector.stop()
+        watcher.stop()
+        ring.close()
+
+
+class _WorkerProcess:
+    def __init__(self, target, name, slots, max_shape, log_file):
+        self.ring = SharedFrameRing(slots, max_shape)
+        self.requests = _mp.Queue()
+        self.replies = _mp.Queue()
+        self.process = _mp.Process(target=target, name=name, daemon=True,
+                                   args=(self.ring.spec(), self.requests, self.replies, log_file))
+        self.process.start()
+
+    def close(self, timeout=None):
+        self.requests.put(None)
+        self.process.join(timeout)
+        if self.process.is_alive():
+            logging.warning(f"⚠️ {self.process.name} process did not stop, terminating it.")
+            self.process.terminate()
+            self.process.join()
+        self.ring.close()
+
+
+class DetectorProcess(_WorkerProcess):
+    """YOLO in its own process; ``submit`` hands it the newest frame whenever it is free."""
+
+    def __init__(self, max_shape, log_file):
+        super().__init__(_detector_main, "detector", 1, max_shape, log_file)
+        self.busy = True  # until the child reports it has loaded the model
+        self.latest = Detections()
+        self.seq = 0  # of the last submitted frame; replies carry it back
+
+    def poll(self):
+        """Collect finished detections without blocking; returns the latest Detections."""
+        while True:
+            try:
+                self.latest = self.replies.get_nowait()
+            except queue.Empty:
+                return self.latest
+            self.busy = False
+
+    def submit(self, frame):
+        """Start a detection on a copy of the frame; returns False while the detector is busy."""
+        self.poll()
+        if self.busy:
+            return False
+        self.seq += 1
+        self.requests.put((self.seq, 0, self.ring.put(0, frame)))
+        self.busy = True
+        return True
+
+    def close(self, timeout=10):
+        super().close(timeout)
+
+
+class EncoderProcess(_WorkerProcess):
+    """JPEG encoding, sidecars and uploads in their own process, fed through shared slots."""
+
+    def __init__(self, max_shape, log_file, slots=ENCODER_SLOTS):
+        super().__init__(_encoder_main, "encoder", slots, max_shape, log_file)
+        self.free = list(range(slots))
+        self.in_flight = 0  # as last reported by the encoder's pipeline
+
+    @property
+    def pending(self):
+        """Captures the encoder has not finished yet (saving, analysis and upload)."""
+        while self._reclaim():
+            pass
+        return self.in_flight
+
+    def _reclaim(self, timeout=None):
+        """Take one reply (a freed slot and/or the in-flight count); False if none came."""
+        try:
+            slot, self.in_flight = self.replies.get(timeout=timeout) if timeout else self.replies.get_nowait()
+        except queue.Empty:
+            return False
+        if slot is not None:
+            self.free.append(slot)
+        return True
+
+    def submit(self, frame, item_code, food_conf=0.0, dish=None, jpeg=None):
+        """Queue a capture for saving and sending; returns False if no slot came free in time."""
+        while self._reclaim():
+            pass
+        deadline = time.monotonic() + SLOT_WAIT_SECONDS
+        while not self.free:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._reclaim(remaining):
+                logging.error(f"❌ Encoder process is not keeping up, capture {item_code!r} dropped.")
+                return False
+        slot = self.free.pop()
+        jpeg = jpeg.tobytes() if jpeg is not None else None  # small enough to pickle
+        self.requests.put((slot, self.ring.put(slot, frame), item_code, food_conf, dish, jpeg))
+        return True
+
+    def close(self, timeout=None):
+        # Waits for queued captures and in-flight uploads, like the thread pool shutdown.
+        super().close(timeout)